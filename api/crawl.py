@@ -0,0 +1,285 @@
+"""Discover the apps of the catalogue and feed them to the scrape workers
+
+Listing pages and sitemaps are walked from the seeds, the app base URLs found
+there are deduplicated against a seen-set kept in Redis, and new apps go
+through a bounded queue to threads submitting a scrape task per app and
+waiting for it, so the crawler never runs ahead of the workers.
+
+Usage:
+    python -m api.crawl [SEED ...] [--max-pages N] [--workers N]
+"""
+
+import argparse
+import logging
+import queue
+import re
+import threading
+import time
+from collections import deque
+from typing import Callable, List, Optional, Set
+from urllib.parse import urldefrag, urljoin, urlparse
+
+from lxml import etree, html
+from prometheus_client import Counter
+from redis import Redis, RedisError
+
+from api.settings import (
+    CRAWL_APP_HOST_PATTERN,
+    CRAWL_LISTING_PATTERN,
+    CRAWL_MAX_PAGES,
+    CRAWL_QUEUE_SIZE,
+    CRAWL_SEEDS,
+    CRAWL_SEEN_TTL,
+    CRAWL_TASK_TIMEOUT,
+    CRAWL_WORKERS,
+)
+from api.tasks import task_scrape_target
+from api.utils.connections import redis_client
+from api.utils.fetch import fetch_page_content
+from api.utils.url import convert_to_base_url
+
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+# Sorted set of the app base URLs already submitted, scored by submission time
+CRAWL_SEEN_KEY = "scrape:crawl:seen:v1"
+
+# Add an app to the seen-set unless it was added less than the TTL ago, in one
+# step so two crawlers finding the same app do not both submit it
+MARK_SEEN_SCRIPT = """
+local now = tonumber(ARGV[2])
+local seen_at = tonumber(redis.call('ZSCORE', KEYS[1], ARGV[1]))
+if seen_at and now - seen_at < tonumber(ARGV[3]) then
+    return 0
+end
+redis.call('ZADD', KEYS[1], now, ARGV[1])
+return 1
+"""
+
+# Start of a sitemap, anything else is parsed as a listing page
+SITEMAP_PATTERN = re.compile(r"^\s*(<\?xml[^>]*>\s*)?<(urlset|sitemapindex)\b")
+
+crawl_pages = Counter(
+    "crawl_pages_total",
+    "Listing pages and sitemaps fetched by the catalogue crawler",
+    ("result",),
+)
+crawl_apps = Counter(
+    "crawl_apps_total",
+    "Apps found by the catalogue crawler",
+    ("result",),
+)
+
+# Tells a submitting thread to stop
+_STOP = None
+
+
+def discover_links(content: str, page_url: str) -> List[str]:
+    """Read the links of a listing page or the locations of a sitemap
+
+    Args:
+        content (str): Content of the page
+        page_url (str): URL of the page, relative links are resolved against it
+
+    Returns:
+        List[str]: Absolute URLs in page order, without fragments
+    """
+
+    try:
+        if SITEMAP_PATTERN.match(content):
+            root = etree.fromstring(content.encode("utf-8"))
+            links = [loc.text.strip() for loc in root.iter("{*}loc") if loc.text]
+        else:
+            links = html.fromstring(content).xpath("//a/@href")
+    except (etree.XMLSyntaxError, etree.ParserError) as e:
+        logger.error(f"Error parsing {page_url}: {e}")
+        return []
+
+    return [urldefrag(urljoin(page_url, link)).url for link in links]
+
+
+def is_app_url(url: str) -> bool:
+    """Tell whether a URL belongs to an app
+
+    Args:
+        url (str): URL to check
+
+    Returns:
+        bool: True if its host matches CRAWL_APP_HOST_PATTERN
+    """
+
+    return re.match(CRAWL_APP_HOST_PATTERN, urlparse(url).hostname or "") is not None
+
+
+def mark_seen(redis: Redis, base_url: str) -> bool:
+    """Add an app to the seen-set unless it was submitted recently
+
+    Args:
+        redis (Redis): Redis client holding the seen-set
+        base_url (str): Base URL of the app
+
+    Returns:
+        bool: True if the app is new or due for a refresh
+    """
+
+    mark = redis.register_script(MARK_SEEN_SCRIPT)
+    return bool(
+        mark(keys=[CRAWL_SEEN_KEY], args=[base_url, time.time(), CRAWL_SEEN_TTL])
+    )
+
+
+def submit_and_wait(base_url: str) -> None:
+    """Scrape an app on the Celery workers and wait until it is done
+
+    Args:
+        base_url (str): Base URL of the app
+    """
+
+    task = task_scrape_target.apply_async(args=[base_url])
+    task.get(timeout=CRAWL_TASK_TIMEOUT)
+
+
+class CatalogueCrawler:
+    """Walk listing pages and sitemaps and submit every app found once
+
+    One thread walks the pages and puts new apps on a bounded queue, a pool of
+    threads takes them off and submits them. Putting blocks while the queue is
+    full, which pauses the walk until the submitters catch up.
+    """
+
+    def __init__(
+        self,
+        seeds: List[str],
+        redis: Redis,
+        submit: Callable[[str], None] = submit_and_wait,
+        max_pages: int = CRAWL_MAX_PAGES,
+        queue_size: int = CRAWL_QUEUE_SIZE,
+        workers: int = CRAWL_WORKERS,
+    ) -> None:
+        self.seeds = seeds
+        self.redis = redis
+        self.submit = submit
+        self.max_pages = max_pages
+        self.workers = workers
+        self.hosts = {urlparse(seed).hostname for seed in seeds}
+        self.queue: "queue.Queue[Optional[str]]" = queue.Queue(maxsize=queue_size)
+        self.pages = 0
+        self.discovered = 0
+        self.submitted = 0
+        self.failed = 0
+        self._found: Set[str] = set()
+        self._lock = threading.Lock()
+
+    def run(self) -> None:
+        """Crawl until every reachable page was walked or max_pages were fetched"""
+
+        submitters = [
+            threading.Thread(target=self._submit_apps, name=f"crawl-submit-{i}")
+            for i in range(self.workers)
+        ]
+        for submitter in submitters:
+            submitter.start()
+
+        try:
+            self._walk()
+        finally:
+            for _ in submitters:
+                self.queue.put(_STOP)
+            for submitter in submitters:
+                submitter.join()
+
+        logger.info(
+            f"Crawled {self.pages} pages, discovered {self.discovered} apps, "
+            f"submitted {self.submitted}, failed {self.failed}"
+        )
+
+    def is_listing_url(self, url: str) -> bool:
+        """Tell whether a URL is a listing page or sitemap to walk
+
+        Args:
+            url (str): URL to check
+
+        Returns:
+            bool: True if it is on a seed host and matches CRAWL_LISTING_PATTERN
+        """
+
+        parsed = urlparse(url)
+        return parsed.hostname in self.hosts and (
+            re.search(CRAWL_LISTING_PATTERN, parsed.path) is not None
+        )
+
+    def _walk(self) -> None:
+        frontier = deque(self.seeds)
+        visited = set(self.seeds)
+
+        while frontier and self.pages < self.max_pages:
+            page_url = frontier.popleft()
+            content = fetch_page_content(page_url)
+            self.pages += 1
+            if content is None:
+                crawl_pages.labels(result="failed").inc()
+                continue
+            crawl_pages.labels(result="fetched").inc()
+
+            for link in discover_links(content, page_url):
+                if is_app_url(link):
+                    self._discover(convert_to_base_url(link))
+                elif link not in visited and self.is_listing_url(link):
+                    visited.add(link)
+                    frontier.append(link)
+
+    def _discover(self, base_url: str) -> None:
+        # Apps failing in this run are forgotten for the next run, not retried now
+        if base_url in self._found:
+            return
+        self._found.add(base_url)
+
+        if not mark_seen(self.redis, base_url):
+            crawl_apps.labels(result="seen").inc()
+            return
+
+        self.discovered += 1
+        crawl_apps.labels(result="discovered").inc()
+        self.queue.put(base_url)
+
+    def _submit_apps(self) -> None:
+        while True:
+            base_url = self.queue.get()
+            if base_url is _STOP:
+                self.queue.task_done()
+                return
+
+            try:
+                self._submit_app(base_url)
+            finally:
+                self.queue.task_done()
+
+    def _submit_app(self, base_url: str) -> None:
+        try:
+            self.submit(base_url)
+        except Exception as e:
+            logger.error(f"Error scraping {base_url}: {e}")
+            crawl_apps.labels(result="failed").inc()
+            with self._lock:
+                self.failed += 1
+            # Forget the app so the next crawl submits it again
+            try:
+                self.redis.zrem(CRAWL_SEEN_KEY, base_url)
+            except RedisError as e:
+                logger.error(f"Error forgetting {base_url}: {e}")
+        else:
+            crawl_apps.labels(result="submitted").inc()
+            with self._lock:
+                self.submitted += 1
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Crawl the app catalogue")
+    parser.add_argument("seeds", nargs="*", default=CRAWL_SEEDS)
+    parser.add_argument("--max-pages", type=int, default=CRAWL_MAX_PAGES)
+    parser.add_argument("--workers", type=int, default=CRAWL_WORKERS)
+    args = parser.parse_args()
+
+    CatalogueCrawler(
+        args.seeds, redis_client, max_pages=args.max_pages, workers=args.workers
+    ).run()
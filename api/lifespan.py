@@ -0,0 +1,52 @@
+import logging
+
+from api.utils.connections import close_async_redis, get_async_redis
+from api.utils.events import task_events
+from api.utils.fetch import close_async_client, get_async_client
+from api.utils.parsing import get_parse_executor, shutdown_parse_executor
+
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+
+class LifespanMiddleware:
+    """Create and release process-wide resources on ASGI startup and shutdown"""
+
+    async def process_startup(self, scope: dict, event: dict) -> None:
+        """Warm up shared clients before the first request is served
+
+        Args:
+            scope (dict): ASGI lifespan scope
+            event (dict): ASGI lifespan startup event
+        """
+
+        get_async_client()
+        logger.info("Async HTTP client pool created")
+
+        get_async_redis()
+        logger.info("Async Redis connection pool created")
+
+        task_events.start()
+        logger.info("Task event subscriber started")
+
+        get_parse_executor()
+
+    async def process_shutdown(self, scope: dict, event: dict) -> None:
+        """Close shared clients so pooled connections are not leaked
+
+        Args:
+            scope (dict): ASGI lifespan scope
+            event (dict): ASGI lifespan shutdown event
+        """
+
+        await task_events.stop()
+        logger.info("Task event subscriber stopped")
+
+        await close_async_client()
+        logger.info("Async HTTP client pool closed")
+
+        await close_async_redis()
+        logger.info("Async Redis connection pool closed")
+
+        shutdown_parse_executor()
+        logger.info("Parse executor shut down")
@@ -6,25 +6,48 @@ from apispec import APISpec
 from apispec.ext.marshmallow import MarshmallowPlugin
 from falcon_apispec import FalconPlugin
 
+from api.lifespan import LifespanMiddleware
+from api.routes.metrics import MetricsResource
 from api.routes.static import StaticFileHandler
 from api.routes.v1.scrape import ScrapeResource
 from api.routes.v2.scrape import (
     AsyncScrapeResource,
     AsyncScrapeResultResource,
+    BatchScrapeProgressResource,
+    BatchScrapeResource,
+    MultiSSEScrapeUpdateResource,
     SSEScrapeUpdateResource,
+    TaskResultsResource,
 )
-from api.schemas.scrape import AsyncScrapeResultSchema, ScrapeResultSchema
+from api.schemas.scrape import (
+    AsyncScrapeResultSchema,
+    BatchScrapeProgressSchema,
+    BatchScrapeRequestSchema,
+    BatchScrapeResultSchema,
+    ScrapeResultSchema,
+    TaskResultsRequestSchema,
+    TaskResultsSchema,
+)
+from api.utils.serializers import json_media_handler
+from api.utils.sse import StreamClosingApp
 
 STATIC_PATH = pathlib.Path(__file__).parent / "static"
 SWAGGERUI_URL = "/swagger"
 SCHEMA_URL = "/static/swagger.json"
 
-app = falcon.asgi.App()
+app = StreamClosingApp(middleware=[LifespanMiddleware()])
+json_handler = json_media_handler()
+app.req_options.media_handlers[falcon.MEDIA_JSON] = json_handler
+app.resp_options.media_handlers[falcon.MEDIA_JSON] = json_handler
 
 scrape_resource = ScrapeResource()
 async_scrape_resource = AsyncScrapeResource()
 async_scrape_result_resource = AsyncScrapeResultResource()
 sse_scrape_updates_resource = SSEScrapeUpdateResource()
+batch_scrape_resource = BatchScrapeResource()
+batch_scrape_progress_resource = BatchScrapeProgressResource()
+multi_sse_scrape_updates_resource = MultiSSEScrapeUpdateResource()
+task_results_resource = TaskResultsResource()
 
 
 def create_spec(app: falcon.App) -> APISpec:
@@ -48,11 +71,20 @@ def create_spec(app: falcon.App) -> APISpec:
     )
     spec.components.schema("ScrapeResult", schema=ScrapeResultSchema)
     spec.components.schema("AsyncScrapeResult", schema=AsyncScrapeResultSchema)
+    spec.components.schema("BatchScrapeRequest", schema=BatchScrapeRequestSchema)
+    spec.components.schema("BatchScrapeResult", schema=BatchScrapeResultSchema)
+    spec.components.schema("BatchScrapeProgress", schema=BatchScrapeProgressSchema)
+    spec.components.schema("TaskResultsRequest", schema=TaskResultsRequestSchema)
+    spec.components.schema("TaskResults", schema=TaskResultsSchema)
 
     spec.path(resource=scrape_resource)
     spec.path(resource=async_scrape_resource)
     spec.path(resource=async_scrape_result_resource)
     spec.path(resource=sse_scrape_updates_resource)
+    spec.path(resource=batch_scrape_resource)
+    spec.path(resource=batch_scrape_progress_resource)
+    spec.path(resource=multi_sse_scrape_updates_resource)
+    spec.path(resource=task_results_resource)
 
     return spec
 
@@ -69,10 +101,15 @@ def setup_routes(app: falcon.App) -> None:
     app.add_route("/v2/scrape", async_scrape_resource)
     app.add_route("/v2/scrape/result/{task_id}", async_scrape_result_resource)
     app.add_route("/v2/scrape/updates/{task_id}", sse_scrape_updates_resource)
+    app.add_route("/v2/scrape/batch", batch_scrape_resource)
+    app.add_route("/v2/scrape/batch/{batch_id}", batch_scrape_progress_resource)
+    app.add_route("/v2/scrape/updates", multi_sse_scrape_updates_resource)
+    app.add_route("/v2/scrape/results", task_results_resource)
 
     app.add_route(
         "/static/swagger.json", StaticFileHandler(f"{STATIC_PATH}/swagger.json")
     )
+    app.add_route("/metrics", MetricsResource())
 
 
 def save_swagger_json(spec: APISpec) -> None:
@@ -0,0 +1,12 @@
+import falcon
+from falcon import Request, Response
+from prometheus_client import CONTENT_TYPE_LATEST, generate_latest
+
+
+class MetricsResource:
+    async def on_get(self, req: Request, resp: Response) -> None:
+        """Expose the metrics of this process in Prometheus text format"""
+
+        resp.content_type = CONTENT_TYPE_LATEST
+        resp.data = generate_latest()
+        resp.status = falcon.HTTP_200
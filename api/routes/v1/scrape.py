@@ -1,8 +1,15 @@
 import falcon
 from falcon import Request, Response
 
-from api.schemas.scrape import ScrapeResultSchema
-from api.utils.scrape import scrape_target_page
+from api.schemas.scrape import dump_scrape_result
+from api.utils.cache import CachedScrape, async_get_or_scrape
+from api.utils.connections import get_async_redis
+from api.utils.scrape import async_scrape_target_page
+from api.utils.singleflight import SingleFlight
+from api.utils.url import convert_to_base_url
+
+# Concurrent requests for the same app share one cache lookup and scrape
+scrape_flight: SingleFlight[CachedScrape] = SingleFlight("v1_scrape")
 
 
 class ScrapeResource:
@@ -37,9 +44,19 @@ class ScrapeResource:
                 title="Missing required parameter", description="target_url"
             )
 
-        schema = ScrapeResultSchema()
-        scraped_result = scrape_target_page(target_url)
+        cached = await scrape_flight.do(
+            convert_to_base_url(target_url),
+            lambda: async_get_or_scrape(
+                get_async_redis(), target_url, async_scrape_target_page
+            ),
+        )
 
-        result = schema.dump({"result": scraped_result})
+        result = dump_scrape_result(
+            {
+                "result": cached.result,
+                "cached": cached.cached,
+                "cache_age": round(cached.age, 3),
+            }
+        )
         resp.media = result
         resp.status = falcon.HTTP_200
@@ -1,13 +1,58 @@
 import asyncio
 import logging
-from typing import AsyncGenerator
+from typing import AsyncGenerator, List, Optional, Set
 
 import falcon
+from celery.states import PENDING, READY_STATES
 from falcon import Request, Response
+from falcon.asgi import SSEvent
+from marshmallow import ValidationError
 from redis.asyncio.client import Redis
 
-from api.schemas.scrape import AsyncScrapeResultSchema
-from api.tasks import task_scrape_target
+from api.schemas.scrape import (
+    BatchScrapeRequestSchema,
+    TaskResultsRequestSchema,
+    dump_async_scrape_result,
+    dump_batch_scrape_progress,
+    dump_batch_scrape_result,
+    dump_task_results,
+)
+from api.settings import (
+    RESULT_MAX_WAIT,
+    SSE_HEARTBEAT_INTERVAL,
+    SSE_MAX_TASKS_PER_STREAM,
+)
+from api.tasks import (
+    async_get_task_results,
+    describe_task,
+    enqueue_scrape_batch,
+    get_batch_progress,
+    get_batch_task_ids,
+    task_scrape_target,
+)
+from api.utils.connections import get_async_redis
+from api.utils.events import RESYNC, task_events
+from api.utils.results import (
+    TaskFailure,
+    TaskOutcome,
+    async_load_result,
+    async_load_results,
+)
+from api.utils.sse import (
+    close_when_done,
+    decode_cursor,
+    encode_cursor,
+    encode_task_error,
+    encode_task_result,
+    parse_task_ids,
+    pending_positions,
+    stream_limiter,
+)
+
+SSE_KEEPALIVE_COMMENT = "keepalive"
+SSE_RESULT_EVENT = "result"
+SSE_ERROR_EVENT = "error"
+SSE_END_EVENT = "end"
 
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
@@ -45,8 +90,7 @@ class AsyncScrapeResource:
 
         task = task_scrape_target.apply_async(args=[target_url])
 
-        schema = AsyncScrapeResultSchema()
-        result = schema.dump(
+        result = dump_async_scrape_result(
             {
                 "target_url": target_url,
                 "task_id": task.id,
@@ -71,6 +115,12 @@ class AsyncScrapeResultResource:
             schema:
               type: string
             description: ID of the task to get the result for
+          - in: query
+            name: wait
+            required: false
+            schema:
+              type: number
+            description: Seconds to hold the request until the task finishes, at most RESULT_MAX_WAIT
         responses:
           200:
             description: Successful operation
@@ -83,43 +133,192 @@ class AsyncScrapeResultResource:
             description: Internal server error
         """
 
-        task_result = task_scrape_target.AsyncResult(task_id)
+        wait = min(req.get_param_as_float("wait", min_value=0) or 0, RESULT_MAX_WAIT)
+        redis_client = get_async_redis()
+        # Read without blocking the event loop, as for many tasks
+        (task,) = await async_get_task_results(redis_client, [task_id])
+
+        if wait and task["status"] not in READY_STATES:
+            outcome = await self.wait_for_result(redis_client, task_id, wait)
+            if outcome is not None:
+                task = describe_task(task_id, {}, outcome)
+
+        logging.info(f"Task ID: {task_id} - {task['status']}")
+
+        resp.media = dump_async_scrape_result(task)
+        resp.status = falcon.HTTP_200
+
+    async def wait_for_result(
+        self, redis_client: Redis, task_id: str, wait: float
+    ) -> Optional[TaskOutcome]:
+        """Wait for the result of a task to be stored
+
+        The completion event pushed by the task is awaited instead of polling,
+        so the request is answered as soon as the task finishes.
+
+        Args:
+            redis_client (Redis): Async Redis client
+            task_id (str): ID of the task to wait for
+            wait (float): Seconds to wait at most
+
+        Returns:
+            Optional[TaskOutcome]: Stored result or failure, None if the task
+                did not finish within the wait
+        """
+
+        loop = asyncio.get_running_loop()
+        deadline = loop.time() + wait
+        # Subscribe before reading so a result stored in between is not missed
+        queue = task_events.subscribe(task_id)
+        try:
+            result = await async_load_result(redis_client, task_id)
+            while result is None:
+                try:
+                    event = await asyncio.wait_for(
+                        queue.get(), max(deadline - loop.time(), 0)
+                    )
+                except asyncio.TimeoutError:
+                    return None
 
-        logging.info(f"Task ID: {task_id} - {task_result.state}")
+                if event is RESYNC:
+                    result = await async_load_result(redis_client, task_id)
+                else:
+                    _, result = event
+            return result
+        finally:
+            task_events.unsubscribe(task_id, queue)
 
-        schema = AsyncScrapeResultSchema()
 
-        if task_result.failed():
-            resp.media = schema.dump(
-                {
-                    "task_id": task_id,
-                    "status": task_result.state,
-                    "error": str(task_result.result),
-                }
+class TaskResultsResource:
+    async def on_post(self, req: Request, resp: Response) -> None:
+        """Request to get the results of many async scraping tasks at once
+        ---
+        description: Returns the state and result of each task, read with a single Redis round trip
+        tags:
+          - Async Scrape
+        requestBody:
+          required: true
+          content:
+            application/json:
+              schema: TaskResultsRequestSchema
+        responses:
+          200:
+            description: Successful operation
+            content:
+              application/json:
+                schema: TaskResultsSchema
+          400:
+            description: Invalid request
+          500:
+            description: Internal server error
+        """
+
+        try:
+            request = TaskResultsRequestSchema().load(await req.get_media())
+        except ValidationError as e:
+            raise falcon.HTTPBadRequest(
+                title="Invalid request", description=str(e.messages)
             )
-            resp.status = falcon.HTTP_200
-            return
-
-        if not task_result.ready():
-            resp.media = schema.dump(
-                {
-                    "task_id": task_id,
-                    "status": task_result.state,
-                }
+
+        tasks = await async_get_task_results(get_async_redis(), request["task_ids"])
+        if request["finished_only"]:
+            tasks = [task for task in tasks if task["status"] in READY_STATES]
+
+        logging.info(f"Results of {len(request['task_ids'])} tasks, {len(tasks)} sent")
+
+        resp.media = dump_task_results({"tasks": tasks})
+        resp.status = falcon.HTTP_200
+
+
+class BatchScrapeResource:
+    async def on_post(self, req: Request, resp: Response) -> None:
+        """Request to scrape a batch of target URLs (asynchronous)
+        ---
+        description: Starts a scraping task per target URL as one batch and returns the batch ID and task IDs
+        tags:
+          - Async Scrape
+        requestBody:
+          required: true
+          content:
+            application/json:
+              schema: BatchScrapeRequestSchema
+        responses:
+          200:
+            description: Successful operation
+            content:
+              application/json:
+                schema: BatchScrapeResultSchema
+          400:
+            description: Invalid request
+          500:
+            description: Internal server error
+        """
+
+        try:
+            request = BatchScrapeRequestSchema().load(await req.get_media())
+        except ValidationError as e:
+            raise falcon.HTTPBadRequest(
+                title="Invalid request", description=str(e.messages)
             )
-            resp.status = falcon.HTTP_200
-            return
 
-        resp.media = schema.dump(
+        target_urls = request["target_urls"]
+        # Publishing and saving the group are blocking Redis calls
+        group_result = await asyncio.to_thread(enqueue_scrape_batch, target_urls)
+
+        resp.media = dump_batch_scrape_result(
             {
-                "task_id": task_id,
-                "status": task_result.state,
-                "result": task_result.result,
+                "batch_id": group_result.id,
+                "tasks": [
+                    {
+                        "target_url": target_url,
+                        "task_id": task.id,
+                        # Just published, reading each state back would cost
+                        # a backend round trip per task
+                        "status": PENDING,
+                    }
+                    for target_url, task in zip(target_urls, group_result.results)
+                ],
             }
         )
         resp.status = falcon.HTTP_200
 
 
+class BatchScrapeProgressResource:
+    async def on_get(self, req: Request, resp: Response, batch_id: str) -> None:
+        """Request to get the progress of a batch of async scraping tasks
+        ---
+        description: Returns the number of tasks in the batch by state
+        tags:
+          - Async Scrape
+        parameters:
+          - in: path
+            name: batch_id
+            required: true
+            schema:
+              type: string
+            description: ID of the batch to get the progress for
+        responses:
+          200:
+            description: Successful operation
+            content:
+              application/json:
+                schema: BatchScrapeProgressSchema
+          404:
+            description: Batch not found
+          500:
+            description: Internal server error
+        """
+
+        progress = await asyncio.to_thread(get_batch_progress, batch_id)
+        if progress is None:
+            raise falcon.HTTPNotFound(title="Batch not found", description=batch_id)
+
+        logging.info(f"Batch ID: {batch_id} - {progress['ready']}/{progress['total']}")
+
+        resp.media = dump_batch_scrape_progress(progress)
+        resp.status = falcon.HTTP_200
+
+
 class SSEScrapeUpdateResource:
     async def on_get(self, req: Request, resp: Response, task_id: str) -> None:
         """Resource to handle server-sent events for the async scraping task
@@ -139,36 +338,208 @@ class SSEScrapeUpdateResource:
             description: Successful operation
           400:
             description: Invalid request
+          503:
+            description: Too many open streams
           500:
             description: Internal server error
         """
 
-        resp.content_type = "text/event-stream"
-        redis_client = Redis(host="redis", port=6379, db=0)
-        resp.stream = self.stream_response(redis_client, task_id)
+        if not stream_limiter.acquire():
+            raise falcon.HTTPServiceUnavailable(
+                title="Too many open streams",
+                description="Maximum number of SSE connections reached",
+                retry_after=int(SSE_HEARTBEAT_INTERVAL),
+            )
+
+        resp.sse = close_when_done(
+            req, self.stream_response(get_async_redis(), task_id)
+        )
 
     async def stream_response(
         self, redis_client: Redis, task_id: str
-    ) -> AsyncGenerator:
+    ) -> AsyncGenerator[Optional[SSEvent], None]:
         """Stream response for the async scraping task
 
+        The result is read once, and if the task has not finished yet the
+        completion event pushed by the task is awaited instead of polling.
+        A keepalive comment is sent every SSE_HEARTBEAT_INTERVAL seconds while
+        waiting, which also lets a client disconnect be noticed and cleaned up.
+
         Args:
+            redis_client (Redis): Async Redis client
             task_id (str): ID of the task to get the result for
 
         Yields:
-            dict: Server-sent event data
+            SSEvent: Server-sent event
         """
 
         logger.info(f"Task ID: {task_id} - Streaming response")
 
-        while True:
-            result = await redis_client.get(task_id)
+        # Subscribe before reading so a result stored in between is not missed
+        queue = task_events.subscribe(task_id)
+        try:
+            result = await async_load_result(redis_client, task_id)
+            while result is None:
+                try:
+                    event = await asyncio.wait_for(queue.get(), SSE_HEARTBEAT_INTERVAL)
+                except asyncio.TimeoutError:
+                    yield SSEvent(comment=SSE_KEEPALIVE_COMMENT)
+                    continue
+
+                if event is RESYNC:
+                    result = await async_load_result(redis_client, task_id)
+                else:
+                    _, result = event
+
+            if isinstance(result, TaskFailure):
+                logger.info(f"Task ID: {task_id} - failed: {result.error}")
+                yield SSEvent(event=SSE_ERROR_EVENT, text=result.error)
+            else:
+                logger.info(f"Task ID: {task_id} - {result.decode()}")
+                yield SSEvent(data=result)
+        finally:
+            task_events.unsubscribe(task_id, queue)
+            stream_limiter.release()
+
+
+class MultiSSEScrapeUpdateResource:
+    async def on_get(self, req: Request, resp: Response) -> None:
+        """Resource to stream the results of many async scraping tasks over one connection
+        ---
+        description: Returns a server-sent event per task as soon as it finishes, followed by an end event
+        tags:
+          - Async Scrape
+        parameters:
+          - in: query
+            name: task_ids
+            required: false
+            schema:
+              type: string
+            description: Comma-separated IDs of the tasks to stream the results of
+          - in: query
+            name: batch_id
+            required: false
+            schema:
+              type: string
+            description: ID of a batch to stream the results of all its tasks
+          - in: header
+            name: Last-Event-ID
+            required: false
+            schema:
+              type: string
+            description: ID of the last event received, to resume without replaying delivered results
+        responses:
+          200:
+            description: Successful operation
+          400:
+            description: Invalid request
+          404:
+            description: Batch not found
+          503:
+            description: Too many open streams
+          500:
+            description: Internal server error
+        """
+
+        batch_id = req.get_param("batch_id")
+        if batch_id:
+            task_ids = await asyncio.to_thread(get_batch_task_ids, batch_id)
+            if task_ids is None:
+                raise falcon.HTTPNotFound(title="Batch not found", description=batch_id)
+        else:
+            task_ids = parse_task_ids(req.get_param("task_ids"))
+
+        if not task_ids:
+            raise falcon.HTTPBadRequest(
+                title="Missing required parameter", description="task_ids or batch_id"
+            )
+        if len(task_ids) > SSE_MAX_TASKS_PER_STREAM:
+            raise falcon.HTTPBadRequest(
+                title="Too many tasks",
+                description=f"At most {SSE_MAX_TASKS_PER_STREAM} tasks per stream",
+            )
+
+        if not stream_limiter.acquire():
+            raise falcon.HTTPServiceUnavailable(
+                title="Too many open streams",
+                description="Maximum number of SSE connections reached",
+                retry_after=int(SSE_HEARTBEAT_INTERVAL),
+            )
+
+        delivered = decode_cursor(req.get_header("Last-Event-ID"), len(task_ids))
+        resp.sse = close_when_done(
+            req, self.stream_response(get_async_redis(), task_ids, delivered)
+        )
+
+    async def stream_response(
+        self, redis_client: Redis, task_ids: List[str], delivered: Set[int]
+    ) -> AsyncGenerator[Optional[SSEvent], None]:
+        """Stream the results of many async scraping tasks in completion order
+
+        Results already stored are read with a single MGET, the rest are pushed
+        by the task event hub. Every event ID encodes all tasks delivered so far.
+
+        Args:
+            redis_client (Redis): Async Redis client
+            task_ids (List[str]): Ordered IDs of the tasks to stream
+            delivered (Set[int]): Positions of the tasks already delivered
+
+        Yields:
+            SSEvent: Server-sent event
+        """
+
+        logger.info(f"Streaming {len(task_ids)} tasks, {len(delivered)} delivered")
+
+        pending = pending_positions(task_ids, delivered)
+        queue: asyncio.Queue = asyncio.Queue()
+
+        def deliver(task_id: str, outcome: TaskOutcome) -> SSEvent:
+            delivered.add(pending.pop(task_id))
+            task_events.unsubscribe(task_id, queue)
+            if isinstance(outcome, TaskFailure):
+                return SSEvent(
+                    event=SSE_ERROR_EVENT,
+                    event_id=encode_cursor(delivered),
+                    text=encode_task_error(task_id, outcome.error),
+                )
+            return SSEvent(
+                event=SSE_RESULT_EVENT,
+                event_id=encode_cursor(delivered),
+                text=encode_task_result(task_id, outcome),
+            )
+
+        try:
+            # Subscribe before reading so a result stored in between is not missed
+            for task_id in pending:
+                task_events.subscribe(task_id, queue)
+
+            stored = True
+            while pending:
+                if stored:
+                    task_ids_to_read = list(pending)
+                    results = await async_load_results(redis_client, task_ids_to_read)
+                    for task_id, stored_result in zip(task_ids_to_read, results):
+                        if stored_result is not None:
+                            yield deliver(task_id, stored_result)
+                    stored = False
+                    continue
+
+                try:
+                    event = await asyncio.wait_for(queue.get(), SSE_HEARTBEAT_INTERVAL)
+                except asyncio.TimeoutError:
+                    yield SSEvent(comment=SSE_KEEPALIVE_COMMENT)
+                    continue
 
-            logger.info(f"Task ID: {task_id} - {result}")
+                if event is RESYNC:
+                    stored = True
+                    continue
 
-            if result is not None:
-                yield f"data: {result.decode()}\n\n".encode()
-                break
+                task_id, pushed_result = event
+                if task_id in pending:
+                    yield deliver(task_id, pushed_result)
 
-            # Wait for 10ms before checking again
-            await asyncio.sleep(0.01)
+            yield SSEvent(event=SSE_END_EVENT, event_id=encode_cursor(delivered))
+        finally:
+            for task_id in pending:
+                task_events.unsubscribe(task_id, queue)
+            stream_limiter.release()
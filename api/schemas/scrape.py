@@ -1,4 +1,7 @@
-from marshmallow import Schema, fields
+from marshmallow import Schema, fields, validate
+
+from api.settings import BATCH_MAX_SIZE, RESULTS_MAX_TASK_IDS
+from api.utils.serializers import compile_serializer
 
 
 class ScrapeSchema(Schema):
@@ -18,6 +21,8 @@ class ScrapeResultSchema(Schema):
     target_url = fields.Str()
     result = fields.Nested(ScrapeSchema)
     error = fields.Str()
+    cached = fields.Bool()
+    cache_age = fields.Float()
 
 
 class AsyncScrapeResultSchema(ScrapeResultSchema):
@@ -25,3 +30,58 @@ class AsyncScrapeResultSchema(ScrapeResultSchema):
 
     task_id = fields.Str()
     status = fields.Str()
+
+
+class BatchScrapeRequestSchema(Schema):
+    """Schema to represent a request to scrape a batch of target URLs"""
+
+    target_urls = fields.List(
+        fields.Str(validate=validate.Length(min=1)),
+        required=True,
+        validate=validate.Length(min=1, max=BATCH_MAX_SIZE),
+    )
+
+
+class BatchScrapeResultSchema(Schema):
+    """Schema to represent a started batch of asynchronous scrape tasks"""
+
+    batch_id = fields.Str()
+    tasks = fields.List(fields.Nested(AsyncScrapeResultSchema))
+
+
+class BatchScrapeProgressSchema(Schema):
+    """Schema to represent the progress of a batch of asynchronous scrape tasks"""
+
+    batch_id = fields.Str()
+    total = fields.Int()
+    pending = fields.Int()
+    started = fields.Int()
+    succeeded = fields.Int()
+    failed = fields.Int()
+    ready = fields.Int()
+    completed = fields.Bool()
+
+
+class TaskResultsRequestSchema(Schema):
+    """Schema to represent a request for the results of many asynchronous scrape tasks"""
+
+    task_ids = fields.List(
+        fields.Str(validate=validate.Length(min=1)),
+        required=True,
+        validate=validate.Length(min=1, max=RESULTS_MAX_TASK_IDS),
+    )
+    finished_only = fields.Bool(load_default=False)
+
+
+class TaskResultsSchema(Schema):
+    """Schema to represent the results of many asynchronous scrape tasks"""
+
+    tasks = fields.List(fields.Nested(AsyncScrapeResultSchema))
+
+
+# Precompiled dumps of the response schemas, used by the resources per request
+dump_scrape_result = compile_serializer(ScrapeResultSchema)
+dump_async_scrape_result = compile_serializer(AsyncScrapeResultSchema)
+dump_batch_scrape_result = compile_serializer(BatchScrapeResultSchema)
+dump_batch_scrape_progress = compile_serializer(BatchScrapeProgressSchema)
+dump_task_results = compile_serializer(TaskResultsSchema)
@@ -0,0 +1,366 @@
+"""Scrape a list of URLs without the API and Celery, writing JSONL results
+
+URLs are read one per line from a file or stdin and scraped with bounded
+asyncio concurrency by the same extractors as the API. Each result is written
+as a JSON line as soon as it completes, with the input line number since
+results complete out of order.
+
+Redis is not needed: the host limits are kept in process and pages are not
+revalidated. With --redis the limits and stored page validators are shared
+with the API and its workers instead.
+
+With an output file, progress is checkpointed next to it. An interrupted run
+started again with the same arguments skips the lines already done and drops
+any result written after the last checkpoint, so each line is scraped and
+written once.
+
+Usage:
+    python -m api.scrape_cli [INPUT] [--output results.jsonl] [--concurrency N]
+        [--redis]
+"""
+
+import argparse
+import asyncio
+import json
+import logging
+import os
+import random
+import sys
+import time
+from dataclasses import dataclass, field
+from typing import Awaitable, Callable, Iterable, List, Optional, Set, TextIO, Tuple
+
+from api.utils.connections import close_async_redis, disable_redis
+from api.utils.fetch import close_async_client
+from api.utils.latency import percentile
+from api.utils.parsing import shutdown_parse_executor
+from api.utils.scrape import async_scrape_target_page
+
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+DEFAULT_CONCURRENCY = 32
+DEFAULT_CHECKPOINT_EVERY = 1000
+# Latencies kept for the percentiles of the summary, whatever the size of the run
+LATENCY_SAMPLES = 10000
+
+Scrape = Callable[[str], Awaitable[Optional[dict]]]
+
+
+@dataclass
+class Checkpoint:
+    """Input lines done so far
+
+    Every line below the watermark is done, lines above it completed out of
+    order are kept apart until the watermark reaches them.
+    """
+
+    watermark: int = 0
+    done: Set[int] = field(default_factory=set)
+    # Size of the output when the checkpoint was taken
+    output_offset: int = 0
+
+    def is_done(self, line: int) -> bool:
+        return line < self.watermark or line in self.done
+
+    def complete(self, line: int) -> None:
+        self.done.add(line)
+        while self.watermark in self.done:
+            self.done.remove(self.watermark)
+            self.watermark += 1
+
+    @classmethod
+    def load(cls, path: str) -> "Checkpoint":
+        """Read a checkpoint, or start from scratch if there is none
+
+        Args:
+            path (str): Path of the checkpoint file
+
+        Returns:
+            Checkpoint: Progress of the previous run
+        """
+
+        if not os.path.exists(path):
+            return cls()
+
+        with open(path, encoding="utf-8") as f:
+            data = json.load(f)
+        return cls(data["watermark"], set(data["done"]), data["output_offset"])
+
+    def save(self, path: str) -> None:
+        """Write the checkpoint atomically
+
+        Args:
+            path (str): Path of the checkpoint file
+        """
+
+        data = {
+            "watermark": self.watermark,
+            "done": sorted(self.done),
+            "output_offset": self.output_offset,
+        }
+        with open(f"{path}.tmp", "w", encoding="utf-8") as f:
+            json.dump(data, f)
+        os.replace(f"{path}.tmp", path)
+
+
+@dataclass
+class RunSummary:
+    """Outcome of a run"""
+
+    succeeded: int = 0
+    failed: int = 0
+    skipped: int = 0
+    elapsed: float = 0.0
+    # Uniform sample of the latencies of the scraped URLs
+    latencies: List[float] = field(default_factory=list)
+
+    def record_latency(self, seconds: float) -> None:
+        """Add a latency to the sample, replacing a random one once it is full
+
+        Args:
+            seconds (float): Time taken to scrape a URL
+        """
+
+        # Every latency seen so far has the same chance to be in the sample
+        seen = self.succeeded + self.failed
+        if len(self.latencies) < LATENCY_SAMPLES:
+            self.latencies.append(seconds)
+        else:
+            index = random.randrange(seen)
+            if index < LATENCY_SAMPLES:
+                self.latencies[index] = seconds
+
+    def format(self) -> str:
+        scraped = self.succeeded + self.failed
+        throughput = scraped / self.elapsed if self.elapsed else 0.0
+        summary = (
+            f"Scraped {scraped} URLs in {self.elapsed:.1f}s ({throughput:.1f}/s): "
+            f"{self.succeeded} succeeded, {self.failed} failed, "
+            f"{self.skipped} skipped as already done"
+        )
+        if self.latencies:
+            latencies = sorted(self.latencies)
+            summary += ", latency " + ", ".join(
+                f"p{q} {percentile(latencies, q) * 1000:.0f}ms" for q in (50, 95, 99)
+            )
+        return summary
+
+
+async def scrape_lines(
+    lines: Iterable[str],
+    output: TextIO,
+    scrape: Scrape = async_scrape_target_page,
+    concurrency: int = DEFAULT_CONCURRENCY,
+    checkpoint: Optional[Checkpoint] = None,
+    save_checkpoint: Callable[[], None] = lambda: None,
+    checkpoint_every: int = DEFAULT_CHECKPOINT_EVERY,
+) -> RunSummary:
+    """Scrape the URL of each line and write the results as they complete
+
+    Args:
+        lines (Iterable[str]): Input lines, one URL each, blank lines are skipped
+        output (TextIO): Output the JSON lines are written to
+        scrape (Scrape): Scrapes a URL, returning None if it could not be scraped
+        concurrency (int): Number of URLs scraped at once
+        checkpoint (Optional[Checkpoint]): Lines done by a previous run
+        save_checkpoint (Callable[[], None]): Persists the checkpoint
+        checkpoint_every (int): Results between two checkpoints
+
+    Returns:
+        RunSummary: Outcome of the run
+    """
+
+    checkpoint = checkpoint or Checkpoint()
+    summary = RunSummary()
+    # Twice the concurrency keeps the scrapers busy without reading all input
+    queue: "asyncio.Queue[Optional[Tuple[int, str]]]" = asyncio.Queue(
+        maxsize=2 * concurrency
+    )
+
+    async def read_lines() -> None:
+        for number, line in enumerate(lines):
+            url = line.strip()
+            if checkpoint.is_done(number):
+                summary.skipped += 1
+            elif not url:
+                checkpoint.complete(number)
+            else:
+                await queue.put((number, url))
+        for _ in range(concurrency):
+            await queue.put(None)
+
+    async def scrape_urls() -> None:
+        while True:
+            item = await queue.get()
+            if item is None:
+                return
+
+            number, url = item
+            started = time.monotonic()
+            error = None
+            try:
+                result = await scrape(url)
+                if result is None:
+                    error = "could not be scraped"
+            except Exception as e:
+                logger.error(f"Error scraping {url}: {e}")
+                result, error = None, str(e) or type(e).__name__
+            elapsed = time.monotonic() - started
+
+            record = {"line": number, "url": url, "result": result, "error": error}
+            output.write(json.dumps(record) + "\n")
+            checkpoint.complete(number)
+
+            if error is None:
+                summary.succeeded += 1
+            else:
+                summary.failed += 1
+            summary.record_latency(elapsed)
+            if (summary.succeeded + summary.failed) % checkpoint_every == 0:
+                save_checkpoint()
+
+    started = time.monotonic()
+    tasks = [asyncio.create_task(read_lines())]
+    tasks += [asyncio.create_task(scrape_urls()) for _ in range(concurrency)]
+    try:
+        await asyncio.gather(*tasks)
+    finally:
+        # On interruption, URLs still being scraped are left to the next run
+        for task in tasks:
+            task.cancel()
+        save_checkpoint()
+        summary.elapsed = time.monotonic() - started
+    return summary
+
+
+def open_output(path: str, checkpoint: Checkpoint) -> TextIO:
+    """Open the output file, dropping results written after the checkpoint
+
+    Args:
+        path (str): Path of the output file
+        checkpoint (Checkpoint): Progress of the previous run
+
+    Returns:
+        TextIO: Output file positioned at its end
+    """
+
+    output = open(path, "r+" if os.path.exists(path) else "w", encoding="utf-8")
+    output.seek(checkpoint.output_offset)
+    output.truncate()
+    return output
+
+
+async def run(
+    input: TextIO,
+    output_path: Optional[str],
+    checkpoint_path: Optional[str],
+    concurrency: int = DEFAULT_CONCURRENCY,
+    checkpoint_every: int = DEFAULT_CHECKPOINT_EVERY,
+    scrape: Scrape = async_scrape_target_page,
+) -> RunSummary:
+    """Scrape the URLs of an input into a JSONL output, resuming a previous run
+
+    Args:
+        input (TextIO): Input with one URL per line
+        output_path (Optional[str]): Path of the output file, stdout if None
+        checkpoint_path (Optional[str]): Path of the checkpoint file, None to
+            not checkpoint, only used with an output file
+        concurrency (int): Number of URLs scraped at once
+        checkpoint_every (int): Results between two checkpoints
+        scrape (Scrape): Scrapes a URL
+
+    Returns:
+        RunSummary: Outcome of the run
+    """
+
+    if output_path is None:
+        checkpoint_path = None
+    checkpoint = Checkpoint.load(checkpoint_path) if checkpoint_path else Checkpoint()
+    if checkpoint.watermark or checkpoint.done:
+        logger.info(f"Resuming after {checkpoint.watermark} lines")
+    output = open_output(output_path, checkpoint) if output_path else sys.stdout
+
+    def save_checkpoint() -> None:
+        output.flush()
+        if checkpoint_path:
+            # Results must be on disk before the checkpoint counts them as done
+            os.fsync(output.fileno())
+            checkpoint.output_offset = output.tell()
+            checkpoint.save(checkpoint_path)
+
+    try:
+        return await scrape_lines(
+            input,
+            output,
+            scrape=scrape,
+            concurrency=concurrency,
+            checkpoint=checkpoint,
+            save_checkpoint=save_checkpoint,
+            checkpoint_every=checkpoint_every,
+        )
+    finally:
+        if output is not sys.stdout:
+            output.close()
+        await close_async_client()
+        await close_async_redis()
+        shutdown_parse_executor()
+
+
+def main(argv: Optional[List[str]] = None) -> None:
+    """Run the scraper from the command line
+
+    Args:
+        argv (Optional[List[str]]): Command line arguments, sys.argv if None
+    """
+
+    parser = argparse.ArgumentParser(
+        description="Scrape a list of URLs into JSON lines"
+    )
+    parser.add_argument(
+        "input",
+        nargs="?",
+        default="-",
+        help="file with one URL per line, stdin if omitted or -",
+    )
+    parser.add_argument("-o", "--output", help="JSONL output file, stdout if omitted")
+    parser.add_argument("-c", "--concurrency", type=int, default=DEFAULT_CONCURRENCY)
+    parser.add_argument(
+        "--checkpoint",
+        help="checkpoint file, OUTPUT.checkpoint by default when writing to a file",
+    )
+    parser.add_argument(
+        "--checkpoint-every", type=int, default=DEFAULT_CHECKPOINT_EVERY
+    )
+    parser.add_argument(
+        "--redis",
+        action="store_true",
+        help="share the host limits and page validators with the API through Redis",
+    )
+    args = parser.parse_args(argv)
+    if args.checkpoint and not args.output:
+        parser.error(
+            "--checkpoint needs --output, results on stdout can not be resumed"
+        )
+
+    if not args.redis:
+        disable_redis()
+    checkpoint_path = args.checkpoint or (
+        f"{args.output}.checkpoint" if args.output else None
+    )
+    input = sys.stdin if args.input == "-" else open(args.input, encoding="utf-8")
+    with input:
+        summary = asyncio.run(
+            run(
+                input,
+                args.output,
+                checkpoint_path,
+                concurrency=args.concurrency,
+                checkpoint_every=args.checkpoint_every,
+            )
+        )
+    logger.info(summary.format())
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,111 @@
+import json
+import os
+
+# Redis
+REDIS_HOST = os.getenv("REDIS_HOST", "redis")
+REDIS_PORT = int(os.getenv("REDIS_PORT", "6379"))
+REDIS_DB = int(os.getenv("REDIS_DB", "0"))
+REDIS_POOL_SIZE = int(os.getenv("REDIS_POOL_SIZE", "50"))
+REDIS_POOL_TIMEOUT = int(os.getenv("REDIS_POOL_TIMEOUT", "5"))
+
+# Upstream HTTP fetching
+FETCH_TIMEOUT = float(os.getenv("FETCH_TIMEOUT", "10"))
+HTTP_POOL_MAX_CONNECTIONS = int(os.getenv("HTTP_POOL_MAX_CONNECTIONS", "100"))
+HTTP_POOL_MAX_KEEPALIVE_CONNECTIONS = int(
+    os.getenv("HTTP_POOL_MAX_KEEPALIVE_CONNECTIONS", "20")
+)
+FETCH_THREAD_POOL_SIZE = int(os.getenv("FETCH_THREAD_POOL_SIZE", "8"))
+FETCH_MAX_BODY_SIZE = int(os.getenv("FETCH_MAX_BODY_SIZE", str(5 * 1024 * 1024)))
+FETCH_CHUNK_SIZE = int(os.getenv("FETCH_CHUNK_SIZE", str(16 * 1024)))
+SCRAPE_STREAMING_PARSE = os.getenv("SCRAPE_STREAMING_PARSE", "false").lower() == "true"
+PAGE_VALIDATORS_TTL = int(os.getenv("PAGE_VALIDATORS_TTL", str(7 * 24 * 3600)))
+
+# Retries of transient upstream failures, with jittered exponential backoff
+FETCH_RETRIES = int(os.getenv("FETCH_RETRIES", "2"))
+FETCH_BACKOFF_BASE = float(os.getenv("FETCH_BACKOFF_BASE", "0.2"))
+FETCH_BACKOFF_MAX = float(os.getenv("FETCH_BACKOFF_MAX", "5"))
+
+# Adaptive timeouts, derived from the rolling time to response headers of each
+# host once enough samples were seen, and bounded by FETCH_TIMEOUT
+FETCH_ADAPTIVE_TIMEOUT = os.getenv("FETCH_ADAPTIVE_TIMEOUT", "true").lower() == "true"
+FETCH_TIMEOUT_MIN = float(os.getenv("FETCH_TIMEOUT_MIN", "1"))
+FETCH_TIMEOUT_PERCENTILE = float(os.getenv("FETCH_TIMEOUT_PERCENTILE", "99"))
+FETCH_TIMEOUT_MULTIPLIER = float(os.getenv("FETCH_TIMEOUT_MULTIPLIER", "2"))
+LATENCY_WINDOW = int(os.getenv("LATENCY_WINDOW", "500"))
+LATENCY_MIN_SAMPLES = int(os.getenv("LATENCY_MIN_SAMPLES", "20"))
+
+# Hedged async fetches, a duplicate request sent once the first one is slower
+# than the percentile, for at most the ratio of requests to each host
+FETCH_HEDGE = os.getenv("FETCH_HEDGE", "false").lower() == "true"
+FETCH_HEDGE_PERCENTILE = float(os.getenv("FETCH_HEDGE_PERCENTILE", "95"))
+FETCH_HEDGE_MAX_RATIO = float(os.getenv("FETCH_HEDGE_MAX_RATIO", "0.05"))
+
+# Per-host circuit breaker: consecutive failures opening it, seconds before it
+# is probed again and number of probes let through while half-open
+BREAKER_FAILURE_THRESHOLD = int(os.getenv("BREAKER_FAILURE_THRESHOLD", "5"))
+BREAKER_RESET_TIMEOUT = float(os.getenv("BREAKER_RESET_TIMEOUT", "30"))
+BREAKER_HALF_OPEN_PROBES = int(os.getenv("BREAKER_HALF_OPEN_PROBES", "1"))
+
+# Upstream host limits shared by all processes through Redis. Host patterns map
+# to a request rate per second, a burst size and a maximum of requests in flight
+HOST_LIMITS = json.loads(
+    os.getenv(
+        "HOST_LIMITS",
+        '{"*.aptoide.com": {"rate": 20, "burst": 40, "max_in_flight": 32}}',
+    )
+)
+# Seconds after which an in-flight slot of a crashed process is reclaimed, the
+# lease of a running fetch is renewed every third of it
+HOST_SLOT_LEASE = float(os.getenv("HOST_SLOT_LEASE", "30"))
+HOST_SLOT_POLL_INTERVAL = float(os.getenv("HOST_SLOT_POLL_INTERVAL", "0.05"))
+
+# Parsing, "inline", "thread" or "process"
+PARSE_EXECUTOR = os.getenv("PARSE_EXECUTOR", "thread")
+PARSE_WORKERS = int(os.getenv("PARSE_WORKERS", "4"))
+
+# Batch scraping
+BATCH_MAX_SIZE = int(os.getenv("BATCH_MAX_SIZE", "1000"))
+SCRAPE_MANY_CONCURRENCY = int(os.getenv("SCRAPE_MANY_CONCURRENCY", "16"))
+# Task IDs per request to /v2/scrape/results
+RESULTS_MAX_TASK_IDS = int(os.getenv("RESULTS_MAX_TASK_IDS", "5000"))
+
+# Catalogue crawler. Listing pages and sitemaps on the hosts of the seeds are
+# walked, links to hosts matching CRAWL_APP_HOST_PATTERN are apps
+CRAWL_SEEDS = [
+    seed
+    for seed in os.getenv("CRAWL_SEEDS", "https://en.aptoide.com/").split(",")
+    if seed
+]
+CRAWL_APP_HOST_PATTERN = os.getenv(
+    "CRAWL_APP_HOST_PATTERN", r"^(?!www\.)[\w-]+\.[a-z]{2}\.aptoide\.com$"
+)
+# Paths of the listing pages to follow, all pages of the seed hosts by default
+CRAWL_LISTING_PATTERN = os.getenv("CRAWL_LISTING_PATTERN", "")
+CRAWL_MAX_PAGES = int(os.getenv("CRAWL_MAX_PAGES", "1000"))
+CRAWL_QUEUE_SIZE = int(os.getenv("CRAWL_QUEUE_SIZE", "100"))
+CRAWL_WORKERS = int(os.getenv("CRAWL_WORKERS", "8"))
+# Seconds before an app already seen is submitted again to refresh it
+CRAWL_SEEN_TTL = int(os.getenv("CRAWL_SEEN_TTL", str(24 * 3600)))
+CRAWL_TASK_TIMEOUT = float(os.getenv("CRAWL_TASK_TIMEOUT", "300"))
+
+# Task result store. Results expire after RESULT_STORE_TTL seconds and results
+# of at least RESULT_COMPRESS_MIN_SIZE bytes of JSON are compressed
+RESULT_STORE_TTL = int(os.getenv("RESULT_STORE_TTL", str(24 * 3600)))
+RESULT_COMPRESS_MIN_SIZE = int(os.getenv("RESULT_COMPRESS_MIN_SIZE", "512"))
+RESULT_COMPRESS_LEVEL = int(os.getenv("RESULT_COMPRESS_LEVEL", "6"))
+
+# Scrape result cache
+SCRAPE_CACHE_TTL = int(os.getenv("SCRAPE_CACHE_TTL", "3600"))
+SCRAPE_CACHE_STALE_TTL = int(os.getenv("SCRAPE_CACHE_STALE_TTL", "86400"))
+SCRAPE_CACHE_REFRESH_LOCK_TTL = int(os.getenv("SCRAPE_CACHE_REFRESH_LOCK_TTL", "60"))
+
+# Server-sent events
+SSE_MAX_CONNECTIONS = int(os.getenv("SSE_MAX_CONNECTIONS", "1000"))
+SSE_HEARTBEAT_INTERVAL = float(os.getenv("SSE_HEARTBEAT_INTERVAL", "15"))
+SSE_MAX_TASKS_PER_STREAM = int(os.getenv("SSE_MAX_TASKS_PER_STREAM", "1000"))
+# Longest wait in seconds a result request can ask for with ?wait=
+RESULT_MAX_WAIT = float(os.getenv("RESULT_MAX_WAIT", "30"))
+
+# Metrics of the Celery workers. Each worker process serves its own on a port
+# from WORKER_METRICS_PORT, prefork pool processes on the ports after it, 0 disables
+WORKER_METRICS_PORT = int(os.getenv("WORKER_METRICS_PORT", "9808"))
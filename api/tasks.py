@@ -1,44 +1,321 @@
 import json
 import logging
-from typing import Optional
+import time
+from typing import Any, List, Optional, Tuple
 
+from billiard.process import current_process
 from celery import Celery, Task
-from redis import Redis
+from celery.result import AsyncResult, GroupResult
+from celery.signals import before_task_publish, worker_init, worker_process_init
+from celery.states import FAILURE, PENDING, STARTED, SUCCESS
+from celery.utils import uuid
+from prometheus_client import Counter, Histogram
+from redis import RedisError
+from redis.asyncio import Redis as AsyncRedis
+from vine import barrier
 
+from api.settings import (
+    REDIS_DB,
+    REDIS_HOST,
+    REDIS_PORT,
+    RESULT_STORE_TTL,
+    WORKER_METRICS_PORT,
+)
+from api.utils.cache import get_or_scrape
+from api.utils.connections import redis_client
+from api.utils.events import TASK_EVENTS_CHANNEL, encode_task_event, encode_task_failure
+from api.utils.metrics import DURATION_BUCKETS, start_metrics_server
+from api.utils.results import (
+    TaskFailure,
+    TaskOutcome,
+    decode_result,
+    result_key,
+    store_failure,
+    store_result,
+)
 from api.utils.scrape import scrape_target_page
 
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
 
 
-BROKER_URL = "redis://redis:6379/0"
-RESULT_BACKEND = "redis://redis:6379/0"
+BROKER_URL = f"redis://{REDIS_HOST}:{REDIS_PORT}/{REDIS_DB}"
+RESULT_BACKEND = f"redis://{REDIS_HOST}:{REDIS_PORT}/{REDIS_DB}"
 
 app_name = "scrape-tasks-app"
 include = ["api.tasks"]
 
 celery = Celery(app_name, broker=BROKER_URL, backend=RESULT_BACKEND, include=include)
-redis_client = Redis(host="redis", port=6379, db=0)
+# Task states expire with the results they point to
+celery.conf.result_expires = RESULT_STORE_TTL
+# Record when a worker starts a task, for the progress of batches
+celery.conf.task_track_started = True
+
+# Message header with the time a task was published, to measure its queue wait
+PUBLISHED_AT_HEADER = "published_at"
+
+task_queue_wait = Histogram(
+    "task_queue_wait_seconds",
+    "Time scrape tasks waited in the queue before a worker started them",
+    buckets=DURATION_BUCKETS,
+)
+task_duration = Histogram(
+    "task_duration_seconds",
+    "Time workers spent running scrape tasks",
+    buckets=DURATION_BUCKETS,
+)
+task_outcomes = Counter(
+    "task_scrape_outcomes_total",
+    "Scrape tasks run by whether the result was cached, scraped, not found or failed",
+    ("outcome",),
+)
+
+
+@before_task_publish.connect
+def stamp_published_at(headers: Optional[dict] = None, **kwargs: Any) -> None:
+    """Add the publishing time to the headers of every task message"""
+
+    if headers is not None:
+        headers.setdefault(PUBLISHED_AT_HEADER, time.time())
+
+
+@worker_init.connect
+def serve_worker_metrics(**kwargs: Any) -> None:
+    """Serve the metrics of the main worker process
+
+    With the solo and threads pools it is the process running the tasks.
+    """
+
+    if WORKER_METRICS_PORT:
+        start_metrics_server(WORKER_METRICS_PORT)
+
+
+@worker_process_init.connect
+def serve_pool_process_metrics(**kwargs: Any) -> None:
+    """Serve the metrics of a prefork pool process on a port of its own"""
+
+    if WORKER_METRICS_PORT:
+        index = getattr(current_process(), "index", 0)
+        start_metrics_server(WORKER_METRICS_PORT + 1 + index)
+
+
+def report_failure(task_id: str, error: str) -> None:
+    """Store the failure of a task and notify the waiters, as for a result
+
+    Args:
+        task_id (str): ID of the failed task
+        error (str): Error the task failed with
+    """
+
+    try:
+        store_failure(redis_client, task_id, error)
+        redis_client.publish(TASK_EVENTS_CHANNEL, encode_task_failure(task_id, error))
+    except RedisError as e:
+        logger.error(f"Unable to report the failure of task {task_id}: {e}")
 
 
 @celery.task(bind=True)
-def task_scrape_target(self: Task, url: str) -> Optional[dict]:
+def task_scrape_target(self: Task, url: str) -> None:
     """Wrapper for scrape_target_page function to be used as a celery task
 
+    The result is kept in the result store only, the Celery backend just keeps
+    the state of the task.
+
     Args:
         self (Task): Celery task
         url (str): URL of the target page to scrape
+    """
+
+    logger.info(f"Started task to scrape URL: {url}, task ID: {self.request.id}")
+
+    published_at = self.request.get(PUBLISHED_AT_HEADER)
+    if published_at is not None:
+        # Publisher and worker clocks may differ slightly
+        task_queue_wait.observe(max(time.time() - published_at, 0))
+
+    with task_duration.time():
+        task_id = self.request.id
+        try:
+            cached = get_or_scrape(redis_client, url, scrape_target_page)
+        except Exception as e:
+            task_outcomes.labels(outcome="failed").inc()
+            report_failure(task_id, str(e) or type(e).__name__)
+            raise
+
+        if cached.cached:
+            logger.info(f"Served {url} from cache, {cached.age:.0f}s old")
+            task_outcomes.labels(outcome="cached").inc()
+        else:
+            task_outcomes.labels(
+                outcome="scraped" if cached.result else "not_found"
+            ).inc()
+
+        # Store the result and notify the waiters
+        payload = store_result(redis_client, task_id, cached.result)
+        redis_client.publish(
+            TASK_EVENTS_CHANNEL, encode_task_event(task_id, payload.decode("utf-8"))
+        )
+
+
+@celery.task
+def task_publish_batch(batch_id: str, tasks: List[Tuple[str, str]]) -> None:
+    """Publish the scrape tasks of a batch under the IDs given to the caller
+
+    Args:
+        batch_id (str): ID of the batch (Celery group)
+        tasks (List[Tuple[str, str]]): Task ID and URL of each scrape task
+    """
+
+    with celery.producer_or_acquire() as producer:
+        for task_id, url in tasks:
+            task_scrape_target.apply_async(
+                (url,),
+                task_id=task_id,
+                group_id=batch_id,
+                producer=producer,
+                add_to_parent=False,
+            )
+
+    logger.info(f"Published batch {batch_id} of {len(tasks)} scrape tasks")
+
+
+def enqueue_scrape_batch(urls: List[str]) -> GroupResult:
+    """Publish the scrape tasks of many URLs with a single broker round trip
+
+    The task IDs are chosen here and the group is saved with them, so the
+    batch can be followed at once. A single message then carries them to a
+    worker, which publishes the task of every URL.
+
+    Args:
+        urls (List[str]): URLs of the target pages to scrape
 
     Returns:
-        Optional[dict]: Dictionary containing the scraped data
+        GroupResult: Result of the group, saved so it can be restored by its ID
     """
 
-    logger.info(f"Started task to scrape URL: {url}, task ID: {self.request.id}")
+    tasks = [(uuid(), url) for url in urls]
+    # An empty ready barrier, the API never waits on the tasks of a batch
+    group_result = GroupResult(
+        uuid(),
+        [AsyncResult(task_id, app=celery) for task_id, _ in tasks],
+        app=celery,
+        ready_barrier=barrier(),
+    )
+    group_result.save()
+    task_publish_batch.apply_async(args=[group_result.id, tasks])
+
+    logger.info(f"Started batch {group_result.id} to scrape {len(urls)} URLs")
+
+    return group_result
+
+
+def get_batch_task_ids(batch_id: str) -> Optional[List[str]]:
+    """Get the IDs of all tasks in a batch
+
+    Args:
+        batch_id (str): ID of the batch (Celery group)
+
+    Returns:
+        Optional[List[str]]: Task IDs in submission order, None if the batch is unknown
+    """
+
+    group_result = GroupResult.restore(batch_id, app=celery)
+    if group_result is None:
+        return None
+    return [result.id for result in group_result.results]
+
+
+def get_batch_progress(batch_id: str) -> Optional[dict]:
+    """Count the states of all tasks in a batch with a single backend read
+
+    Args:
+        batch_id (str): ID of the batch (Celery group)
+
+    Returns:
+        Optional[dict]: Progress counts of the batch, None if the batch is unknown
+    """
+
+    group_result = GroupResult.restore(batch_id, app=celery)
+    if group_result is None:
+        return None
+
+    backend = celery.backend
+    keys = [backend.get_key_for_task(result.id) for result in group_result.results]
+    values = backend.mget(keys) if keys else []
 
-    task_id = self.request.id
-    result = scrape_target_page(url)
+    counts = {PENDING: 0, STARTED: 0, SUCCESS: 0, FAILURE: 0}
+    for value in values:
+        state = backend.decode_result(value)["status"] if value else PENDING
+        # Retries and custom states are still in progress from the caller's view
+        counts[state if state in counts else STARTED] += 1
+
+    total = len(keys)
+    ready = counts[SUCCESS] + counts[FAILURE]
+    return {
+        "batch_id": batch_id,
+        "total": total,
+        "pending": counts[PENDING],
+        "started": counts[STARTED],
+        "succeeded": counts[SUCCESS],
+        "failed": counts[FAILURE],
+        "ready": ready,
+        "completed": ready == total,
+    }
+
+
+async def async_get_task_results(
+    redis_client: AsyncRedis, task_ids: List[str]
+) -> List[dict]:
+    """Read the states and results of many tasks in a single round trip
+
+    The task states from the Celery backend and the results from the result
+    store are read with two MGETs sent together in one pipeline.
+
+    Args:
+        redis_client (AsyncRedis): Async Redis client
+        task_ids (List[str]): IDs of the tasks
+
+    Returns:
+        List[dict]: Task ID, state and result or error of each task in order
+    """
+
+    backend = celery.backend
+    pipe = redis_client.pipeline(transaction=False)
+    pipe.mget([backend.get_key_for_task(task_id) for task_id in task_ids])
+    pipe.mget([result_key(task_id) for task_id in task_ids])
+    metas, values = await pipe.execute()
+
+    tasks = []
+    for task_id, meta, value in zip(task_ids, metas, values):
+        meta = backend.meta_from_decoded(backend.decode_result(meta)) if meta else {}
+        tasks.append(describe_task(task_id, meta, decode_result(value)))
+    return tasks
+
+
+def describe_task(task_id: str, meta: dict, outcome: Optional[TaskOutcome]) -> dict:
+    """Describe the state of a task, its stored outcome taking precedence
+
+    The task stores its result or failure before Celery records its state, so
+    a stored outcome is the state every endpoint reports, whatever Celery says.
+
+    Args:
+        task_id (str): ID of the task
+        meta (dict): Decoded Celery metadata of the task, empty if unknown
+        outcome (Optional[TaskOutcome]): Stored result or failure of the task
+
+    Returns:
+        dict: Task ID, state and result or error of the task
+    """
 
-    # Store the result in Redis with the task_id as the key
-    redis_client.set(task_id, json.dumps(result))
+    if isinstance(outcome, TaskFailure):
+        return {"task_id": task_id, "status": FAILURE, "error": outcome.error}
+    if outcome is not None:
+        return {"task_id": task_id, "status": SUCCESS, "result": json.loads(outcome)}
 
-    return result
+    task = {"task_id": task_id, "status": meta.get("status", PENDING)}
+    if task["status"] == FAILURE:
+        task["error"] = str(meta["result"])
+    elif task["status"] == SUCCESS:
+        # Succeeded but its result has expired
+        task["result"] = None
+    return task
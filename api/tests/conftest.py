@@ -0,0 +1,17 @@
+import pytest
+
+
+@pytest.fixture(autouse=True)
+def no_host_limits(mocker):
+    """Fetch without the Redis-backed host limiters unless a test enables them"""
+
+    mocker.patch("api.utils.ratelimit.HOST_LIMIT_RULES", [])
+
+
+@pytest.fixture(autouse=True)
+def fresh_breakers(mocker):
+    """Start every test with closed circuits, no latency history and no retry waits"""
+
+    mocker.patch.dict("api.utils.breaker.breakers", clear=True)
+    mocker.patch("api.utils.fetch.FETCH_BACKOFF_BASE", 0)
+    mocker.patch.dict("api.utils.latency.trackers", clear=True)
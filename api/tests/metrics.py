@@ -0,0 +1,15 @@
+from prometheus_client import REGISTRY
+
+
+def metric_value(name: str, **labels: str) -> float:
+    """Read a sample of the default registry, 0 until it is first recorded
+
+    Args:
+        name (str): Sample name, such as a counter's `_total` or a histogram's `_count`
+        labels (str): Label values of the sample
+
+    Returns:
+        float: Current value of the sample
+    """
+
+    return REGISTRY.get_sample_value(name, labels) or 0.0
@@ -0,0 +1,202 @@
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from unittest.mock import MagicMock
+
+import pytest
+from redis import RedisError
+
+from api.crawl import CatalogueCrawler, discover_links
+
+STUB_PAGES = {
+    "/": """<html><body>
+        <a href="https://lords-mobile.en.aptoide.com/">Lords Mobile</a>
+        <a href="https://lords-mobile.en.aptoide.com/versions">Versions</a>
+        <a href="/apps/games">Games</a>
+        <a href="/sitemap.xml">Sitemap</a>
+        <a href="https://www.example.com/">Elsewhere</a>
+    </body></html>""",
+    "/apps/games": """<html><body>
+        <a href="https://clash-royale.en.aptoide.com/">Clash Royale</a>
+        <a href="https://subway-surfers.en.aptoide.com/app">Subway Surfers</a>
+        <a href="/#top">Home</a>
+    </body></html>""",
+    "/sitemap.xml": """<?xml version="1.0" encoding="UTF-8"?>
+        <urlset xmlns="http://www.sitemaps.org/schemas/sitemap/0.9">
+            <url><loc>https://clash-royale.en.aptoide.com/</loc></url>
+            <url><loc>https://candy-crush.en.aptoide.com/</loc></url>
+            <url><loc>https://roblox.en.aptoide.com/</loc></url>
+        </urlset>""",
+}
+STUB_APPS = {
+    "https://lords-mobile.en.aptoide.com",
+    "https://clash-royale.en.aptoide.com",
+    "https://subway-surfers.en.aptoide.com",
+    "https://candy-crush.en.aptoide.com",
+    "https://roblox.en.aptoide.com",
+}
+
+
+class StubSiteHandler(BaseHTTPRequestHandler):
+    def do_GET(self) -> None:
+        page = STUB_PAGES.get(self.path)
+        if page is None:
+            self.send_error(404)
+            return
+
+        body = page.encode("utf-8")
+        self.send_response(200)
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, *args) -> None:
+        pass
+
+
+@pytest.fixture
+def stub_site():
+    """Serve the stub catalogue on a local port
+
+    Returns:
+        str: URL of the home page of the stub catalogue
+    """
+
+    server = ThreadingHTTPServer(("127.0.0.1", 0), StubSiteHandler)
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    yield f"http://127.0.0.1:{server.server_address[1]}/"
+    server.shutdown()
+    server.server_close()
+
+
+@pytest.fixture
+def seen_redis():
+    """Redis mock keeping the seen-set in a dict
+
+    Returns:
+        MagicMock: Mocked Redis client
+    """
+
+    seen = {}
+    lock = threading.Lock()
+
+    def mark_seen(keys, args):
+        member, now, ttl = args
+        with lock:
+            if member in seen and now - seen[member] < ttl:
+                return 0
+            seen[member] = now
+            return 1
+
+    redis = MagicMock()
+    redis.register_script.return_value = mark_seen
+    redis.zrem.side_effect = lambda key, member: seen.pop(member, None)
+    return redis
+
+
+def test_discover_links_resolves_listing_and_sitemap_links():
+    """Test that links are read from both listing pages and sitemaps"""
+
+    assert discover_links(STUB_PAGES["/apps/games"], "http://stub/apps/games") == [
+        "https://clash-royale.en.aptoide.com/",
+        "https://subway-surfers.en.aptoide.com/app",
+        "http://stub/",
+    ]
+    assert discover_links(STUB_PAGES["/sitemap.xml"], "http://stub/sitemap.xml") == [
+        "https://clash-royale.en.aptoide.com/",
+        "https://candy-crush.en.aptoide.com/",
+        "https://roblox.en.aptoide.com/",
+    ]
+
+
+def test_crawler_submits_each_app_once(stub_site, seen_redis):
+    """Test that every app of the stub catalogue is submitted once, across runs
+
+    Args:
+        stub_site (str): URL of the stub catalogue
+        seen_redis (MagicMock): Mocked Redis client
+    """
+
+    submitted = []
+    crawler = CatalogueCrawler([stub_site], seen_redis, submit=submitted.append)
+    crawler.run()
+
+    assert sorted(submitted) == sorted(STUB_APPS)
+    assert crawler.pages == 3
+
+    submitted.clear()
+    CatalogueCrawler([stub_site], seen_redis, submit=submitted.append).run()
+
+    assert submitted == []
+
+
+def test_crawler_forgets_failed_apps(stub_site, seen_redis):
+    """Test that apps failing to scrape are submitted again by the next crawl
+
+    Args:
+        stub_site (str): URL of the stub catalogue
+        seen_redis (MagicMock): Mocked Redis client
+    """
+
+    def fail(base_url):
+        raise TimeoutError("worker too slow")
+
+    crawler = CatalogueCrawler([stub_site], seen_redis, submit=fail)
+    crawler.run()
+    assert crawler.failed == len(STUB_APPS)
+
+    submitted = []
+    CatalogueCrawler([stub_site], seen_redis, submit=submitted.append).run()
+    assert sorted(submitted) == sorted(STUB_APPS)
+
+
+def test_crawler_survives_redis_errors_forgetting_apps(stub_site, seen_redis):
+    """Test that a Redis error forgetting a failed app does not stop the submitters
+
+    Args:
+        stub_site (str): URL of the stub catalogue
+        seen_redis (MagicMock): Mocked Redis client
+    """
+
+    def fail(base_url):
+        raise TimeoutError("worker too slow")
+
+    seen_redis.zrem.side_effect = RedisError("connection lost")
+    crawler = CatalogueCrawler(
+        [stub_site], seen_redis, submit=fail, queue_size=1, workers=1
+    )
+    thread = threading.Thread(target=crawler.run, daemon=True)
+    thread.start()
+    thread.join(5)
+
+    assert not thread.is_alive()
+    assert crawler.failed == len(STUB_APPS)
+
+
+def test_crawler_backpressure(stub_site, seen_redis):
+    """Test that the walk pauses while the queue is full
+
+    Args:
+        stub_site (str): URL of the stub catalogue
+        seen_redis (MagicMock): Mocked Redis client
+    """
+
+    release = threading.Event()
+    crawler = CatalogueCrawler(
+        [stub_site],
+        seen_redis,
+        submit=lambda base_url: release.wait(5),
+        queue_size=1,
+        workers=1,
+    )
+    thread = threading.Thread(target=crawler.run)
+    thread.start()
+    time.sleep(0.5)
+
+    # One app being submitted, one queued and one waiting to be queued
+    assert crawler.discovered == 3
+
+    release.set()
+    thread.join(5)
+    assert crawler.discovered == len(STUB_APPS)
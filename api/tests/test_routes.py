@@ -1,9 +1,16 @@
-from unittest.mock import patch
+import asyncio
+import json
+import time
+from unittest.mock import AsyncMock, MagicMock, PropertyMock, patch
 
 import pytest
 from falcon.testing import ASGIConductor
 
 from api.main import app
+from api.routes.v2.scrape import MultiSSEScrapeUpdateResource, SSEScrapeUpdateResource
+from api.utils.events import encode_task_event, encode_task_failure, task_events
+from api.utils.results import RESULT_ERROR, encode_result, result_key
+from api.utils.sse import encode_cursor, stream_limiter
 
 pytest_plugins = ["pytest_asyncio"]
 
@@ -13,8 +20,9 @@ TEST_APP_DESCRIPTION = "app1 desc"
 TEST_APP_URL = "https://app1.com"
 TEST_TASK_ID = "1234"
 TEST_TASK_PENDING_STATE = "PENDING"
-TEST_TASK_FAILED_STATE = "FAILED"
 TEST_TASK_SUCCESS_STATE = "SUCCESS"
+TEST_BATCH_ID = "5678"
+TEST_BATCH_URLS = ["https://app1.com", "https://app2.com"]
 
 
 @pytest.fixture
@@ -23,76 +31,41 @@ def client():
 
 
 @pytest.fixture
-def celery_task_mock():
-    class CeleryTaskMock:
-        def __init__(self) -> None:
-            self.id = TEST_TASK_ID
-            self.state = TEST_TASK_PENDING_STATE
-
-    return CeleryTaskMock()
+def async_redis_mock(mocker):
+    redis_client = AsyncMock()
+    redis_client.get.return_value = None
+    mocker.patch("api.routes.v1.scrape.get_async_redis", return_value=redis_client)
+    return redis_client
 
 
 @pytest.fixture
-def celery_task_async_result_pending_mock():
-    class CeleryTaskAsyncResultMock:
+def celery_task_mock():
+    class CeleryTaskMock:
         def __init__(self) -> None:
             self.id = TEST_TASK_ID
             self.state = TEST_TASK_PENDING_STATE
 
-        def failed(self):
-            return False
-
-        def ready(self):
-            return False
-
-    return CeleryTaskAsyncResultMock()
-
-
-@pytest.fixture
-def celery_task_async_result_failed_mock():
-    class CeleryTaskAsyncResultMock:
-        def __init__(self) -> None:
-            self.id = TEST_TASK_ID
-            self.state = TEST_TASK_FAILED_STATE
-            self.result = "Unable to scrape target URL"
-
-        def ready(self):
-            return False
-
-        def failed(self):
-            return True
-
-    return CeleryTaskAsyncResultMock()
+    return CeleryTaskMock()
 
 
 @pytest.fixture
-def celery_task_async_result_success_mock():
-    class CeleryTaskAsyncResultMock:
+def celery_group_result_mock(celery_task_mock):
+    class CeleryGroupResultMock:
         def __init__(self) -> None:
-            self.id = TEST_TASK_ID
-            self.state = TEST_TASK_SUCCESS_STATE
-            self.result = {
-                "app_name": TEST_APP_NAME,
-                "app_description": TEST_APP_DESCRIPTION,
-                "app_url": TEST_APP_URL,
-            }
+            self.id = TEST_BATCH_ID
+            self.results = [celery_task_mock for _ in TEST_BATCH_URLS]
 
-        def ready(self):
-            return True
-
-        def failed(self):
-            return False
-
-    return CeleryTaskAsyncResultMock()
+    return CeleryGroupResultMock()
 
 
 @pytest.mark.asyncio
-@patch("api.routes.v1.scrape.scrape_target_page")
-async def test_successful_sync_scrape_resource(mock_scrape, client):
+@patch("api.routes.v1.scrape.async_scrape_target_page")
+async def test_successful_sync_scrape_resource(mock_scrape, async_redis_mock, client):
     """Test /v1/scrape endpoint with synchronous scraping
 
     Args:
-        mock_scrape (MagicMock): Mocked scrape_target_page function
+        mock_scrape (AsyncMock): Mocked async_scrape_target_page function
+        async_redis_mock (AsyncMock): Mocked async Redis client with an empty cache
         client (ASGIConductor): ASGIConductor client
     """
 
@@ -113,6 +86,85 @@ async def test_successful_sync_scrape_resource(mock_scrape, client):
     assert result["app_name"] == TEST_APP_NAME
     assert result["app_description"] == TEST_APP_DESCRIPTION
     assert result["app_url"] == TEST_APP_URL
+    assert response.json["cached"] is False
+
+
+@pytest.mark.asyncio
+@patch("api.routes.v1.scrape.async_scrape_target_page")
+async def test_cached_sync_scrape_resource(mock_scrape, async_redis_mock, client):
+    """Test /v1/scrape endpoint serving a cached result
+
+    Args:
+        mock_scrape (AsyncMock): Mocked async_scrape_target_page function
+        async_redis_mock (AsyncMock): Mocked async Redis client
+        client (ASGIConductor): ASGIConductor client
+    """
+
+    async_redis_mock.get.return_value = json.dumps(
+        {
+            "result": {"app_name": TEST_APP_NAME, "app_url": TEST_APP_URL},
+            "scraped_at": time.time() - 5,
+        }
+    )
+
+    response = await client.simulate_get(
+        "/v1/scrape", params={"target_url": TEST_APP_URL}
+    )
+
+    assert response.status_code == 200
+
+    mock_scrape.assert_not_called()
+    assert response.json["result"]["app_name"] == TEST_APP_NAME
+    assert response.json["cached"] is True
+    assert response.json["cache_age"] >= 5
+
+
+@pytest.mark.asyncio
+@patch("api.routes.v1.scrape.async_scrape_target_page")
+async def test_concurrent_sync_scrape_resource(mock_scrape, async_redis_mock, client):
+    """Test /v1/scrape endpoint collapsing concurrent requests for the same app
+
+    Args:
+        mock_scrape (AsyncMock): Mocked async_scrape_target_page function
+        async_redis_mock (AsyncMock): Mocked async Redis client with an empty cache
+        client (ASGIConductor): ASGIConductor client
+    """
+
+    async def slow_scrape(url: str) -> dict:
+        await asyncio.sleep(0.05)
+        return {"app_name": TEST_APP_NAME, "app_url": TEST_APP_URL}
+
+    mock_scrape.side_effect = slow_scrape
+
+    responses = await asyncio.gather(
+        *(
+            client.simulate_get(
+                "/v1/scrape", params={"target_url": f"{TEST_APP_URL}/app"}
+            )
+            for _ in range(3)
+        )
+    )
+
+    assert all(response.status_code == 200 for response in responses)
+    assert all(
+        response.json["result"]["app_name"] == TEST_APP_NAME for response in responses
+    )
+    mock_scrape.assert_awaited_once()
+
+
+@pytest.mark.asyncio
+async def test_metrics_resource(client):
+    """Test /metrics endpoint exposing metrics in Prometheus text format
+
+    Args:
+        client (ASGIConductor): ASGIConductor client
+    """
+
+    response = await client.simulate_get("/metrics")
+
+    assert response.status_code == 200
+    assert response.headers["content-type"].startswith("text/plain")
+    assert "# TYPE scrape_cache_requests_total counter" in response.text
 
 
 @pytest.mark.asyncio
@@ -167,20 +219,34 @@ async def test_failed_async_scrape_resource(client):
     assert response.status_code == 400
 
 
+@pytest.fixture
+def task_results_mock(mocker):
+    """Patch the read of the task state and the async Redis client of /v2
+
+    Returns:
+        Tuple[MagicMock, AsyncMock]: Mocked async_get_task_results and Redis client
+    """
+
+    get_results = mocker.patch("api.routes.v2.scrape.async_get_task_results")
+    redis_client = AsyncMock()
+    redis_client.get.return_value = None
+    mocker.patch("api.routes.v2.scrape.get_async_redis", return_value=redis_client)
+    return get_results, redis_client
+
+
 @pytest.mark.asyncio
-@patch("api.routes.v2.scrape.task_scrape_target.AsyncResult")
-async def test_async_scrape_pending_result_resource(
-    mock_task_scrape, celery_task_async_result_pending_mock, client
-):
+async def test_async_scrape_pending_result_resource(task_results_mock, client):
     """Test /v2/scrape/result/{task_id} endpoint to get the result of the async scraping task
 
     Args:
-        mock_task_scrape (MagicMock): Mocked task_scrape_target function
-        celery_task_async_result_pending_mock (MagicMock): Mocked Celery task AsycnResult with pending state
+        task_results_mock: Mocked task state read and Redis client
         client (ASGIConductor): ASGIConductor client
     """
 
-    mock_task_scrape.return_value = celery_task_async_result_pending_mock
+    get_results, redis_client = task_results_mock
+    get_results.return_value = [
+        {"task_id": TEST_TASK_ID, "status": TEST_TASK_PENDING_STATE}
+    ]
 
     response = await client.simulate_get(f"/v2/scrape/result/{TEST_TASK_ID}")
 
@@ -188,45 +254,50 @@ async def test_async_scrape_pending_result_resource(
 
     assert response.json["task_id"] == TEST_TASK_ID
     assert response.json["status"] == TEST_TASK_PENDING_STATE
+    get_results.assert_awaited_once_with(redis_client, [TEST_TASK_ID])
 
 
 @pytest.mark.asyncio
-@patch("api.routes.v2.scrape.task_scrape_target.AsyncResult")
-async def test_async_scrape_failed_result_resource(
-    mock_task_scrape, celery_task_async_result_failed_mock, client
-):
+async def test_async_scrape_failed_result_resource(task_results_mock, client):
     """Test /v2/scrape/result/{task_id} endpoint to get the result of the async scraping task
 
     Args:
-        mock_task_scrape (MagicMock): Mocked task_scrape_target function
-        celery_task_async_result_failed_mock (MagicMock): Mocked Celery task AsycnResult with failed state
+        task_results_mock: Mocked task state read and Redis client
         client (ASGIConductor): ASGIConductor client
     """
 
-    mock_task_scrape.return_value = celery_task_async_result_failed_mock
+    get_results, _ = task_results_mock
+    get_results.return_value = [
+        {"task_id": TEST_TASK_ID, "status": "FAILURE", "error": "Unable to scrape"}
+    ]
 
     response = await client.simulate_get(f"/v2/scrape/result/{TEST_TASK_ID}")
 
     assert response.status_code == 200
 
     assert response.json["task_id"] == TEST_TASK_ID
-    assert response.json["status"] == TEST_TASK_FAILED_STATE
+    assert response.json["status"] == "FAILURE"
+    assert response.json["error"] == "Unable to scrape"
 
 
 @pytest.mark.asyncio
-@patch("api.routes.v2.scrape.task_scrape_target.AsyncResult")
-async def test_async_scrape_success_result_resource(
-    mock_task_scrape, celery_task_async_result_success_mock, client
-):
+async def test_async_scrape_success_result_resource(task_results_mock, client):
     """Test /v2/scrape/result/{task_id} endpoint to get the result of the async scraping task
 
     Args:
-        mock_task_scrape (MagicMock): Mocked task_scrape_target function
-        celery_task_async_result_success_mock (MagicMock): Mocked Celery task AsycnResult with success state
+        task_results_mock: Mocked task state read and Redis client
         client (ASGIConductor): ASGIConductor client
     """
 
-    mock_task_scrape.return_value = celery_task_async_result_success_mock
+    get_results, _ = task_results_mock
+    result = {
+        "app_name": TEST_APP_NAME,
+        "app_description": TEST_APP_DESCRIPTION,
+        "app_url": TEST_APP_URL,
+    }
+    get_results.return_value = [
+        {"task_id": TEST_TASK_ID, "status": TEST_TASK_SUCCESS_STATE, "result": result}
+    ]
 
     response = await client.simulate_get(f"/v2/scrape/result/{TEST_TASK_ID}")
 
@@ -234,6 +305,538 @@ async def test_async_scrape_success_result_resource(
 
     assert response.json["task_id"] == TEST_TASK_ID
     assert response.json["status"] == TEST_TASK_SUCCESS_STATE
+    assert response.json["result"] == result
+
+
+@pytest.mark.asyncio
+async def test_async_scrape_result_resource_wait(task_results_mock, mocker, client):
+    """Test /v2/scrape/result/{task_id}?wait= answering when the task completes
+
+    Args:
+        task_results_mock: Mocked task state read and Redis client
+        mocker: Pytest mocker fixture
+        client (ASGIConductor): ASGIConductor client
+    """
+
+    get_results, redis_client = task_results_mock
+    get_results.return_value = [
+        {"task_id": TEST_TASK_ID, "status": TEST_TASK_PENDING_STATE}
+    ]
+    mocker.patch.object(task_events, "start")
+
+    started = time.monotonic()
+    request = asyncio.ensure_future(
+        client.simulate_get(f"/v2/scrape/result/{TEST_TASK_ID}", params={"wait": 5})
+    )
+    await asyncio.sleep(0.01)
+    task_events.dispatch(
+        encode_task_event(TEST_TASK_ID, f'{{"app_name": "{TEST_APP_NAME}"}}').encode()
+    )
+    response = await request
+
+    assert time.monotonic() - started < 1
+    assert response.status_code == 200
+    assert response.json["status"] == TEST_TASK_SUCCESS_STATE
     assert response.json["result"]["app_name"] == TEST_APP_NAME
-    assert response.json["result"]["app_description"] == TEST_APP_DESCRIPTION
-    assert response.json["result"]["app_url"] == TEST_APP_URL
+    assert redis_client.get.await_count == 1
+    assert task_events.waiting() == 0
+
+
+@pytest.mark.asyncio
+async def test_async_scrape_result_resource_wait_failed(
+    task_results_mock, mocker, client
+):
+    """Test /v2/scrape/result/{task_id}?wait= answering as soon as the task fails
+
+    Args:
+        task_results_mock: Mocked task state read and Redis client
+        mocker: Pytest mocker fixture
+        client (ASGIConductor): ASGIConductor client
+    """
+
+    get_results, _ = task_results_mock
+    get_results.return_value = [
+        {"task_id": TEST_TASK_ID, "status": TEST_TASK_PENDING_STATE}
+    ]
+    mocker.patch.object(task_events, "start")
+
+    started = time.monotonic()
+    request = asyncio.ensure_future(
+        client.simulate_get(f"/v2/scrape/result/{TEST_TASK_ID}", params={"wait": 5})
+    )
+    await asyncio.sleep(0.01)
+    task_events.dispatch(encode_task_failure(TEST_TASK_ID, "Unable to scrape").encode())
+    response = await request
+
+    assert time.monotonic() - started < 1
+    assert response.status_code == 200
+    assert response.json["status"] == "FAILURE"
+    assert response.json["error"] == "Unable to scrape"
+    assert task_events.waiting() == 0
+
+
+@pytest.mark.asyncio
+async def test_async_scrape_result_resource_wait_expired(
+    task_results_mock, mocker, client
+):
+    """Test /v2/scrape/result/{task_id}?wait= answering with the state once the wait expires
+
+    Args:
+        task_results_mock: Mocked task state read and Redis client
+        mocker: Pytest mocker fixture
+        client (ASGIConductor): ASGIConductor client
+    """
+
+    get_results, _ = task_results_mock
+    get_results.return_value = [
+        {"task_id": TEST_TASK_ID, "status": TEST_TASK_PENDING_STATE}
+    ]
+    mocker.patch.object(task_events, "start")
+
+    response = await client.simulate_get(
+        f"/v2/scrape/result/{TEST_TASK_ID}", params={"wait": 0.05}
+    )
+
+    assert response.status_code == 200
+    assert response.json["status"] == TEST_TASK_PENDING_STATE
+    assert task_events.waiting() == 0
+
+
+@pytest.mark.asyncio
+@pytest.mark.parametrize("wait", ["-1", "soon"])
+async def test_async_scrape_result_resource_invalid_wait(wait, client):
+    """Test /v2/scrape/result/{task_id} with an invalid wait
+
+    Args:
+        wait (str): Invalid wait parameter
+        client (ASGIConductor): ASGIConductor client
+    """
+
+    response = await client.simulate_get(
+        f"/v2/scrape/result/{TEST_TASK_ID}", params={"wait": wait}
+    )
+
+    assert response.status_code == 400
+
+
+@pytest.mark.asyncio
+@pytest.mark.parametrize(
+    "finished_only, expected_ids", [(False, ["1", "2", "3"]), (True, ["1", "2"])]
+)
+async def test_task_results_resource(finished_only, expected_ids, mocker, client):
+    """Test /v2/scrape/results endpoint to get the results of many tasks at once
+
+    Args:
+        finished_only (bool): Whether to only return finished tasks
+        expected_ids (List[str]): IDs of the tasks expected in the response
+        mocker: Pytest mocker fixture
+        client (ASGIConductor): ASGIConductor client
+    """
+
+    result = {"app_name": TEST_APP_NAME, "app_url": TEST_APP_URL}
+    mock_get_results = mocker.patch(
+        "api.routes.v2.scrape.async_get_task_results",
+        return_value=[
+            {"task_id": "1", "status": TEST_TASK_SUCCESS_STATE, "result": result},
+            {"task_id": "2", "status": "FAILURE", "error": "error"},
+            {"task_id": "3", "status": TEST_TASK_PENDING_STATE},
+        ],
+    )
+    mocker.patch("api.routes.v2.scrape.get_async_redis")
+
+    response = await client.simulate_post(
+        "/v2/scrape/results",
+        json={"task_ids": ["1", "2", "3"], "finished_only": finished_only},
+    )
+
+    assert response.status_code == 200
+
+    assert mock_get_results.call_args.args[1] == ["1", "2", "3"]
+    tasks = response.json["tasks"]
+    assert [task["task_id"] for task in tasks] == expected_ids
+    assert tasks[0]["result"] == result
+    assert tasks[1]["error"] == "error"
+
+
+@pytest.mark.asyncio
+@pytest.mark.parametrize("body", [{}, {"task_ids": []}, {"task_ids": [""]}])
+async def test_failed_task_results_resource(body, client):
+    """Test /v2/scrape/results endpoint with a missing or invalid list of task IDs
+
+    Args:
+        body (dict): Invalid request body
+        client (ASGIConductor): ASGIConductor client
+    """
+
+    response = await client.simulate_post("/v2/scrape/results", json=body)
+
+    assert response.status_code == 400
+
+
+@pytest.mark.asyncio
+@patch("api.routes.v2.scrape.enqueue_scrape_batch")
+async def test_successful_batch_scrape_resource(
+    mock_enqueue_batch, celery_group_result_mock, client
+):
+    """Test /v2/scrape/batch endpoint to start a batch of async scraping tasks
+
+    Args:
+        mock_enqueue_batch (MagicMock): Mocked enqueue_scrape_batch function
+        celery_group_result_mock (MagicMock): Mocked Celery group result
+        client (ASGIConductor): ASGIConductor client
+    """
+
+    mock_enqueue_batch.return_value = celery_group_result_mock
+
+    response = await client.simulate_post(
+        "/v2/scrape/batch", json={"target_urls": TEST_BATCH_URLS}
+    )
+
+    assert response.status_code == 200
+
+    mock_enqueue_batch.assert_called_once_with(TEST_BATCH_URLS)
+    assert response.json["batch_id"] == TEST_BATCH_ID
+    assert [task["target_url"] for task in response.json["tasks"]] == TEST_BATCH_URLS
+    assert all(task["task_id"] == TEST_TASK_ID for task in response.json["tasks"])
+
+
+@pytest.mark.asyncio
+@patch("api.routes.v2.scrape.enqueue_scrape_batch")
+async def test_batch_scrape_resource_does_not_read_states(mock_enqueue_batch, client):
+    """Test /v2/scrape/batch endpoint answering without a backend read per task
+
+    Args:
+        mock_enqueue_batch (MagicMock): Mocked enqueue_scrape_batch function
+        client (ASGIConductor): ASGIConductor client
+    """
+
+    state = PropertyMock(return_value=TEST_TASK_SUCCESS_STATE)
+    task = MagicMock(id=TEST_TASK_ID)
+    type(task).state = state
+    mock_enqueue_batch.return_value = MagicMock(
+        id=TEST_BATCH_ID, results=[task for _ in TEST_BATCH_URLS]
+    )
+
+    response = await client.simulate_post(
+        "/v2/scrape/batch", json={"target_urls": TEST_BATCH_URLS}
+    )
+
+    assert response.status_code == 200
+    assert all(
+        task["status"] == TEST_TASK_PENDING_STATE for task in response.json["tasks"]
+    )
+    state.assert_not_called()
+
+
+@pytest.mark.asyncio
+@pytest.mark.parametrize("body", [{}, {"target_urls": []}, {"target_urls": "x"}])
+async def test_failed_batch_scrape_resource(body, client):
+    """Test /v2/scrape/batch endpoint with a missing or invalid list of target URLs
+
+    Args:
+        body (dict): Invalid request body
+        client (ASGIConductor): ASGIConductor client
+    """
+
+    response = await client.simulate_post("/v2/scrape/batch", json=body)
+
+    assert response.status_code == 400
+
+
+@pytest.mark.asyncio
+@patch("api.routes.v2.scrape.get_batch_progress")
+async def test_batch_scrape_progress_resource(mock_batch_progress, client):
+    """Test /v2/scrape/batch/{batch_id} endpoint to get the progress of a batch
+
+    Args:
+        mock_batch_progress (MagicMock): Mocked get_batch_progress function
+        client (ASGIConductor): ASGIConductor client
+    """
+
+    mock_batch_progress.return_value = {
+        "batch_id": TEST_BATCH_ID,
+        "total": 2,
+        "pending": 1,
+        "started": 0,
+        "succeeded": 1,
+        "failed": 0,
+        "ready": 1,
+        "completed": False,
+    }
+
+    response = await client.simulate_get(f"/v2/scrape/batch/{TEST_BATCH_ID}")
+
+    assert response.status_code == 200
+
+    assert response.json["batch_id"] == TEST_BATCH_ID
+    assert response.json["succeeded"] == 1
+    assert response.json["completed"] is False
+
+
+@pytest.mark.asyncio
+@patch("api.routes.v2.scrape.get_batch_progress", return_value=None)
+async def test_batch_scrape_progress_resource_not_found(mock_batch_progress, client):
+    """Test /v2/scrape/batch/{batch_id} endpoint with an unknown batch ID
+
+    Args:
+        mock_batch_progress (MagicMock): Mocked get_batch_progress function
+        client (ASGIConductor): ASGIConductor client
+    """
+
+    response = await client.simulate_get(f"/v2/scrape/batch/{TEST_BATCH_ID}")
+
+    assert response.status_code == 404
+
+
+@pytest.mark.asyncio
+async def test_sse_stream_response_finished_task(mocker):
+    """Test that the SSE stream sends the result of an already finished task
+
+    Args:
+        mocker: Pytest mocker fixture
+    """
+
+    mocker.patch.object(task_events, "start")
+    redis_client = AsyncMock()
+    redis_client.get.return_value = encode_result(b'{"app_name": "app1"}')
+
+    stream = SSEScrapeUpdateResource().stream_response(redis_client, TEST_TASK_ID)
+    events = [event.serialize() async for event in stream]
+
+    assert events == [b'data: {"app_name": "app1"}\n\n']
+    assert task_events.waiting() == 0
+
+
+@pytest.mark.asyncio
+async def test_sse_stream_response_pushed_result(mocker):
+    """Test that the SSE stream waits for the completion event instead of polling
+
+    Args:
+        mocker: Pytest mocker fixture
+    """
+
+    mocker.patch.object(task_events, "start")
+    redis_client = AsyncMock()
+    redis_client.get.return_value = None
+
+    stream = SSEScrapeUpdateResource().stream_response(redis_client, TEST_TASK_ID)
+    next_event = asyncio.ensure_future(stream.__anext__())
+    await asyncio.sleep(0.01)
+
+    task_events.dispatch(
+        encode_task_event(TEST_TASK_ID, '{"app_name": "app1"}').encode()
+    )
+
+    event = await next_event
+    assert event.serialize() == b'data: {"app_name": "app1"}\n\n'
+    assert redis_client.get.await_count == 1
+    await stream.aclose()
+    assert task_events.waiting() == 0
+
+
+@pytest.mark.asyncio
+@patch("api.routes.v2.scrape.SSE_HEARTBEAT_INTERVAL", 0.01)
+async def test_sse_stream_response_keepalive(mocker):
+    """Test that the SSE stream sends keepalive comments while the task is running
+
+    Args:
+        mocker: Pytest mocker fixture
+    """
+
+    mocker.patch.object(task_events, "start")
+    redis_client = AsyncMock()
+    redis_client.get.return_value = None
+    stream_limiter.acquire()
+    open_streams = stream_limiter.open
+
+    stream = SSEScrapeUpdateResource().stream_response(redis_client, TEST_TASK_ID)
+    event = await stream.__anext__()
+
+    assert event.serialize() == b": keepalive\n\n"
+
+    # Closing the stream, e.g. after a client disconnect, releases its resources
+    await stream.aclose()
+    assert task_events.waiting() == 0
+    assert stream_limiter.open == open_streams - 1
+
+
+@pytest.mark.asyncio
+async def test_sse_scrape_updates_resource_limit(mocker, client):
+    """Test that SSE streams are rejected once the connection limit is reached
+
+    Args:
+        mocker: Pytest mocker fixture
+        client (ASGIConductor): ASGIConductor client
+    """
+
+    mocker.patch.object(stream_limiter, "open", stream_limiter.limit)
+
+    response = await client.simulate_get(f"/v2/scrape/updates/{TEST_TASK_ID}")
+
+    assert response.status_code == 503
+
+
+@pytest.mark.asyncio
+async def test_multi_sse_stream_response(mocker):
+    """Test that the multiplexed SSE stream sends each result once in completion order
+
+    Args:
+        mocker: Pytest mocker fixture
+    """
+
+    mocker.patch.object(task_events, "start")
+    redis_client = AsyncMock()
+    redis_client.mget.return_value = [
+        None,
+        encode_result(b'{"app_name": "app2"}'),
+        None,
+    ]
+    stream_limiter.acquire()
+
+    stream = MultiSSEScrapeUpdateResource().stream_response(
+        redis_client, ["task-1", "task-2", "task-3"], {2}
+    )
+
+    first = await stream.__anext__()
+    assert first.event == "result"
+    assert json.loads(first.text) == {
+        "task_id": "task-2",
+        "result": {"app_name": "app2"},
+    }
+    assert first.event_id == encode_cursor({1, 2})
+
+    next_event = asyncio.ensure_future(stream.__anext__())
+    await asyncio.sleep(0.01)
+    task_events.dispatch(encode_task_event("task-1", '{"app_name": "app1"}').encode())
+
+    second = await next_event
+    assert json.loads(second.text)["task_id"] == "task-1"
+    assert second.event_id == encode_cursor({0, 1, 2})
+
+    end = await stream.__anext__()
+    assert end.event == "end"
+    assert task_events.waiting() == 0
+    redis_client.mget.assert_awaited_once_with(
+        [result_key("task-1"), result_key("task-2")]
+    )
+
+
+@pytest.mark.asyncio
+@patch("api.routes.v2.scrape.SSE_HEARTBEAT_INTERVAL", 0.01)
+async def test_multi_sse_scrape_updates_resource_disconnect(mocker):
+    """Test that a client disconnect releases the subscriptions of the stream at once
+
+    Args:
+        mocker: Pytest mocker fixture
+    """
+
+    mocker.patch.object(task_events, "start")
+    redis_client = AsyncMock()
+    redis_client.mget.return_value = [None, None]
+    mocker.patch("api.routes.v2.scrape.get_async_redis", return_value=redis_client)
+    open_streams = stream_limiter.open
+    events = iter([{"type": "http.request", "body": b"", "more_body": False}])
+
+    async def receive():
+        return next(events, {"type": "http.disconnect"})
+
+    scope = {
+        "type": "http",
+        "asgi": {"version": "3.0"},
+        "http_version": "1.1",
+        "method": "GET",
+        "path": "/v2/scrape/updates",
+        "query_string": b"task_ids=task-1,task-2",
+        "headers": [],
+    }
+    await app(scope, receive, AsyncMock())
+
+    assert task_events.waiting() == 0
+    assert stream_limiter.open == open_streams
+
+
+@pytest.mark.asyncio
+async def test_multi_sse_stream_response_failed_task(mocker):
+    """Test that the multiplexed SSE stream sends an error event for a failed task
+
+    Args:
+        mocker: Pytest mocker fixture
+    """
+
+    mocker.patch.object(task_events, "start")
+    redis_client = AsyncMock()
+    redis_client.mget.return_value = [None, RESULT_ERROR + b"stored failure"]
+    stream_limiter.acquire()
+
+    stream = MultiSSEScrapeUpdateResource().stream_response(
+        redis_client, ["task-1", "task-2"], set()
+    )
+
+    stored = await stream.__anext__()
+    assert stored.event == "error"
+    assert json.loads(stored.text) == {"task_id": "task-2", "error": "stored failure"}
+
+    next_event = asyncio.ensure_future(stream.__anext__())
+    await asyncio.sleep(0.01)
+    task_events.dispatch(encode_task_failure("task-1", "pushed failure").encode())
+
+    pushed = await next_event
+    assert pushed.event == "error"
+    assert json.loads(pushed.text) == {"task_id": "task-1", "error": "pushed failure"}
+
+    end = await stream.__anext__()
+    assert end.event == "end"
+    assert end.event_id == encode_cursor({0, 1})
+
+
+@pytest.mark.asyncio
+async def test_sse_stream_response_failed_task(mocker):
+    """Test that the SSE stream sends an error event when the task fails
+
+    Args:
+        mocker: Pytest mocker fixture
+    """
+
+    mocker.patch.object(task_events, "start")
+    redis_client = AsyncMock()
+    redis_client.get.return_value = None
+
+    stream = SSEScrapeUpdateResource().stream_response(redis_client, TEST_TASK_ID)
+    next_event = asyncio.ensure_future(stream.__anext__())
+    await asyncio.sleep(0.01)
+    task_events.dispatch(encode_task_failure(TEST_TASK_ID, "failure").encode())
+
+    event = await next_event
+    assert event.serialize() == b"event: error\ndata: failure\n\n"
+    await stream.aclose()
+    assert task_events.waiting() == 0
+
+
+@pytest.mark.asyncio
+async def test_multi_sse_scrape_updates_resource_missing_tasks(client):
+    """Test that the multiplexed SSE endpoint requires task IDs or a batch ID
+
+    Args:
+        client (ASGIConductor): ASGIConductor client
+    """
+
+    response = await client.simulate_get("/v2/scrape/updates")
+
+    assert response.status_code == 400
+
+
+@pytest.mark.asyncio
+@patch("api.routes.v2.scrape.get_batch_task_ids", return_value=None)
+async def test_multi_sse_scrape_updates_resource_unknown_batch(mock_task_ids, client):
+    """Test that the multiplexed SSE endpoint rejects an unknown batch
+
+    Args:
+        mock_task_ids (MagicMock): Mocked get_batch_task_ids function
+        client (ASGIConductor): ASGIConductor client
+    """
+
+    response = await client.simulate_get(
+        "/v2/scrape/updates", params={"batch_id": TEST_BATCH_ID}
+    )
+
+    assert response.status_code == 404
@@ -0,0 +1,146 @@
+import asyncio
+import io
+import json
+
+import pytest
+
+from api.scrape_cli import LATENCY_SAMPLES, RunSummary, main, run
+
+TEST_URLS = [f"https://app-{i}.en.aptoide.com" for i in range(10)]
+
+
+class Interrupted(BaseException):
+    """Stands for the run being killed"""
+
+
+def read_records(path):
+    with open(path, encoding="utf-8") as f:
+        return [json.loads(line) for line in f]
+
+
+async def fake_scrape(url):
+    # Later URLs finish first so results complete out of order
+    await asyncio.sleep(0.01 * (10 - int(url.split("-")[1].split(".")[0])))
+    if url.endswith("app-3.en.aptoide.com"):
+        return None
+    return {"app_name": url}
+
+
+@pytest.mark.asyncio
+async def test_run_writes_jsonl_results(tmp_path):
+    """Test that every URL gets a JSON line and the summary counts them
+
+    Args:
+        tmp_path: Pytest temporary directory
+    """
+
+    output = tmp_path / "results.jsonl"
+    lines = io.StringIO("\n".join(TEST_URLS[:5] + [""] + TEST_URLS[5:]) + "\n")
+
+    summary = await run(
+        lines,
+        str(output),
+        str(output) + ".checkpoint",
+        concurrency=4,
+        scrape=fake_scrape,
+    )
+
+    records = read_records(output)
+    assert sorted(record["url"] for record in records) == TEST_URLS
+    failed = [record for record in records if record["error"]]
+    assert [record["url"] for record in failed] == [TEST_URLS[3]]
+    assert (summary.succeeded, summary.failed, summary.skipped) == (9, 1, 0)
+    assert "p99" in summary.format()
+
+
+@pytest.mark.asyncio
+async def test_run_resumes_from_checkpoint(tmp_path):
+    """Test that an interrupted run resumes without redoing or repeating results
+
+    Args:
+        tmp_path: Pytest temporary directory
+    """
+
+    output = tmp_path / "results.jsonl"
+    checkpoint = str(output) + ".checkpoint"
+    scraped = []
+
+    async def interrupted_scrape(url):
+        if url == TEST_URLS[6]:
+            raise Interrupted()
+        scraped.append(url)
+        return {"app_name": url}
+
+    with pytest.raises(Interrupted):
+        await run(
+            io.StringIO("\n".join(TEST_URLS)),
+            str(output),
+            checkpoint,
+            concurrency=1,
+            checkpoint_every=4,
+            scrape=interrupted_scrape,
+        )
+    assert scraped == TEST_URLS[:6]
+
+    # Results written after the last checkpoint, as a kill leaves them, are dropped
+    with open(output, "a", encoding="utf-8") as f:
+        f.write(json.dumps({"url": "written after the checkpoint"}) + "\n")
+
+    async def scrape(url):
+        scraped.append(url)
+        return {"app_name": url}
+
+    scraped.clear()
+    summary = await run(
+        io.StringIO("\n".join(TEST_URLS)),
+        str(output),
+        checkpoint,
+        concurrency=2,
+        scrape=scrape,
+    )
+
+    assert sorted(scraped) == TEST_URLS[6:]
+    assert summary.skipped == 6
+    assert sorted(record["url"] for record in read_records(output)) == TEST_URLS
+
+
+def test_run_summary_without_results():
+    """Test that an empty run can be summarized"""
+
+    assert RunSummary().format().startswith("Scraped 0 URLs")
+
+
+def test_run_summary_bounds_latencies():
+    """Test that the latencies kept for the summary are bounded"""
+
+    summary = RunSummary()
+    for i in range(2 * LATENCY_SAMPLES):
+        summary.succeeded += 1
+        summary.record_latency(i / 1000)
+
+    assert len(summary.latencies) == LATENCY_SAMPLES
+    # Later latencies replace earlier ones in the sample
+    assert max(summary.latencies) >= LATENCY_SAMPLES / 1000
+    assert "p50" in summary.format()
+
+
+@pytest.mark.parametrize("argv, disabled", [([], True), (["--redis"], False)])
+def test_main_runs_without_redis(mocker, tmp_path, argv, disabled):
+    """Test that the command line scrapes without Redis unless asked to use it
+
+    Args:
+        mocker: Pytest mocker fixture
+        tmp_path: Pytest temporary directory
+        argv (list): Extra command line arguments
+        disabled (bool): Whether Redis is expected to be disabled
+    """
+
+    input = tmp_path / "urls.txt"
+    input.write_text("")
+    disable_redis = mocker.patch("api.scrape_cli.disable_redis")
+    mocker.patch("api.scrape_cli.run", new=mocker.MagicMock())
+    mocker.patch("api.scrape_cli.asyncio.run", return_value=RunSummary())
+
+    main([str(input)] + argv)
+
+    assert disable_redis.called == disabled
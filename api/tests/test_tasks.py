@@ -1,9 +1,22 @@
 import json
-from unittest.mock import patch
+import time
+from unittest.mock import AsyncMock, MagicMock, patch
 
 import pytest
 
-from api.tasks import task_scrape_target
+from api.settings import RESULT_STORE_TTL
+from api.tasks import (
+    async_get_task_results,
+    celery,
+    enqueue_scrape_batch,
+    get_batch_progress,
+    stamp_published_at,
+    task_publish_batch,
+    task_scrape_target,
+)
+from api.tests.metrics import metric_value
+from api.utils.events import TASK_EVENTS_CHANNEL, encode_task_event, encode_task_failure
+from api.utils.results import RESULT_ERROR, encode_result, result_key
 
 TEST_APP_URL = "https://test.com"
 TEST_TASK_SCRAPE_TARGET_PAGE_RESULT = {
@@ -14,6 +27,7 @@ TEST_TASK_SCRAPE_TARGET_PAGE_RESULT = {
     "app_release_date": "test-app-release-date",
 }
 TEST_TASK_ID = "test-task-id"
+TEST_BATCH_ID = "test-batch-id"
 
 
 @pytest.fixture
@@ -36,18 +50,244 @@ def test_task_scrape_target(
         mock_scrape_target_page (MagicMock): Mocked scrape_target_page function
     """
 
-    # Mock the task request ID
+    # Mock the task request ID, published a second ago, and a cache miss
     mock_task_request.id = TEST_TASK_ID
+    mock_task_request.get.return_value = time.time() - 1
+    mock_redis_client.get.return_value = None
+    waits = metric_value("task_queue_wait_seconds_count")
+    runs = metric_value("task_duration_seconds_count")
+    scraped = metric_value("task_scrape_outcomes_total", outcome="scraped")
 
-    # Run the task
-    result = task_scrape_target(TEST_APP_URL)
+    # Run the task, the result is only kept in the result store
+    assert task_scrape_target(TEST_APP_URL) is None
 
-    assert result == TEST_TASK_SCRAPE_TARGET_PAGE_RESULT
+    # Assert the queue wait, run time and outcome were recorded
+    assert metric_value("task_queue_wait_seconds_count") == waits + 1
+    assert metric_value("task_duration_seconds_count") == runs + 1
+    assert metric_value("task_scrape_outcomes_total", outcome="scraped") == scraped + 1
 
     # Assert scrape_target_page was called correctly
     mock_scrape_target_page.assert_called_once_with(TEST_APP_URL)
 
-    # Assert Redis set method was called with correct arguments
-    mock_redis_client.set.assert_called_once_with(
-        TEST_TASK_ID, json.dumps(TEST_TASK_SCRAPE_TARGET_PAGE_RESULT)
+    # Assert the result was stored with an expiry
+    payload = json.dumps(TEST_TASK_SCRAPE_TARGET_PAGE_RESULT, separators=(",", ":"))
+    mock_redis_client.setex.assert_any_call(
+        result_key(TEST_TASK_ID), RESULT_STORE_TTL, encode_result(payload.encode())
     )
+
+    # Assert the completion was published to the SSE waiters
+    mock_redis_client.publish.assert_called_once_with(
+        TASK_EVENTS_CHANNEL, encode_task_event(TEST_TASK_ID, payload)
+    )
+
+
+@patch("api.tasks.redis_client")
+@patch("celery.app.task.Task.request")
+def test_task_scrape_target_cached(
+    mock_task_request, mock_redis_client, mock_scrape_target_page
+):
+    """Test that task_scrape_target serves a fresh cached result without scraping
+
+    Args:
+        mock_task_request (MagicMock): Mocked task request
+        mock_redis_client (MagicMock): Mocked Redis client
+        mock_scrape_target_page (MagicMock): Mocked scrape_target_page function
+    """
+
+    mock_task_request.id = TEST_TASK_ID
+    mock_task_request.get.return_value = None
+    mock_redis_client.get.return_value = json.dumps(
+        {"result": TEST_TASK_SCRAPE_TARGET_PAGE_RESULT, "scraped_at": time.time()}
+    )
+
+    task_scrape_target(TEST_APP_URL)
+
+    mock_scrape_target_page.assert_not_called()
+    payload = json.dumps(TEST_TASK_SCRAPE_TARGET_PAGE_RESULT, separators=(",", ":"))
+    mock_redis_client.setex.assert_called_once_with(
+        result_key(TEST_TASK_ID), RESULT_STORE_TTL, encode_result(payload.encode())
+    )
+
+
+@patch("api.tasks.redis_client")
+@patch("celery.app.task.Task.request")
+def test_task_scrape_target_failure(
+    mock_task_request, mock_redis_client, mock_scrape_target_page
+):
+    """Test that a failing task stores and publishes its failure before raising
+
+    Args:
+        mock_task_request (MagicMock): Mocked task request
+        mock_redis_client (MagicMock): Mocked Redis client
+        mock_scrape_target_page (MagicMock): Mocked scrape_target_page function
+    """
+
+    mock_task_request.id = TEST_TASK_ID
+    mock_task_request.get.return_value = None
+    mock_redis_client.get.return_value = None
+    mock_scrape_target_page.side_effect = ValueError("Unable to scrape")
+
+    with pytest.raises(ValueError):
+        task_scrape_target(TEST_APP_URL)
+
+    mock_redis_client.setex.assert_any_call(
+        result_key(TEST_TASK_ID), RESULT_STORE_TTL, RESULT_ERROR + b"Unable to scrape"
+    )
+    mock_redis_client.publish.assert_called_once_with(
+        TASK_EVENTS_CHANNEL, encode_task_failure(TEST_TASK_ID, "Unable to scrape")
+    )
+
+
+def test_stamp_published_at():
+    """Test that published task messages carry their publishing time"""
+
+    headers = {"id": TEST_TASK_ID}
+
+    stamp_published_at(headers=headers)
+
+    assert time.time() - headers["published_at"] < 1
+
+
+def test_enqueue_scrape_batch(mocker):
+    """Test that enqueue_scrape_batch saves the group and publishes a single message
+
+    Args:
+        mocker: Pytest mocker fixture
+    """
+
+    urls = ["https://test.com/1", "https://test.com/2", "https://test.com/3"]
+    mock_save = mocker.patch("api.tasks.GroupResult.save")
+    mock_apply_async = mocker.patch.object(task_publish_batch, "apply_async")
+
+    group_result = enqueue_scrape_batch(urls)
+
+    mock_save.assert_called_once()
+    mock_apply_async.assert_called_once()
+    batch_id, tasks = mock_apply_async.call_args.kwargs["args"]
+    assert batch_id == group_result.id
+    assert [url for _, url in tasks] == urls
+    assert [task_id for task_id, _ in tasks] == [
+        result.id for result in group_result.results
+    ]
+
+
+def test_task_publish_batch(mocker):
+    """Test that task_publish_batch publishes every task under its given IDs
+
+    Args:
+        mocker: Pytest mocker fixture
+    """
+
+    tasks = [("task-1", "https://test.com/1"), ("task-2", "https://test.com/2")]
+    mock_apply_async = mocker.patch.object(task_scrape_target, "apply_async")
+
+    task_publish_batch(TEST_BATCH_ID, tasks)
+
+    assert mock_apply_async.call_count == 2
+    for call, (task_id, url) in zip(mock_apply_async.call_args_list, tasks):
+        assert call.args[0] == (url,)
+        assert call.kwargs["task_id"] == task_id
+        assert call.kwargs["group_id"] == TEST_BATCH_ID
+
+
+def test_get_batch_progress(mocker):
+    """Test that get_batch_progress counts task states with a single backend read
+
+    Args:
+        mocker: Pytest mocker fixture
+    """
+
+    task_ids = ["task-1", "task-2", "task-3", "task-4"]
+    group_result = mocker.Mock(results=[mocker.Mock(id=tid) for tid in task_ids])
+    mocker.patch("api.tasks.GroupResult.restore", return_value=group_result)
+    mock_mget = mocker.patch.object(
+        celery.backend,
+        "mget",
+        return_value=[
+            celery.backend.encode({"status": "SUCCESS", "result": {}}),
+            celery.backend.encode({"status": "FAILURE", "result": None}),
+            celery.backend.encode({"status": "RETRY", "result": None}),
+            None,
+        ],
+    )
+
+    progress = get_batch_progress(TEST_BATCH_ID)
+
+    mock_mget.assert_called_once()
+    assert progress == {
+        "batch_id": TEST_BATCH_ID,
+        "total": 4,
+        "pending": 1,
+        "started": 1,
+        "succeeded": 1,
+        "failed": 1,
+        "ready": 2,
+        "completed": False,
+    }
+
+
+def test_get_batch_progress_unknown_batch(mocker):
+    """Test that get_batch_progress returns None for an unknown batch
+
+    Args:
+        mocker: Pytest mocker fixture
+    """
+
+    mocker.patch("api.tasks.GroupResult.restore", return_value=None)
+
+    assert get_batch_progress(TEST_BATCH_ID) is None
+
+
+@pytest.mark.asyncio
+async def test_async_get_task_results():
+    """Test that async_get_task_results reads states and results in one pipeline"""
+
+    task_ids = ["task-1", "task-2", "task-3", "task-4", "task-5"]
+    pipe = MagicMock()
+    pipe.execute = AsyncMock(
+        return_value=[
+            [
+                celery.backend.encode({"status": "SUCCESS", "result": None}),
+                celery.backend.encode(
+                    {
+                        "status": "FAILURE",
+                        "result": {"exc_type": "ValueError", "exc_message": ["bad"]},
+                    }
+                ),
+                celery.backend.encode({"status": "SUCCESS", "result": None}),
+                None,
+                celery.backend.encode({"status": "PENDING", "result": None}),
+            ],
+            [
+                encode_result(json.dumps(TEST_TASK_SCRAPE_TARGET_PAGE_RESULT).encode()),
+                None,
+                None,
+                None,
+                encode_result(json.dumps(TEST_TASK_SCRAPE_TARGET_PAGE_RESULT).encode()),
+            ],
+        ]
+    )
+    redis_client = MagicMock()
+    redis_client.pipeline.return_value = pipe
+
+    tasks = await async_get_task_results(redis_client, task_ids)
+
+    pipe.execute.assert_awaited_once()
+    pipe.mget.assert_any_call([result_key(task_id) for task_id in task_ids])
+    assert tasks == [
+        {
+            "task_id": "task-1",
+            "status": "SUCCESS",
+            "result": TEST_TASK_SCRAPE_TARGET_PAGE_RESULT,
+        },
+        {"task_id": "task-2", "status": "FAILURE", "error": "bad"},
+        # Succeeded but its result has expired
+        {"task_id": "task-3", "status": "SUCCESS", "result": None},
+        {"task_id": "task-4", "status": "PENDING"},
+        # Stored before Celery recorded the success
+        {
+            "task_id": "task-5",
+            "status": "SUCCESS",
+            "result": TEST_TASK_SCRAPE_TARGET_PAGE_RESULT,
+        },
+    ]
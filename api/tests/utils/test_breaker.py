@@ -0,0 +1,76 @@
+from api.utils.breaker import (
+    CIRCUIT_CLOSED,
+    CIRCUIT_HALF_OPEN,
+    CIRCUIT_OPEN,
+    CircuitBreaker,
+)
+
+
+def test_breaker_opens_after_consecutive_failures():
+    """Test that the circuit opens after the threshold of consecutive failures"""
+
+    breaker = CircuitBreaker("example.com", failure_threshold=3, reset_timeout=60)
+
+    breaker.record_failure()
+    breaker.record_failure()
+    breaker.record_success()
+    breaker.record_failure()
+    breaker.record_failure()
+    assert breaker.state == CIRCUIT_CLOSED
+    assert breaker.allow()
+
+    breaker.record_failure()
+    assert breaker.state == CIRCUIT_OPEN
+    assert not breaker.allow()
+
+
+def test_breaker_half_open_probe(mocker):
+    """Test that an open circuit lets a probe through after the reset timeout
+
+    Args:
+        mocker: Pytest mocker fixture
+    """
+
+    now = mocker.patch("api.utils.breaker.time.monotonic", return_value=100.0)
+    breaker = CircuitBreaker(
+        "example.com", failure_threshold=1, reset_timeout=30, half_open_probes=1
+    )
+    breaker.record_failure()
+    assert not breaker.allow()
+
+    now.return_value = 130.0
+    assert breaker.allow()
+    assert breaker.state == CIRCUIT_HALF_OPEN
+    assert not breaker.allow()
+
+    breaker.record_failure()
+    assert breaker.state == CIRCUIT_OPEN
+    assert not breaker.allow()
+
+    now.return_value = 160.0
+    assert breaker.allow()
+    breaker.record_success()
+    assert breaker.state == CIRCUIT_CLOSED
+    assert breaker.allow()
+
+
+def test_breaker_release_probe(mocker):
+    """Test that a probe ending without an outcome frees its place for the next
+
+    Args:
+        mocker: Pytest mocker fixture
+    """
+
+    now = mocker.patch("api.utils.breaker.time.monotonic", return_value=100.0)
+    breaker = CircuitBreaker(
+        "example.com", failure_threshold=1, reset_timeout=30, half_open_probes=1
+    )
+    breaker.record_failure()
+
+    now.return_value = 130.0
+    assert breaker.allow()
+    assert not breaker.allow()
+
+    breaker.release()
+    assert breaker.state == CIRCUIT_HALF_OPEN
+    assert breaker.allow()
@@ -0,0 +1,199 @@
+import asyncio
+import json
+import time
+from unittest.mock import AsyncMock, MagicMock
+
+import pytest
+from redis import RedisError
+
+from api.settings import SCRAPE_CACHE_TTL
+from api.tests.metrics import metric_value
+from api.utils.cache import (
+    _refresh_executor,
+    _refresh_tasks,
+    async_get_or_scrape,
+    cache_key,
+    get_or_scrape,
+)
+
+TARGET_URL = "https://lords-mobile.en.aptoide.com/app"
+BASE_URL = "https://lords-mobile.en.aptoide.com"
+TEST_RESULT = {"app_name": "Lords Mobile", "app_url": BASE_URL}
+TEST_FRESH_RESULT = {"app_name": "Lords Mobile 2", "app_url": BASE_URL}
+
+
+def cache_entry(age: float) -> str:
+    return json.dumps({"result": TEST_RESULT, "scraped_at": time.time() - age})
+
+
+def test_cache_key_uses_base_url():
+    """Test that URLs of the same app share a cache key"""
+
+    assert cache_key(TARGET_URL) == cache_key(BASE_URL)
+
+
+def test_get_or_scrape_miss():
+    """Test that a cache miss scrapes the page and stores the result"""
+
+    redis_client = MagicMock()
+    redis_client.get.return_value = None
+    scrape = MagicMock(return_value=TEST_RESULT)
+    misses = metric_value("scrape_cache_requests_total", result="miss")
+
+    cached = get_or_scrape(redis_client, TARGET_URL, scrape)
+
+    assert cached.result == TEST_RESULT
+    assert cached.cached is False
+    scrape.assert_called_once_with(TARGET_URL)
+    redis_client.setex.assert_called_once()
+    assert metric_value("scrape_cache_requests_total", result="miss") == misses + 1
+
+
+def test_get_or_scrape_does_not_store_failures():
+    """Test that a failed scrape is not cached"""
+
+    redis_client = MagicMock()
+    redis_client.get.return_value = None
+
+    cached = get_or_scrape(redis_client, TARGET_URL, MagicMock(return_value=None))
+
+    assert cached.result is None
+    redis_client.setex.assert_not_called()
+
+
+def test_get_or_scrape_hit():
+    """Test that a fresh cache entry is served without scraping"""
+
+    redis_client = MagicMock()
+    redis_client.get.return_value = cache_entry(age=10)
+    scrape = MagicMock()
+
+    cached = get_or_scrape(redis_client, TARGET_URL, scrape)
+
+    assert cached.result == TEST_RESULT
+    assert cached.cached is True
+    assert cached.age >= 10
+    scrape.assert_not_called()
+    redis_client.set.assert_not_called()
+
+
+def test_get_or_scrape_stale():
+    """Test that a stale cache entry is served while it is refreshed in the background"""
+
+    redis_client = MagicMock()
+    redis_client.get.return_value = cache_entry(age=SCRAPE_CACHE_TTL + 10)
+    redis_client.set.return_value = True
+    scrape = MagicMock(return_value=TEST_FRESH_RESULT)
+    stale = metric_value("scrape_cache_requests_total", result="stale")
+
+    cached = get_or_scrape(redis_client, TARGET_URL, scrape)
+
+    assert cached.result == TEST_RESULT
+    assert cached.cached is True
+    assert metric_value("scrape_cache_requests_total", result="stale") == stale + 1
+
+    # Wait for the background refresh to complete
+    _refresh_executor.submit(lambda: None).result()
+    scrape.assert_called_once_with(TARGET_URL)
+    redis_client.setex.assert_called_once()
+    redis_client.delete.assert_called_once()
+
+
+@pytest.mark.parametrize("entry", ["{not json", '{"result": {}}', "[]"])
+def test_get_or_scrape_unreadable_entry(entry):
+    """Test that a corrupt or old-format cache entry is a miss and is overwritten
+
+    Args:
+        entry (str): Invalid JSON, an entry without its time or of another type
+    """
+
+    redis_client = MagicMock()
+    redis_client.get.return_value = entry
+    scrape = MagicMock(return_value=TEST_RESULT)
+
+    cached = get_or_scrape(redis_client, TARGET_URL, scrape)
+
+    assert cached.result == TEST_RESULT
+    assert cached.cached is False
+    redis_client.setex.assert_called_once()
+
+
+def test_get_or_scrape_stale_refresh_in_progress():
+    """Test that a stale entry is not refreshed twice while the lock is held"""
+
+    redis_client = MagicMock()
+    redis_client.get.return_value = cache_entry(age=SCRAPE_CACHE_TTL + 10)
+    redis_client.set.return_value = None
+    scrape = MagicMock()
+
+    get_or_scrape(redis_client, TARGET_URL, scrape)
+
+    _refresh_executor.submit(lambda: None).result()
+    scrape.assert_not_called()
+
+
+def test_get_or_scrape_redis_error():
+    """Test that the page is still scraped when Redis is unavailable"""
+
+    redis_client = MagicMock()
+    redis_client.get.side_effect = RedisError
+    scrape = MagicMock(return_value=TEST_RESULT)
+
+    cached = get_or_scrape(redis_client, TARGET_URL, scrape)
+
+    assert cached.result == TEST_RESULT
+    assert cached.cached is False
+
+
+@pytest.mark.asyncio
+async def test_async_get_or_scrape_miss():
+    """Test that a cache miss scrapes the page and stores the result"""
+
+    redis_client = AsyncMock()
+    redis_client.get.return_value = None
+    scrape = AsyncMock(return_value=TEST_RESULT)
+
+    cached = await async_get_or_scrape(redis_client, TARGET_URL, scrape)
+
+    assert cached.result == TEST_RESULT
+    assert cached.cached is False
+    redis_client.setex.assert_awaited_once()
+
+
+@pytest.mark.asyncio
+async def test_async_get_or_scrape_stale():
+    """Test that a stale cache entry is served while it is refreshed in the background"""
+
+    redis_client = AsyncMock()
+    redis_client.get.return_value = cache_entry(age=SCRAPE_CACHE_TTL + 10)
+    redis_client.set.return_value = True
+    scrape = AsyncMock(return_value=TEST_FRESH_RESULT)
+
+    cached = await async_get_or_scrape(redis_client, TARGET_URL, scrape)
+
+    assert cached.result == TEST_RESULT
+    assert cached.cached is True
+
+    # Let the background refresh run
+    for _ in range(3):
+        await asyncio.sleep(0)
+    scrape.assert_awaited_once_with(TARGET_URL)
+    redis_client.setex.assert_awaited_once()
+
+
+@pytest.mark.asyncio
+async def test_async_refresh_lock_release_error():
+    """Test that failing to release the refresh lock does not fail the refresh"""
+
+    redis_client = AsyncMock()
+    redis_client.get.return_value = cache_entry(age=SCRAPE_CACHE_TTL + 10)
+    redis_client.set.return_value = True
+    redis_client.delete.side_effect = RedisError
+    scrape = AsyncMock(return_value=TEST_FRESH_RESULT)
+
+    await async_get_or_scrape(redis_client, TARGET_URL, scrape)
+    (refresh,) = _refresh_tasks
+    await refresh
+
+    assert refresh.exception() is None
+    redis_client.setex.assert_awaited_once()
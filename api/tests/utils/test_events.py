@@ -0,0 +1,108 @@
+import pytest
+
+from api.utils.events import (
+    RESYNC,
+    TaskEventHub,
+    encode_task_event,
+    encode_task_failure,
+)
+from api.utils.results import TaskFailure
+
+TEST_TASK_ID = "test-task-id"
+TEST_PAYLOAD = '{"app_name": "app1"}'
+
+
+@pytest.fixture
+def hub(mocker):
+    hub = TaskEventHub()
+    mocker.patch.object(hub, "start")
+    return hub
+
+
+@pytest.mark.asyncio
+async def test_dispatch_to_waiters(hub):
+    """Test that an event is delivered to every waiter of its task only
+
+    Args:
+        hub (TaskEventHub): Task event hub without a subscriber
+    """
+
+    first = hub.subscribe(TEST_TASK_ID)
+    second = hub.subscribe(TEST_TASK_ID)
+    other = hub.subscribe("other-task-id")
+
+    hub.dispatch(encode_task_event(TEST_TASK_ID, TEST_PAYLOAD).encode())
+
+    assert first.get_nowait() == (TEST_TASK_ID, TEST_PAYLOAD.encode())
+    assert second.get_nowait() == (TEST_TASK_ID, TEST_PAYLOAD.encode())
+    assert other.empty()
+
+
+@pytest.mark.asyncio
+async def test_dispatch_multiplexed(hub):
+    """Test that events of several tasks can be delivered to one queue
+
+    Args:
+        hub (TaskEventHub): Task event hub without a subscriber
+    """
+
+    queue = hub.subscribe(TEST_TASK_ID)
+    hub.subscribe("other-task-id", queue)
+
+    hub.dispatch(encode_task_event("other-task-id", TEST_PAYLOAD).encode())
+    hub.dispatch(encode_task_event(TEST_TASK_ID, TEST_PAYLOAD).encode())
+    hub._resync()
+
+    assert queue.get_nowait()[0] == "other-task-id"
+    assert queue.get_nowait()[0] == TEST_TASK_ID
+    assert queue.get_nowait() is RESYNC
+    assert queue.empty()
+    assert hub.waiting() == 1
+
+
+@pytest.mark.asyncio
+async def test_unsubscribe(hub):
+    """Test that unsubscribed waiters are removed from the hub
+
+    Args:
+        hub (TaskEventHub): Task event hub without a subscriber
+    """
+
+    queue = hub.subscribe(TEST_TASK_ID)
+    assert hub.waiting() == 1
+
+    hub.unsubscribe(TEST_TASK_ID, queue)
+    hub.dispatch(encode_task_event(TEST_TASK_ID, TEST_PAYLOAD).encode())
+
+    assert hub.waiting() == 0
+    assert queue.empty()
+
+
+@pytest.mark.asyncio
+async def test_resync(hub):
+    """Test that waiters are told to check again after a resubscribe
+
+    Args:
+        hub (TaskEventHub): Task event hub without a subscriber
+    """
+
+    queue = hub.subscribe(TEST_TASK_ID)
+
+    hub._resync()
+
+    assert queue.get_nowait() is RESYNC
+
+
+@pytest.mark.asyncio
+async def test_dispatch_failure(hub):
+    """Test that the failure event of a task is delivered as a TaskFailure
+
+    Args:
+        hub (TaskEventHub): Task event hub without a subscriber
+    """
+
+    queue = hub.subscribe(TEST_TASK_ID)
+
+    hub.dispatch(encode_task_failure(TEST_TASK_ID, "Unable to scrape").encode())
+
+    assert queue.get_nowait() == (TEST_TASK_ID, TaskFailure("Unable to scrape"))
@@ -0,0 +1,439 @@
+import asyncio
+
+import httpx
+import pytest
+import requests
+import requests_mock
+
+from api.settings import LATENCY_MIN_SAMPLES
+from api.tests.metrics import metric_value
+from api.utils.breaker import CIRCUIT_HALF_OPEN, CircuitBreaker
+from api.utils.fetch import (
+    _connection_tracer,
+    async_fetch_page,
+    fetch_page,
+    retry_reason,
+)
+from api.utils.latency import LatencyTracker
+
+TARGET_URL = "https://lords-mobile.en.aptoide.com"
+TEST_INVALID_URLS = ["foo", "http://", "http://[::1", "ftp://lords-mobile.com"]
+TEST_CONTENT = b"<html><body>" + b"<p>content</p>" * 1000 + b"</body></html>"
+
+
+class StopAfter:
+    """Parser stub that is done after a number of chunks"""
+
+    def __init__(self, chunks: int) -> None:
+        self.chunks = chunks
+        self.fed = 0
+
+    def feed(self, chunk: bytes) -> bool:
+        self.fed += 1
+        return self.fed >= self.chunks
+
+    def close(self) -> int:
+        return self.fed
+
+
+@pytest.fixture
+def small_chunks(mocker):
+    mocker.patch("api.utils.fetch.FETCH_CHUNK_SIZE", 1024)
+
+
+def test_fetch_page_parser_stops_reading(small_chunks):
+    """Test that the body stops being read once the parser is done
+
+    Args:
+        small_chunks: Patched chunk size
+    """
+
+    with requests_mock.Mocker() as m:
+        m.get(TARGET_URL, content=TEST_CONTENT)
+        page = fetch_page(TARGET_URL, parser=StopAfter(2))
+
+    assert page.parsed == 2
+    assert page.content is None
+    assert page.size == 2048
+
+
+def test_fetch_page_too_large(mocker):
+    """Test that a body larger than the maximum size is rejected
+
+    Args:
+        mocker: Pytest mocker fixture
+    """
+
+    mocker.patch("api.utils.fetch.FETCH_MAX_BODY_SIZE", 1024)
+
+    with requests_mock.Mocker() as m:
+        m.get(TARGET_URL, content=TEST_CONTENT)
+        assert fetch_page(TARGET_URL) is None
+
+        m.get(TARGET_URL, content=TEST_CONTENT, headers={"Content-Length": "999999"})
+        assert fetch_page(TARGET_URL) is None
+
+
+@pytest.mark.asyncio
+async def test_async_fetch_page_parser_stops_reading(mocker, small_chunks):
+    """Test that the async body stops being read once the parser is done
+
+    Args:
+        mocker: Pytest mocker fixture
+        small_chunks: Patched chunk size
+    """
+
+    client = httpx.AsyncClient(
+        transport=httpx.MockTransport(
+            lambda request: httpx.Response(200, content=TEST_CONTENT)
+        )
+    )
+    mocker.patch("api.utils.fetch.get_async_client", return_value=client)
+
+    page = await async_fetch_page(TARGET_URL, parser=StopAfter(2))
+
+    assert page.parsed == 2
+    assert page.size == 2048
+
+
+@pytest.mark.asyncio
+async def test_async_fetch_page_too_large(mocker):
+    """Test that an async body larger than the maximum size is rejected
+
+    Args:
+        mocker: Pytest mocker fixture
+    """
+
+    mocker.patch("api.utils.fetch.FETCH_MAX_BODY_SIZE", 1024)
+    client = httpx.AsyncClient(
+        transport=httpx.MockTransport(
+            lambda request: httpx.Response(200, content=TEST_CONTENT)
+        )
+    )
+    mocker.patch("api.utils.fetch.get_async_client", return_value=client)
+
+    assert await async_fetch_page(TARGET_URL) is None
+
+
+def test_fetch_page_retries_transient_failures():
+    """Test that overload statuses and timeouts are retried"""
+
+    with requests_mock.Mocker() as m:
+        m.get(
+            TARGET_URL,
+            [
+                {"status_code": 503},
+                {"exc": requests.exceptions.ConnectTimeout},
+                {"content": TEST_CONTENT},
+            ],
+        )
+        page = fetch_page(TARGET_URL)
+
+    assert page.content == TEST_CONTENT.decode()
+    assert m.call_count == 3
+
+
+def test_fetch_page_does_not_retry_client_errors():
+    """Test that a missing page is not retried"""
+
+    with requests_mock.Mocker() as m:
+        m.get(TARGET_URL, status_code=404)
+        assert fetch_page(TARGET_URL) is None
+
+    assert m.call_count == 1
+
+
+@pytest.mark.parametrize(
+    "error",
+    [
+        httpx.UnsupportedProtocol("foo"),
+        httpx.LocalProtocolError("bad header"),
+        httpx.InvalidURL("http://[::1"),
+        requests.exceptions.MissingSchema("foo"),
+    ],
+)
+def test_retry_reason_invalid_url(error):
+    """Test that errors of invalid URLs are not retried
+
+    Args:
+        error (Exception): Error raised for an invalid URL
+    """
+
+    assert retry_reason(error) is None
+
+
+@pytest.mark.parametrize("url", TEST_INVALID_URLS)
+def test_fetch_page_invalid_url(mocker, url):
+    """Test that an invalid URL is given up at once without counting against a host
+
+    Args:
+        mocker: Pytest mocker fixture
+        url (str): Invalid URL
+    """
+
+    breakers = mocker.patch.dict("api.utils.breaker.breakers", clear=True)
+    sleep = mocker.patch("api.utils.fetch.time.sleep")
+
+    assert fetch_page(url) is None
+
+    sleep.assert_not_called()
+    assert all(breaker._failures == 0 for breaker in breakers.values())
+
+
+@pytest.mark.asyncio
+@pytest.mark.parametrize("url", TEST_INVALID_URLS)
+async def test_async_fetch_page_invalid_url(mocker, url):
+    """Test that an invalid URL is given up at once without blocking or raising
+
+    Args:
+        mocker: Pytest mocker fixture
+        url (str): Invalid URL
+    """
+
+    breakers = mocker.patch.dict("api.utils.breaker.breakers", clear=True)
+    sleep = mocker.patch("api.utils.fetch.asyncio.sleep")
+
+    assert await async_fetch_page(url) is None
+
+    sleep.assert_not_called()
+    assert all(breaker._failures == 0 for breaker in breakers.values())
+
+
+def test_fetch_page_honours_retry_after(mocker):
+    """Test that the delay asked by the upstream is waited before retrying
+
+    Args:
+        mocker: Pytest mocker fixture
+    """
+
+    sleep = mocker.patch("api.utils.fetch.time.sleep")
+    with requests_mock.Mocker() as m:
+        m.get(
+            TARGET_URL,
+            [
+                {"status_code": 429, "headers": {"Retry-After": "2"}},
+                {"content": TEST_CONTENT},
+            ],
+        )
+        assert fetch_page(TARGET_URL) is not None
+
+    sleep.assert_called_once_with(2.0)
+
+
+def test_fetch_page_open_circuit_fails_fast(mocker):
+    """Test that a failing host stops being fetched once its circuit opens
+
+    Args:
+        mocker: Pytest mocker fixture
+    """
+
+    mocker.patch("api.utils.fetch.FETCH_RETRIES", 0)
+    breaker = CircuitBreaker("lords-mobile.en.aptoide.com", failure_threshold=2)
+    mocker.patch.dict("api.utils.breaker.breakers", {breaker.name: breaker})
+
+    with requests_mock.Mocker() as m:
+        m.get(TARGET_URL, status_code=502)
+        for _ in range(4):
+            assert fetch_page(TARGET_URL) is None
+
+    assert m.call_count == 2
+
+
+@pytest.mark.asyncio
+async def test_async_fetch_page_cancelled_probe(mocker):
+    """Test that a cancelled probe of a half-open circuit lets the next one through
+
+    Args:
+        mocker: Pytest mocker fixture
+    """
+
+    breaker = CircuitBreaker(
+        "lords-mobile.en.aptoide.com", failure_threshold=1, reset_timeout=0
+    )
+    breaker.record_failure()
+    mocker.patch.dict("api.utils.breaker.breakers", {breaker.name: breaker})
+
+    started = asyncio.Event()
+
+    async def hang(request):
+        started.set()
+        await asyncio.sleep(5)
+        return httpx.Response(200)
+
+    client = httpx.AsyncClient(transport=httpx.MockTransport(hang))
+    mocker.patch("api.utils.fetch.get_async_client", return_value=client)
+
+    probe = asyncio.create_task(async_fetch_page(TARGET_URL))
+    await started.wait()
+    probe.cancel()
+    with pytest.raises(asyncio.CancelledError):
+        await probe
+
+    assert breaker.state == CIRCUIT_HALF_OPEN
+    assert breaker.allow()
+
+
+@pytest.mark.asyncio
+async def test_async_fetch_page_retries_transient_failures(mocker):
+    """Test that async fetches retry transient failures
+
+    Args:
+        mocker: Pytest mocker fixture
+    """
+
+    responses = iter([httpx.Response(500), httpx.Response(200, content=TEST_CONTENT)])
+    client = httpx.AsyncClient(
+        transport=httpx.MockTransport(lambda request: next(responses))
+    )
+    mocker.patch("api.utils.fetch.get_async_client", return_value=client)
+
+    page = await async_fetch_page(TARGET_URL)
+
+    assert page.content == TEST_CONTENT.decode()
+
+
+@pytest.mark.asyncio
+async def test_async_fetch_page_hedges_slow_requests(mocker):
+    """Test that a slow request is hedged and the faster answer is used
+
+    Args:
+        mocker: Pytest mocker fixture
+    """
+
+    mocker.patch("api.utils.latency.FETCH_HEDGE", True)
+    mocker.patch("api.utils.latency.FETCH_HEDGE_MAX_RATIO", 1)
+    tracker = LatencyTracker("lords-mobile.en.aptoide.com")
+    for _ in range(LATENCY_MIN_SAMPLES):
+        tracker.record(0.01)
+    mocker.patch.dict("api.utils.latency.trackers", {tracker.name: tracker})
+
+    calls = []
+
+    async def handler(request):
+        calls.append(request)
+        if len(calls) == 1:
+            await asyncio.sleep(5)
+            return httpx.Response(200, content=b"slow")
+        return httpx.Response(200, content=b"fast")
+
+    client = httpx.AsyncClient(transport=httpx.MockTransport(handler))
+    mocker.patch("api.utils.fetch.get_async_client", return_value=client)
+    won = metric_value("fetch_hedges_won_total", host=tracker.name)
+
+    page = await asyncio.wait_for(async_fetch_page(TARGET_URL), timeout=2)
+
+    assert page.content == "fast"
+    assert len(calls) == 2
+    assert metric_value("fetch_hedges_won_total", host=tracker.name) == won + 1
+    # The cancelled slow request is recorded along with the fast one
+    assert len(tracker._samples) == LATENCY_MIN_SAMPLES + 2
+
+
+def test_fetch_page_adaptive_timeout(mocker):
+    """Test that the timeout of a request follows the latency of its host
+
+    Args:
+        mocker: Pytest mocker fixture
+    """
+
+    tracker = LatencyTracker("lords-mobile.en.aptoide.com")
+    for _ in range(LATENCY_MIN_SAMPLES):
+        tracker.record(1.5)
+    mocker.patch.dict("api.utils.latency.trackers", {tracker.name: tracker})
+
+    with requests_mock.Mocker() as m:
+        m.get(TARGET_URL, content=TEST_CONTENT)
+        fetch_page(TARGET_URL)
+
+    assert m.last_request.timeout == 3
+
+
+def test_fetch_page_timeouts_grow_the_timeout(mocker):
+    """Test that a host slowing down past its adaptive timeout raises the timeout
+
+    Args:
+        mocker: Pytest mocker fixture
+    """
+
+    mocker.patch("api.utils.fetch.FETCH_RETRIES", 0)
+    mocker.patch.dict("api.utils.breaker.breakers", {})
+    tracker = LatencyTracker("lords-mobile.en.aptoide.com", window=LATENCY_MIN_SAMPLES)
+    for _ in range(LATENCY_MIN_SAMPLES):
+        tracker.record(0.1)
+    mocker.patch.dict("api.utils.latency.trackers", {tracker.name: tracker})
+
+    with requests_mock.Mocker() as m:
+        m.get(TARGET_URL, exc=requests.exceptions.ReadTimeout)
+        assert fetch_page(TARGET_URL) is None
+        assert m.last_request.timeout == 1
+
+        m.get(TARGET_URL, content=TEST_CONTENT)
+        fetch_page(TARGET_URL)
+        assert m.last_request.timeout == 2
+
+
+@pytest.mark.asyncio
+async def test_async_fetch_page_timeouts_grow_the_timeout(mocker):
+    """Test that async timeouts are recorded as latency samples
+
+    Args:
+        mocker: Pytest mocker fixture
+    """
+
+    mocker.patch("api.utils.fetch.FETCH_RETRIES", 0)
+    mocker.patch.dict("api.utils.breaker.breakers", {})
+    tracker = LatencyTracker("lords-mobile.en.aptoide.com", window=LATENCY_MIN_SAMPLES)
+    for _ in range(LATENCY_MIN_SAMPLES):
+        tracker.record(0.1)
+    mocker.patch.dict("api.utils.latency.trackers", {tracker.name: tracker})
+
+    def handler(request):
+        raise httpx.ReadTimeout("timed out", request=request)
+
+    client = httpx.AsyncClient(transport=httpx.MockTransport(handler))
+    mocker.patch("api.utils.fetch.get_async_client", return_value=client)
+
+    assert tracker.timeout() == 1
+    assert await async_fetch_page(TARGET_URL) is None
+    assert tracker.timeout() == 2
+
+
+def test_fetch_page_records_phases():
+    """Test that the headers and body phases of a fetch are timed"""
+
+    headers = metric_value("fetch_phase_duration_seconds_count", phase="headers")
+    body = metric_value("fetch_phase_duration_seconds_count", phase="body")
+
+    with requests_mock.Mocker() as m:
+        m.get(TARGET_URL, content=TEST_CONTENT)
+        fetch_page(TARGET_URL)
+
+    assert (
+        metric_value("fetch_phase_duration_seconds_count", phase="headers")
+        == headers + 1
+    )
+    assert metric_value("fetch_phase_duration_seconds_count", phase="body") == body + 1
+
+
+@pytest.mark.asyncio
+async def test_connection_tracer():
+    """Test that the connect and TLS steps of a new connection are timed"""
+
+    connects = metric_value("fetch_phase_duration_seconds_count", phase="connect")
+    handshakes = metric_value("fetch_phase_duration_seconds_count", phase="tls")
+    trace = _connection_tracer()
+
+    for event in [
+        "connection.connect_tcp.started",
+        "connection.connect_tcp.complete",
+        "connection.start_tls.started",
+        "connection.start_tls.failed",
+        "http11.send_request_headers.started",
+    ]:
+        await trace(event, {})
+
+    assert (
+        metric_value("fetch_phase_duration_seconds_count", phase="connect")
+        == connects + 1
+    )
+    assert metric_value("fetch_phase_duration_seconds_count", phase="tls") == handshakes
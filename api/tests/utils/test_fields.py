@@ -0,0 +1,118 @@
+from lxml import etree, html
+
+import api.utils.scrape  # noqa: F401 registers the app page fields
+from api.tests.metrics import metric_value
+from api.utils.fields import (
+    APP_PAGE,
+    extract_fields,
+    first_text,
+    has_class,
+    page_fields,
+    register_field,
+    register_page,
+)
+
+TEST_PAGE = "test"
+TEST_CONTENT = """
+<html>
+    <body>
+        <h1>Example App</h1>
+        <ul><li>one</li><li>two</li></ul>
+    </body>
+</html>
+"""
+
+register_field("title", "//h1", page=TEST_PAGE)
+register_field(
+    "items", "//li", lambda matches: [li.text for li in matches], page=TEST_PAGE
+)
+register_field("missing", "//h2", page=TEST_PAGE)
+
+ROOTED_PAGE = "rooted"
+register_page(ROOTED_PAGE, '//*[@id="root"]')
+register_field("title", "div/h1", page=ROOTED_PAGE)
+
+
+def test_register_field_compiles_selector():
+    """Test that registered selectors are compiled once and kept in order"""
+
+    fields = page_fields(TEST_PAGE)
+
+    assert [field.name for field in fields] == ["title", "items", "missing"]
+    assert all(isinstance(field.selector, etree.XPath) for field in fields)
+
+
+def test_extract_fields():
+    """Test that all fields of a page are extracted from one parsed tree"""
+
+    result = extract_fields(html.fromstring(TEST_CONTENT), TEST_PAGE)
+
+    assert result == {"title": "Example App", "items": ["one", "two"], "missing": None}
+
+
+def test_extract_fields_records_durations():
+    """Test that the time of each extracted field is recorded"""
+
+    titles = metric_value(
+        "field_extraction_duration_seconds_count", page=TEST_PAGE, field="title"
+    )
+
+    extract_fields(html.fromstring(TEST_CONTENT), TEST_PAGE)
+
+    assert (
+        metric_value(
+            "field_extraction_duration_seconds_count", page=TEST_PAGE, field="title"
+        )
+        == titles + 1
+    )
+
+
+def test_extract_fields_relative_to_root():
+    """Test that field selectors are evaluated relative to the page root"""
+
+    content = (
+        '<html><body><div id="root"><div><h1>Rooted</h1></div></div></body></html>'
+    )
+
+    assert extract_fields(html.fromstring(content), ROOTED_PAGE) == {"title": "Rooted"}
+
+
+def test_extract_fields_missing_root():
+    """Test that the fields of a page without its root element are empty"""
+
+    result = extract_fields(html.fromstring(TEST_CONTENT), ROOTED_PAGE)
+
+    assert result == {"title": None}
+
+
+def test_extract_fields_unknown_page():
+    """Test that a page without registered fields extracts nothing"""
+
+    assert extract_fields(html.fromstring(TEST_CONTENT), "unknown") == {}
+
+
+def test_app_page_fields():
+    """Test that the app page declares the fields of the scrape result"""
+
+    assert [field.name for field in page_fields(APP_PAGE)] == [
+        "app_name",
+        "no_downloads",
+        "app_description",
+        "app_release_date",
+    ]
+
+
+def test_first_text():
+    """Test that first_text returns None when nothing matched"""
+
+    assert first_text([]) is None
+
+
+def test_has_class():
+    """Test that has_class matches a class token among others"""
+
+    tree = html.fromstring(
+        '<div><span class="b  a c">1</span><span class="ab">2</span></div>'
+    )
+
+    assert [span.text for span in tree.xpath(f"//span{has_class('a')}")] == ["1"]
@@ -0,0 +1,62 @@
+from api.utils.latency import LatencyTracker
+
+
+def test_latency_percentile():
+    """Test that percentiles are computed once enough samples were seen"""
+
+    tracker = LatencyTracker("example.com", window=100)
+    for _ in range(10):
+        tracker.record(0.1)
+    assert tracker.percentile(50) is None
+
+    for i in range(1, 101):
+        tracker.record(i / 100)
+
+    assert tracker.percentile(50) == 0.5
+    assert tracker.percentile(95) == 0.95
+    assert tracker.percentile(100) == 1.0
+
+
+def test_adaptive_timeout_bounds(mocker):
+    """Test that the timeout follows the latency within its bounds
+
+    Args:
+        mocker: Pytest mocker fixture
+    """
+
+    mocker.patch("api.utils.latency.FETCH_TIMEOUT", 10)
+    mocker.patch("api.utils.latency.FETCH_TIMEOUT_MIN", 1)
+    mocker.patch("api.utils.latency.FETCH_TIMEOUT_MULTIPLIER", 2)
+    tracker = LatencyTracker("example.com", window=20)
+    assert tracker.timeout() == 10
+
+    for _ in range(20):
+        tracker.record(0.1)
+    assert tracker.timeout() == 1
+
+    for _ in range(20):
+        tracker.record(2)
+    assert tracker.timeout() == 4
+
+    for _ in range(20):
+        tracker.record(30)
+    assert tracker.timeout() == 10
+
+
+def test_hedge_budget(mocker):
+    """Test that hedges are capped to a share of the requests
+
+    Args:
+        mocker: Pytest mocker fixture
+    """
+
+    mocker.patch("api.utils.latency.FETCH_HEDGE", True)
+    mocker.patch("api.utils.latency.FETCH_HEDGE_MAX_RATIO", 0.25)
+    tracker = LatencyTracker("example.com")
+
+    hedges = 0
+    for _ in range(20):
+        tracker.hedge_delay()
+        hedges += tracker.take_hedge()
+
+    assert hedges == 5
@@ -0,0 +1,36 @@
+import socket
+from urllib.request import urlopen
+
+from prometheus_client import CONTENT_TYPE_LATEST, Counter
+
+from api.utils.metrics import start_metrics_server
+
+
+def free_port() -> int:
+    """Find a port nothing listens on"""
+
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+
+def test_start_metrics_server():
+    """Test that the metrics server answers with the metrics of the process"""
+
+    Counter("test_metrics_server_requests", "Test requests").inc()
+    port = free_port()
+
+    assert start_metrics_server(port, "127.0.0.1") is True
+    with urlopen(f"http://127.0.0.1:{port}/metrics") as response:
+        assert response.headers["Content-Type"] == CONTENT_TYPE_LATEST
+        assert "test_metrics_server_requests_total 1.0" in response.read().decode()
+
+
+def test_start_metrics_server_port_taken():
+    """Test that a taken port is reported instead of raised"""
+
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        sock.listen()
+
+        assert start_metrics_server(sock.getsockname()[1], "127.0.0.1") is False
@@ -0,0 +1,104 @@
+import json
+
+import pytest
+
+import api.utils.scrape  # noqa: F401 registers the Next.js data fields
+from api.utils.next_data import extract_next_data_fields, find_app_metadata, lookup
+
+TEST_APP = {
+    "name": "Lords Mobile",
+    "stats": {"downloads": 5_300_000},
+    "media": {"description": "First line\nSecond line"},
+    "updated": "2023-01-01 10:00:00",
+    "file": {"vername": "1.0.0"},
+}
+
+
+def render_page(next_data: str) -> str:
+    return f"""
+    <html>
+        <body>
+            <div id="__next"></div>
+            <script id="__NEXT_DATA__" type="application/json">{next_data}</script>
+        </body>
+    </html>
+    """
+
+
+@pytest.fixture
+def mock_next_data_content():
+    return render_page(json.dumps({"props": {"pageProps": {"app": TEST_APP}}}))
+
+
+def test_lookup():
+    """Test that lookup follows keys and returns None for missing ones"""
+
+    assert lookup(TEST_APP, ("file", "vername")) == "1.0.0"
+    assert lookup(TEST_APP, ("file", "vercode")) is None
+    assert lookup(TEST_APP, ("name", "first")) is None
+
+
+def test_find_app_metadata(mock_next_data_content):
+    """Test that the app metadata is decoded from the Next.js data script
+
+    Args:
+        mock_next_data_content: Mock HTML content with Next.js data
+    """
+
+    assert find_app_metadata(mock_next_data_content) == TEST_APP
+
+
+@pytest.mark.parametrize(
+    "content",
+    [
+        "<html><body><div id='__next'></div></body></html>",
+        render_page("{not json"),
+        render_page(json.dumps({"props": {"pageProps": {}}})),
+    ],
+)
+def test_find_app_metadata_missing(content):
+    """Test that pages without usable Next.js data have no app metadata
+
+    Args:
+        content (str): Page without the script, with invalid JSON or without the app
+    """
+
+    assert find_app_metadata(content) is None
+
+
+def test_extract_next_data_fields(mock_next_data_content):
+    """Test that the declared fields are extracted from the Next.js data
+
+    Args:
+        mock_next_data_content: Mock HTML content with Next.js data
+    """
+
+    assert extract_next_data_fields(mock_next_data_content) == {
+        "app_name": "Lords Mobile",
+        "no_downloads": "5M+",
+        "app_description": "First line Second line",
+        "app_release_date": "2023-01-01",
+        "app_version": "1.0.0",
+    }
+
+
+@pytest.mark.parametrize(
+    "app",
+    [
+        {**TEST_APP, "stats": {"downloads": "5M+"}},
+        {**TEST_APP, "updated": 1672567200},
+        {},
+        {"title": "Lords Mobile", "version": {"name": "1.0.0"}},
+    ],
+)
+def test_extract_next_data_fields_unexpected_shape(app):
+    """Test that metadata with unexpected types or without the app name is not used
+
+    Args:
+        app (dict): App metadata with a string download count, a numeric date,
+            no keys or other keys
+    """
+
+    content = render_page(json.dumps({"props": {"pageProps": {"app": app}}}))
+
+    assert extract_next_data_fields(content) is None
@@ -0,0 +1,73 @@
+import threading
+
+import pytest
+
+from api.utils.parsing import (
+    async_parse,
+    get_parse_executor,
+    parse,
+    shutdown_parse_executor,
+)
+
+
+def parse_thread_name(content: str) -> str:
+    return f"{content}:{threading.current_thread().name}"
+
+
+@pytest.fixture(autouse=True)
+def reset_parse_executor():
+    shutdown_parse_executor()
+    yield
+    shutdown_parse_executor()
+
+
+def test_parse_inline(mocker):
+    """Test that inline parsing runs in the calling thread
+
+    Args:
+        mocker: Pytest mocker fixture
+    """
+
+    mocker.patch("api.utils.parsing.PARSE_EXECUTOR", "inline")
+
+    assert parse(parse_thread_name, "page") == "page:MainThread"
+
+
+def test_parse_threads():
+    """Test that thread parsing runs on the parse pool"""
+
+    assert parse(parse_thread_name, "page").startswith("page:scrape-parse")
+
+
+def test_parse_processes(mocker):
+    """Test that process parsing returns the result of the parse process
+
+    Args:
+        mocker: Pytest mocker fixture
+    """
+
+    mocker.patch("api.utils.parsing.PARSE_EXECUTOR", "process")
+
+    assert parse(parse_thread_name, "page") == "page:MainThread"
+
+
+@pytest.mark.asyncio
+async def test_async_parse():
+    """Test that async parsing runs off the event loop thread"""
+
+    assert (await async_parse(parse_thread_name, "page")).startswith(
+        "page:scrape-parse"
+    )
+
+
+def test_unknown_parse_executor(mocker):
+    """Test that an unknown executor kind is rejected
+
+    Args:
+        mocker: Pytest mocker fixture
+    """
+
+    mocker.patch("api.utils.parsing.PARSE_EXECUTOR", "fork")
+
+    with pytest.raises(ValueError):
+        get_parse_executor()
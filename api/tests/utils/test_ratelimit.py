@@ -0,0 +1,265 @@
+import asyncio
+import time
+from unittest.mock import AsyncMock, MagicMock
+
+import pytest
+from redis import RedisError
+
+from api.tests.metrics import metric_value
+from api.utils.ratelimit import (
+    HostLimit,
+    LocalHostLimiter,
+    async_host_slot,
+    host_limit,
+    host_slot,
+    parse_host_limits,
+)
+
+TARGET_URL = "https://lords-mobile.en.aptoide.com"
+TEST_LIMIT = HostLimit(pattern="*.aptoide.com", rate=10, burst=10, max_in_flight=2)
+
+
+@pytest.fixture
+def host_limits(mocker):
+    mocker.patch("api.utils.ratelimit.HOST_LIMIT_RULES", [TEST_LIMIT])
+    mocker.patch("api.utils.ratelimit.HOST_SLOT_POLL_INTERVAL", 0)
+
+
+@pytest.fixture
+def mock_scripts(mocker, host_limits):
+    reserve_token = mocker.patch("api.utils.ratelimit._reserve_token", return_value=0)
+    acquire_slot = mocker.patch("api.utils.ratelimit._acquire_slot", return_value=1)
+    redis_client = mocker.patch("api.utils.ratelimit.redis_client")
+    return reserve_token, acquire_slot, redis_client
+
+
+def test_parse_host_limits():
+    """Test that the burst defaults to the rate"""
+
+    limits = parse_host_limits({"example.com": {"rate": 5, "max_in_flight": 3}})
+
+    assert limits == [
+        HostLimit(pattern="example.com", rate=5.0, burst=5, max_in_flight=3)
+    ]
+
+
+def test_host_limit(host_limits):
+    """Test that all hosts matching a pattern share its limits
+
+    Args:
+        host_limits: Patched host limits
+    """
+
+    assert host_limit(TARGET_URL) == TEST_LIMIT
+    assert host_limit("https://clash.en.aptoide.com/versions") == TEST_LIMIT
+    assert host_limit("https://example.com") is None
+
+
+def test_host_slot(mock_scripts):
+    """Test that a slot is taken from the host limiters and released after the fetch
+
+    Args:
+        mock_scripts: Mocked limiter scripts and Redis client
+    """
+
+    reserve_token, acquire_slot, redis_client = mock_scripts
+    acquisitions = metric_value(
+        "fetch_limiter_acquisitions_total", host=TEST_LIMIT.pattern
+    )
+
+    with host_slot(TARGET_URL):
+        redis_client.zrem.assert_not_called()
+
+    reserve_token.assert_called_once_with(keys=[TEST_LIMIT.bucket_key], args=[10, 10])
+    slot = acquire_slot.call_args.kwargs["args"][0]
+    redis_client.zrem.assert_called_once_with(TEST_LIMIT.slots_key, slot)
+    assert (
+        metric_value("fetch_limiter_acquisitions_total", host=TEST_LIMIT.pattern)
+        == acquisitions + 1
+    )
+
+
+def test_host_slot_renews_lease(mocker, mock_scripts):
+    """Test that the lease of a slot is renewed while the fetch runs
+
+    Args:
+        mocker: Pytest mocker fixture
+        mock_scripts: Mocked limiter scripts and Redis client
+    """
+
+    _, acquire_slot, _ = mock_scripts
+    mocker.patch("api.utils.ratelimit.HOST_SLOT_LEASE", 0.03)
+    renew_slot = mocker.patch("api.utils.ratelimit._renew_slot")
+
+    with host_slot(TARGET_URL):
+        time.sleep(0.1)
+    renewals = renew_slot.call_count
+    time.sleep(0.05)
+
+    slot = acquire_slot.call_args.kwargs["args"][0]
+    assert renewals >= 2
+    assert renew_slot.call_count == renewals
+    renew_slot.assert_called_with(keys=[TEST_LIMIT.slots_key], args=[slot, 30])
+
+
+def test_host_slot_waits(mocker, mock_scripts):
+    """Test that the fetch waits for its token and for a free slot
+
+    Args:
+        mocker: Pytest mocker fixture
+        mock_scripts: Mocked limiter scripts and Redis client
+    """
+
+    reserve_token, acquire_slot, _ = mock_scripts
+    reserve_token.return_value = 20
+    acquire_slot.side_effect = [0, 0, 1]
+    waited = metric_value(
+        "fetch_limiter_wait_seconds_total", host=TEST_LIMIT.pattern, limiter="rate"
+    )
+
+    with host_slot(TARGET_URL):
+        pass
+
+    assert acquire_slot.call_count == 3
+    assert metric_value(
+        "fetch_limiter_wait_seconds_total", host=TEST_LIMIT.pattern, limiter="rate"
+    ) >= (waited + 0.02)
+
+
+def test_host_slot_redis_error(mock_scripts):
+    """Test that the fetch goes ahead unthrottled if Redis is unavailable
+
+    Args:
+        mock_scripts: Mocked limiter scripts and Redis client
+    """
+
+    reserve_token, _, redis_client = mock_scripts
+    reserve_token.side_effect = RedisError("Connection refused")
+    fetched = MagicMock()
+
+    with host_slot(TARGET_URL):
+        fetched()
+
+    fetched.assert_called_once()
+    redis_client.zrem.assert_not_called()
+
+
+def test_host_slot_unlimited_host(mock_scripts):
+    """Test that hosts without limits do not touch Redis
+
+    Args:
+        mock_scripts: Mocked limiter scripts and Redis client
+    """
+
+    reserve_token, _, _ = mock_scripts
+
+    with host_slot("https://example.com"):
+        pass
+
+    reserve_token.assert_not_called()
+
+
+@pytest.mark.asyncio
+async def test_async_host_slot(mocker, host_limits):
+    """Test that the async limiter takes and releases a slot
+
+    Args:
+        mocker: Pytest mocker fixture
+        host_limits: Patched host limits
+    """
+
+    redis_client = MagicMock()
+    redis_client.register_script.return_value = AsyncMock(side_effect=[0, 0, 1, 0, 1])
+    redis_client.zrem = AsyncMock()
+    mocker.patch("api.utils.ratelimit.get_async_redis", return_value=redis_client)
+    mocker.patch("api.utils.ratelimit._async_scripts", None)
+
+    async with async_host_slot(TARGET_URL):
+        redis_client.zrem.assert_not_called()
+
+    redis_client.zrem.assert_awaited_once()
+
+    async with async_host_slot(TARGET_URL):
+        pass
+
+    # The scripts are registered on the first fetch only
+    assert redis_client.register_script.call_count == 3
+
+
+@pytest.mark.asyncio
+async def test_async_host_slot_renews_lease(mocker, host_limits):
+    """Test that the async limiter renews the lease of a slot while the fetch runs
+
+    Args:
+        mocker: Pytest mocker fixture
+        host_limits: Patched host limits
+    """
+
+    redis_client = MagicMock()
+    redis_client.zrem = AsyncMock()
+    reserve_token, acquire_slot, renew_slot = (
+        AsyncMock(return_value=0),
+        AsyncMock(return_value=1),
+        AsyncMock(return_value=1),
+    )
+    redis_client.register_script.side_effect = [reserve_token, acquire_slot, renew_slot]
+    mocker.patch("api.utils.ratelimit.get_async_redis", return_value=redis_client)
+    mocker.patch("api.utils.ratelimit._async_scripts", None)
+    mocker.patch("api.utils.ratelimit.HOST_SLOT_LEASE", 0.03)
+
+    async with async_host_slot(TARGET_URL):
+        await asyncio.sleep(0.1)
+    renewals = renew_slot.await_count
+    await asyncio.sleep(0.05)
+
+    slot = acquire_slot.call_args.kwargs["args"][0]
+    assert renewals >= 2
+    assert renew_slot.await_count == renewals
+    renew_slot.assert_awaited_with(
+        keys=[TEST_LIMIT.slots_key], args=[slot, 30], client=redis_client
+    )
+
+
+@pytest.mark.asyncio
+async def test_async_host_slot_without_redis(mocker, host_limits):
+    """Test that without Redis the in-flight slots are limited in process
+
+    Args:
+        mocker: Pytest mocker fixture
+        host_limits: Patched host limits
+    """
+
+    get_async_redis = mocker.patch("api.utils.ratelimit.get_async_redis")
+    mocker.patch("api.utils.ratelimit.redis_disabled", return_value=True)
+    mocker.patch.dict("api.utils.ratelimit._local_limiters", clear=True)
+    in_flight = []
+    peak = 0
+
+    async def fetch():
+        nonlocal peak
+        async with async_host_slot(TARGET_URL):
+            in_flight.append(None)
+            peak = max(peak, len(in_flight))
+            await asyncio.sleep(0.01)
+            in_flight.pop()
+
+    await asyncio.gather(*(fetch() for _ in range(6)))
+
+    assert peak == TEST_LIMIT.max_in_flight
+    get_async_redis.assert_not_called()
+
+
+def test_local_host_limiter_reserve_token(mocker):
+    """Test that the in-process bucket makes callers wait once the burst is spent
+
+    Args:
+        mocker: Pytest mocker fixture
+    """
+
+    mocker.patch("api.utils.ratelimit.time.monotonic", return_value=100.0)
+    limiter = LocalHostLimiter(TEST_LIMIT)
+
+    waits = [limiter.reserve_token() for _ in range(TEST_LIMIT.burst + 2)]
+
+    assert waits[: TEST_LIMIT.burst] == [0.0] * TEST_LIMIT.burst
+    assert waits[TEST_LIMIT.burst :] == pytest.approx([0.1, 0.2])
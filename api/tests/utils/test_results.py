@@ -0,0 +1,82 @@
+import json
+from unittest.mock import AsyncMock, MagicMock
+
+import pytest
+
+from api.utils.results import (
+    RESULT_ZLIB_JSON,
+    TaskFailure,
+    async_load_result,
+    async_load_results,
+    decode_result,
+    encode_result,
+    result_key,
+    store_failure,
+    store_result,
+)
+
+LONG_RESULT = {"app_name": "app1", "app_description": "A long description. " * 100}
+
+
+def test_encode_result_compresses_long_results():
+    """Test that only results worth compressing are compressed"""
+
+    short = b'{"app_name":"app1"}'
+    assert encode_result(short) == b"j" + short
+    assert decode_result(encode_result(short)) == short
+
+    long = json.dumps(LONG_RESULT).encode()
+    encoded = encode_result(long)
+    assert encoded[:1] == RESULT_ZLIB_JSON
+    assert len(encoded) < len(long) / 10
+    assert decode_result(encoded) == long
+
+
+def test_store_result_expires(mocker):
+    """Test that results are stored once, compactly and with an expiry
+
+    Args:
+        mocker: Pytest mocker fixture
+    """
+
+    mocker.patch("api.utils.results.RESULT_STORE_TTL", 60)
+    redis_client = MagicMock()
+
+    payload = store_result(redis_client, "task-1", LONG_RESULT)
+
+    assert json.loads(payload) == LONG_RESULT
+    key, ttl, value = redis_client.setex.call_args.args
+    assert (key, ttl) == (result_key("task-1"), 60)
+    assert decode_result(value) == payload
+
+
+def test_store_failure(mocker):
+    """Test that the failure of a task is stored in place of its result
+
+    Args:
+        mocker: Pytest mocker fixture
+    """
+
+    mocker.patch("api.utils.results.RESULT_STORE_TTL", 60)
+    redis_client = MagicMock()
+
+    store_failure(redis_client, "task-1", "Unable to scrape")
+
+    key, ttl, value = redis_client.setex.call_args.args
+    assert (key, ttl) == (result_key("task-1"), 60)
+    assert decode_result(value) == TaskFailure("Unable to scrape")
+
+
+@pytest.mark.asyncio
+async def test_async_load_results():
+    """Test that results are read back and missing ones are None"""
+
+    redis_client = AsyncMock()
+    redis_client.get.return_value = None
+    redis_client.mget.return_value = [encode_result(b"{}"), None]
+
+    assert await async_load_result(redis_client, "task-1") is None
+    assert await async_load_results(redis_client, ["task-1", "task-2"]) == [b"{}", None]
+    redis_client.mget.assert_awaited_once_with(
+        [result_key("task-1"), result_key("task-2")]
+    )
@@ -0,0 +1,217 @@
+import json
+from unittest.mock import AsyncMock, MagicMock
+
+import httpx
+import pytest
+import requests_mock
+
+from api.tests.metrics import metric_value
+from api.utils.revalidation import (
+    async_fetch_and_extract,
+    conditional_headers,
+    fetch_and_extract,
+)
+
+TARGET_URL = "https://lords-mobile.en.aptoide.com"
+TEST_ETAG = '"abc123"'
+TEST_LAST_MODIFIED = "Wed, 21 Oct 2023 07:28:00 GMT"
+TEST_CONTENT = "<html><body><h1>Lords Mobile</h1></body></html>"
+TEST_EXTRACTED = {"app_name": "Lords Mobile"}
+
+
+@pytest.fixture
+def mock_redis_client(mocker):
+    redis_client = mocker.patch("api.utils.revalidation.redis_client")
+    redis_client.get.return_value = None
+    return redis_client
+
+
+@pytest.fixture
+def stored_entry():
+    return json.dumps(
+        {
+            "etag": TEST_ETAG,
+            "last_modified": TEST_LAST_MODIFIED,
+            "size": len(TEST_CONTENT),
+            "extracted": TEST_EXTRACTED,
+        }
+    )
+
+
+def test_conditional_headers():
+    """Test that stored validators are turned into conditional request headers"""
+
+    assert conditional_headers(None) == {}
+    assert conditional_headers(
+        {"etag": TEST_ETAG, "last_modified": TEST_LAST_MODIFIED}
+    ) == {"If-None-Match": TEST_ETAG, "If-Modified-Since": TEST_LAST_MODIFIED}
+
+
+def test_fetch_and_extract_stores_validators(mock_redis_client):
+    """Test that the validators and extracted result of a fetched page are stored
+
+    Args:
+        mock_redis_client (MagicMock): Mocked Redis client without stored validators
+    """
+
+    extract = MagicMock(return_value=TEST_EXTRACTED)
+
+    with requests_mock.Mocker() as m:
+        m.get(TARGET_URL, text=TEST_CONTENT, headers={"ETag": TEST_ETAG})
+        result = fetch_and_extract(TARGET_URL, extract)
+
+        assert "If-None-Match" not in m.last_request.headers
+
+    assert result == TEST_EXTRACTED
+    extract.assert_called_once_with(TEST_CONTENT)
+    stored = json.loads(mock_redis_client.setex.call_args.args[2])
+    assert stored["etag"] == TEST_ETAG
+    assert stored["extracted"] == TEST_EXTRACTED
+
+
+def test_fetch_and_extract_without_validators(mock_redis_client):
+    """Test that pages without validators are not stored
+
+    Args:
+        mock_redis_client (MagicMock): Mocked Redis client without stored validators
+    """
+
+    with requests_mock.Mocker() as m:
+        m.get(TARGET_URL, text=TEST_CONTENT)
+        result = fetch_and_extract(TARGET_URL, lambda content: TEST_EXTRACTED)
+
+    assert result == TEST_EXTRACTED
+    mock_redis_client.setex.assert_not_called()
+
+
+def test_fetch_and_extract_not_modified(mock_redis_client, stored_entry):
+    """Test that a 304 reuses the stored result without parsing the page
+
+    Args:
+        mock_redis_client (MagicMock): Mocked Redis client
+        stored_entry (str): Stored validators and extracted result
+    """
+
+    mock_redis_client.get.return_value = stored_entry
+    extract = MagicMock()
+    not_modified = metric_value("page_fetches_total", result="not_modified")
+    bytes_saved = metric_value("page_fetch_bytes_saved_total")
+
+    with requests_mock.Mocker() as m:
+        m.get(TARGET_URL, status_code=304)
+        result = fetch_and_extract(TARGET_URL, extract)
+
+        assert m.last_request.headers["If-None-Match"] == TEST_ETAG
+        assert m.last_request.headers["If-Modified-Since"] == TEST_LAST_MODIFIED
+
+    assert result == TEST_EXTRACTED
+    extract.assert_not_called()
+    assert metric_value("page_fetches_total", result="not_modified") == not_modified + 1
+    saved = metric_value("page_fetch_bytes_saved_total")
+    assert saved == bytes_saved + len(TEST_CONTENT)
+
+
+def test_fetch_and_extract_failed(mock_redis_client):
+    """Test that None is returned if the page can not be fetched
+
+    Args:
+        mock_redis_client (MagicMock): Mocked Redis client without stored validators
+    """
+
+    with requests_mock.Mocker() as m:
+        m.get(TARGET_URL, status_code=500)
+        result = fetch_and_extract(TARGET_URL, lambda content: TEST_EXTRACTED)
+
+    assert result is None
+
+
+def test_fetch_and_extract_empty_page(mock_redis_client):
+    """Test that None is returned without extracting if the page is empty
+
+    Args:
+        mock_redis_client (MagicMock): Mocked Redis client without stored validators
+    """
+
+    extract = MagicMock()
+
+    with requests_mock.Mocker() as m:
+        m.get(TARGET_URL, text="")
+        result = fetch_and_extract(TARGET_URL, extract)
+
+    assert result is None
+    extract.assert_not_called()
+
+
+@pytest.mark.asyncio
+async def test_async_fetch_and_extract_empty_page(mocker):
+    """Test that None is returned without extracting if the page is empty
+
+    Args:
+        mocker: Pytest mocker fixture
+    """
+
+    redis_client = AsyncMock()
+    redis_client.get.return_value = None
+    mocker.patch("api.utils.revalidation.get_async_redis", return_value=redis_client)
+    client = httpx.AsyncClient(
+        transport=httpx.MockTransport(lambda request: httpx.Response(200))
+    )
+    mocker.patch("api.utils.fetch.get_async_client", return_value=client)
+    extract = MagicMock()
+
+    result = await async_fetch_and_extract(TARGET_URL, extract)
+
+    assert result is None
+    extract.assert_not_called()
+
+
+@pytest.mark.asyncio
+async def test_async_fetch_and_extract_not_modified(mocker, stored_entry):
+    """Test that a 304 reuses the stored result without parsing the page
+
+    Args:
+        mocker: Pytest mocker fixture
+        stored_entry (str): Stored validators and extracted result
+    """
+
+    redis_client = AsyncMock()
+    redis_client.get.return_value = stored_entry
+    mocker.patch("api.utils.revalidation.get_async_redis", return_value=redis_client)
+
+    def handler(request: httpx.Request) -> httpx.Response:
+        assert request.headers["If-None-Match"] == TEST_ETAG
+        return httpx.Response(304)
+
+    client = httpx.AsyncClient(transport=httpx.MockTransport(handler))
+    mocker.patch("api.utils.fetch.get_async_client", return_value=client)
+    extract = MagicMock()
+
+    result = await async_fetch_and_extract(TARGET_URL, extract)
+
+    assert result == TEST_EXTRACTED
+    extract.assert_not_called()
+
+
+@pytest.mark.asyncio
+async def test_async_fetch_and_extract_without_redis(mocker):
+    """Test that without Redis pages are fetched and extracted without revalidation
+
+    Args:
+        mocker: Pytest mocker fixture
+    """
+
+    get_async_redis = mocker.patch("api.utils.revalidation.get_async_redis")
+    mocker.patch("api.utils.revalidation.redis_disabled", return_value=True)
+
+    def handler(request: httpx.Request) -> httpx.Response:
+        assert "If-None-Match" not in request.headers
+        return httpx.Response(200, text=TEST_CONTENT, headers={"ETag": TEST_ETAG})
+
+    client = httpx.AsyncClient(transport=httpx.MockTransport(handler))
+    mocker.patch("api.utils.fetch.get_async_client", return_value=client)
+    extract = MagicMock(return_value=TEST_EXTRACTED)
+
+    result = await async_fetch_and_extract(TARGET_URL, extract)
+
+    assert result == TEST_EXTRACTED
+    get_async_redis.assert_not_called()
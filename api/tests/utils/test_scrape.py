@@ -1,10 +1,63 @@
+import asyncio
+import json
+from unittest.mock import AsyncMock
+
+import httpx
 import pytest
 import requests_mock
 from requests.exceptions import Timeout
 
-from api.utils.scrape import fetch_page_content
+import api.utils.scrape
+from api.tests.metrics import metric_value
+from api.utils.ratelimit import host_group
+from api.utils.scrape import (
+    APP_VERSION_CLASS_TOKEN,
+    APP_VERSION_SELECTOR_CLASS,
+    ScrapeFailed,
+    app_pages_with_version,
+    async_fetch_page_content,
+    async_scrape_target_page,
+    extract_app_version,
+    fetch_page_content,
+    format_downloads,
+    scrape_app_version,
+    scrape_many,
+    scrape_target_page,
+)
 
 TARGET_URL = "https://lords-mobile.en.aptoide.com"
+TEST_APP_VERSION = "1.0.0"
+
+
+@pytest.fixture
+def mock_version_html_content():
+    return f"""
+    <html>
+        <body>
+            <span class="{APP_VERSION_SELECTOR_CLASS}">{TEST_APP_VERSION}</span>
+        </body>
+    </html>
+    """
+
+
+@pytest.fixture(autouse=True)
+def mock_page_store(mocker):
+    """Keep page validators out of Redis, every fetch is unconditional"""
+
+    redis_client = mocker.patch("api.utils.revalidation.redis_client")
+    redis_client.get.return_value = None
+    async_redis_client = AsyncMock()
+    async_redis_client.get.return_value = None
+    mocker.patch(
+        "api.utils.revalidation.get_async_redis", return_value=async_redis_client
+    )
+
+
+@pytest.fixture(autouse=True)
+def forget_app_pages(mocker):
+    """Start every test without knowing whether app pages carry the version"""
+
+    mocker.patch.dict(app_pages_with_version, clear=True)
 
 
 @pytest.fixture
@@ -69,3 +122,386 @@ def test_fetch_page_content_unicode_exception():
         content = fetch_page_content(TARGET_URL)
 
         assert content is None
+
+
+@pytest.fixture
+def mock_async_client(mocker, mock_html_content, mock_version_html_content):
+    def handler(request: httpx.Request) -> httpx.Response:
+        if request.url.path == "/versions":
+            return httpx.Response(200, text=mock_version_html_content)
+        return httpx.Response(200, text=mock_html_content)
+
+    client = httpx.AsyncClient(transport=httpx.MockTransport(handler))
+    mocker.patch("api.utils.fetch.get_async_client", return_value=client)
+    return client
+
+
+@pytest.mark.asyncio
+async def test_async_fetch_page_content(mock_async_client, mock_html_content):
+    """Test that the async_fetch_page_content function returns the correct content
+
+    Args:
+        mock_async_client: Mocked async HTTP client
+        mock_html_content: Mock HTML content
+    """
+
+    content = await async_fetch_page_content(TARGET_URL)
+
+    assert content == mock_html_content
+
+
+@pytest.mark.asyncio
+async def test_async_fetch_page_content_not_found(mocker):
+    """Test that the async_fetch_page_content function returns None if the request fails
+
+    Args:
+        mocker: Pytest mocker fixture
+    """
+
+    client = httpx.AsyncClient(
+        transport=httpx.MockTransport(lambda request: httpx.Response(404))
+    )
+    mocker.patch("api.utils.fetch.get_async_client", return_value=client)
+
+    content = await async_fetch_page_content(TARGET_URL)
+
+    assert content is None
+
+
+@pytest.mark.asyncio
+async def test_async_scrape_target_page(mock_async_client):
+    """Test that the async_scrape_target_page function scrapes the page and its version
+
+    Args:
+        mock_async_client: Mocked async HTTP client
+    """
+
+    result = await async_scrape_target_page(f"{TARGET_URL}/app")
+
+    assert result is not None
+    assert result["app_url"] == TARGET_URL
+    assert result["app_version"] == TEST_APP_VERSION
+
+
+def test_scrape_target_page(mock_html_content, mock_version_html_content):
+    """Test that the scrape_target_page function scrapes the page and its version
+
+    Args:
+        mock_html_content: Mock HTML content
+        mock_version_html_content: Mock HTML content of the Versions page
+    """
+
+    with requests_mock.Mocker() as m:
+        m.get(TARGET_URL, text=mock_html_content)
+        m.get(f"{TARGET_URL}/versions", text=mock_version_html_content)
+        result = scrape_target_page(f"{TARGET_URL}/app")
+
+    assert result is not None
+    assert result["app_url"] == TARGET_URL
+    assert result["app_version"] == TEST_APP_VERSION
+
+
+def test_scrape_target_page_not_found():
+    """Test that the scrape_target_page function returns None if the app page fails"""
+
+    # An early Versions fetch is not waited for and could outlive the mocker
+    app_pages_with_version[host_group(TARGET_URL)] = True
+
+    with requests_mock.Mocker() as m:
+        m.get(TARGET_URL, status_code=404)
+        m.get(f"{TARGET_URL}/versions", status_code=404)
+        result = scrape_target_page(TARGET_URL)
+
+    assert result is None
+
+
+def test_extract_app_version(mock_version_html_content):
+    """Test that the app version is extracted from the Versions page
+
+    Args:
+        mock_version_html_content: Mock HTML content of the Versions page
+    """
+
+    assert extract_app_version(mock_version_html_content) == TEST_APP_VERSION
+
+
+def test_extract_app_version_class_token():
+    """Test that the version span is matched by its class token, not the full class"""
+
+    content = f"""
+    <html>
+        <body>
+            <span class="{APP_VERSION_CLASS_TOKEN}-suffix">0.0.1</span>
+            <span class="abcDEF {APP_VERSION_CLASS_TOKEN}"><b>{TEST_APP_VERSION}</b></span>
+        </body>
+    </html>
+    """
+
+    assert extract_app_version(content) == TEST_APP_VERSION
+
+
+def test_extract_app_version_not_found():
+    """Test that None is returned if the Versions page has no version"""
+
+    assert extract_app_version("<html><body><span>1.0</span></body></html>") is None
+
+
+@pytest.fixture
+def mock_next_data_html_content():
+    next_data = {
+        "props": {
+            "pageProps": {
+                "app": {"name": "Example App", "file": {"vername": TEST_APP_VERSION}}
+            }
+        }
+    }
+    return f"""
+    <html>
+        <body>
+            <div id="__next"></div>
+            <script id="__NEXT_DATA__" type="application/json">{json.dumps(next_data)}</script>
+        </body>
+    </html>
+    """
+
+
+def test_scrape_target_page_next_data(mock_next_data_html_content):
+    """Test that the Next.js data serves the page and its version
+
+    Args:
+        mock_next_data_html_content: Mock HTML content with Next.js data
+    """
+
+    app_pages_with_version[host_group(TARGET_URL)] = True
+    next_data_extractions = metric_value("scrape_extractions_total", path="next_data")
+
+    with requests_mock.Mocker() as m:
+        m.get(TARGET_URL, text=mock_next_data_html_content)
+        versions = m.get(f"{TARGET_URL}/versions", status_code=404)
+        result = scrape_target_page(TARGET_URL)
+
+    assert result is not None
+    assert result["app_name"] == "Example App"
+    assert result["app_version"] == TEST_APP_VERSION
+    assert (
+        metric_value("scrape_extractions_total", path="next_data")
+        == next_data_extractions + 1
+    )
+    assert not versions.called
+
+
+@pytest.mark.asyncio
+async def test_async_scrape_target_page_next_data(mocker, mock_next_data_html_content):
+    """Test that the Versions page is not fetched once app pages had the version
+
+    Args:
+        mocker: Pytest mocker fixture
+        mock_next_data_html_content: Mock HTML content with Next.js data
+    """
+
+    requested = []
+
+    def handler(request: httpx.Request) -> httpx.Response:
+        requested.append(request.url.path)
+        return httpx.Response(200, text=mock_next_data_html_content)
+
+    client = httpx.AsyncClient(transport=httpx.MockTransport(handler))
+    mocker.patch("api.utils.fetch.get_async_client", return_value=client)
+
+    # The first page of the host may have its Versions page fetched alongside
+    await async_scrape_target_page(TARGET_URL)
+    requested.clear()
+    result = await async_scrape_target_page(TARGET_URL)
+
+    assert result["app_version"] == TEST_APP_VERSION
+    assert requested == ["/"]
+
+
+def test_scrape_target_page_versions_concurrently(
+    mocker, mock_html_content, mock_version_html_content
+):
+    """Test that the Versions page is fetched alongside app pages without the version
+
+    Args:
+        mocker: Pytest mocker fixture
+        mock_html_content: Mock HTML content
+        mock_version_html_content: Mock HTML content of the Versions page
+    """
+
+    app_pages_with_version[host_group(TARGET_URL)] = False
+    submit = mocker.spy(api.utils.scrape._fetch_executor, "submit")
+
+    with requests_mock.Mocker() as m:
+        m.get(TARGET_URL, text=mock_html_content)
+        m.get(f"{TARGET_URL}/versions", text=mock_version_html_content)
+        result = scrape_target_page(TARGET_URL)
+
+    assert result["app_version"] == TEST_APP_VERSION
+    submit.assert_called_once_with(scrape_app_version, TARGET_URL)
+
+
+def test_scrape_target_page_xpath_fallback(
+    mock_html_content, mock_version_html_content
+):
+    """Test that pages without Next.js data are extracted with the XPath fields
+
+    Args:
+        mock_html_content: Mock HTML content
+        mock_version_html_content: Mock HTML content of the Versions page
+    """
+
+    xpath_extractions = metric_value("scrape_extractions_total", path="xpath")
+
+    with requests_mock.Mocker() as m:
+        m.get(TARGET_URL, text=mock_html_content)
+        m.get(f"{TARGET_URL}/versions", text=mock_version_html_content)
+        result = scrape_target_page(TARGET_URL)
+
+    assert result["app_version"] == TEST_APP_VERSION
+    assert (
+        metric_value("scrape_extractions_total", path="xpath") == xpath_extractions + 1
+    )
+
+
+def test_scrape_target_page_next_data_other_shape(
+    mock_html_content, mock_version_html_content
+):
+    """Test that Next.js data without the expected keys falls back to the XPath fields
+
+    Args:
+        mock_html_content: Mock HTML content
+        mock_version_html_content: Mock HTML content of the Versions page
+    """
+
+    next_data = json.dumps({"props": {"pageProps": {"app": {"title": "Other"}}}})
+    content = mock_html_content.replace(
+        "</body>",
+        f'<script id="__NEXT_DATA__" type="application/json">{next_data}</script>'
+        "</body>",
+    )
+    xpath_extractions = metric_value("scrape_extractions_total", path="xpath")
+
+    with requests_mock.Mocker() as m:
+        m.get(TARGET_URL, text=content)
+        m.get(f"{TARGET_URL}/versions", text=mock_version_html_content)
+        result = scrape_target_page(TARGET_URL)
+
+    assert result["app_version"] == TEST_APP_VERSION
+    assert (
+        metric_value("scrape_extractions_total", path="xpath") == xpath_extractions + 1
+    )
+
+
+@pytest.mark.parametrize(
+    "downloads, expected",
+    [(999, "999"), (1_000, "1K+"), (5_300_000, "5M+"), (1_200_000_000, "1B+")],
+)
+def test_format_downloads(downloads, expected):
+    """Test that download counts are rounded down to their unit
+
+    Args:
+        downloads (int): Number of downloads
+        expected (str): Formatted download count
+    """
+
+    assert format_downloads(downloads) == expected
+
+
+def test_scrape_target_page_streaming(
+    mocker, mock_html_content, mock_version_html_content
+):
+    """Test that the app page can be parsed while it downloads
+
+    Args:
+        mocker: Pytest mocker fixture
+        mock_html_content: Mock HTML content
+        mock_version_html_content: Mock HTML content of the Versions page
+    """
+
+    mocker.patch("api.utils.scrape.SCRAPE_STREAMING_PARSE", True)
+    xpath_extractions = metric_value("scrape_extractions_total", path="xpath")
+
+    with requests_mock.Mocker() as m:
+        m.get(TARGET_URL, text=mock_html_content)
+        m.get(f"{TARGET_URL}/versions", text=mock_version_html_content)
+        result = scrape_target_page(TARGET_URL)
+
+    assert result["app_url"] == TARGET_URL
+    assert result["app_version"] == TEST_APP_VERSION
+    assert (
+        metric_value("scrape_extractions_total", path="xpath") == xpath_extractions + 1
+    )
+
+
+@pytest.fixture
+def fake_async_scrape(mocker):
+    """Scrape app-<n> URLs in n hundredths of a second, app-0 fails"""
+
+    async def scrape(url, with_version=True):
+        delay = int(url.split("-")[1].split(".")[0])
+        await asyncio.sleep(delay / 100)
+        if delay == 0:
+            return None
+        details = {"app_url": url, "app_name": f"App {delay}"}
+        return {**details, "app_version": "1.0"} if with_version else details
+
+    return mocker.patch("api.utils.scrape.async_scrape_target_page", side_effect=scrape)
+
+
+def app_url(n):
+    return f"https://app-{n}.en.aptoide.com"
+
+
+@pytest.mark.asyncio
+async def test_scrape_many_yields_in_completion_order(fake_async_scrape):
+    """Test that results come as they complete and duplicate apps are skipped
+
+    Args:
+        fake_async_scrape (MagicMock): Mocked async scrape
+    """
+
+    urls = [app_url(3), app_url(1), f"{app_url(3)}/versions", app_url(2), app_url(0)]
+    results = [item async for item in scrape_many(urls, concurrency=4)]
+
+    assert [url for url, _ in results] == [app_url(n) for n in (0, 1, 2, 3)]
+    assert isinstance(results[0][1], ScrapeFailed)
+    assert results[1][1]["app_name"] == "App 1"
+    assert fake_async_scrape.call_count == 4
+
+
+@pytest.mark.asyncio
+async def test_scrape_many_selects_fields(fake_async_scrape):
+    """Test that only the requested fields are kept and fetched
+
+    Args:
+        fake_async_scrape (MagicMock): Mocked async scrape
+    """
+
+    results = [item async for item in scrape_many([app_url(1)], fields=["app_name"])]
+
+    assert results == [(app_url(1), {"app_name": "App 1"})]
+    fake_async_scrape.assert_called_once_with(app_url(1), with_version=False)
+
+
+@pytest.mark.asyncio
+async def test_scrape_many_bounds_reading_ahead(fake_async_scrape):
+    """Test that URLs are only read while there is room to scrape them
+
+    Args:
+        fake_async_scrape (MagicMock): Mocked async scrape
+    """
+
+    read = []
+
+    def urls():
+        for n in range(1, 1000):
+            read.append(n)
+            yield app_url(n)
+
+    results = scrape_many(urls(), concurrency=3)
+    async for url, _ in results:
+        break
+    await results.aclose()
+
+    assert url == app_url(1)
+    assert read == [1, 2, 3]
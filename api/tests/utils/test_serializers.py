@@ -0,0 +1,63 @@
+import json
+
+import pytest
+
+from api.schemas.scrape import (
+    AsyncScrapeResultSchema,
+    BatchScrapeProgressSchema,
+    BatchScrapeResultSchema,
+    ScrapeResultSchema,
+)
+from api.utils.serializers import compile_serializer, json_media_handler
+
+TEST_RESULT = {
+    "app_name": "app1",
+    "app_version": "1.0.0",
+    "app_description": "app1 desc",
+    "no_downloads": "5M+",
+    "app_url": "https://app1.com",
+    "app_release_date": "2023-01-01",
+    "unknown": "dropped",
+}
+
+
+@pytest.mark.parametrize(
+    "schema_class, obj",
+    [
+        (ScrapeResultSchema, {"target_url": "https://app1.com", "result": TEST_RESULT}),
+        (ScrapeResultSchema, {"target_url": "https://app1.com", "result": None}),
+        (ScrapeResultSchema, {"cached": 1, "cache_age": 3, "error": None}),
+        (AsyncScrapeResultSchema, {"task_id": "1234", "status": "PENDING"}),
+        (
+            BatchScrapeResultSchema,
+            {
+                "batch_id": "5678",
+                "tasks": [
+                    {"target_url": "https://app1.com", "task_id": "1", "status": "SENT"}
+                ],
+            },
+        ),
+        (BatchScrapeProgressSchema, {"batch_id": "5678", "total": 2, "ready": 2.0}),
+    ],
+)
+def test_compiled_serializer_matches_schema_dump(schema_class, obj):
+    """Test that a compiled serializer dumps like the schema it comes from
+
+    Args:
+        schema_class (Type[Schema]): Schema to compile
+        obj (dict): Dictionary to dump
+    """
+
+    expected = schema_class().dump(obj)
+
+    assert compile_serializer(schema_class)(obj) == expected
+    assert json.dumps(compile_serializer(schema_class)(obj)) == json.dumps(expected)
+
+
+def test_json_media_handler_round_trip():
+    """Test that the JSON media handler encodes and decodes responses"""
+
+    handler = json_media_handler()
+    data = handler.serialize({"task_id": "1234", "result": None}, "application/json")
+
+    assert json.loads(data) == {"task_id": "1234", "result": None}
@@ -0,0 +1,93 @@
+import asyncio
+
+import pytest
+
+from api.tests.metrics import metric_value
+from api.utils.singleflight import SingleFlight
+
+TEST_GROUP = "test"
+
+
+@pytest.mark.asyncio
+async def test_singleflight_collapses_concurrent_calls():
+    """Test that concurrent calls with the same key share a single call"""
+
+    flight: SingleFlight[str] = SingleFlight(TEST_GROUP)
+    release = asyncio.Event()
+    calls = 0
+    collapsed = metric_value(
+        "singleflight_calls_total", group=TEST_GROUP, role="collapsed"
+    )
+
+    async def fn() -> str:
+        nonlocal calls
+        calls += 1
+        await release.wait()
+        return "result"
+
+    waiters = [asyncio.ensure_future(flight.do("key", fn)) for _ in range(5)]
+    await asyncio.sleep(0)
+    release.set()
+
+    assert await asyncio.gather(*waiters) == ["result"] * 5
+    assert calls == 1
+    assert flight.in_flight() == 0
+    assert (
+        metric_value("singleflight_calls_total", group=TEST_GROUP, role="collapsed")
+        == collapsed + 4
+    )
+
+
+@pytest.mark.asyncio
+async def test_singleflight_separate_keys():
+    """Test that calls with different keys are not collapsed"""
+
+    flight: SingleFlight[str] = SingleFlight(TEST_GROUP)
+
+    async def fn(value: str) -> str:
+        await asyncio.sleep(0)
+        return value
+
+    results = await asyncio.gather(
+        flight.do("a", lambda: fn("a")), flight.do("b", lambda: fn("b"))
+    )
+
+    assert results == ["a", "b"]
+
+
+@pytest.mark.asyncio
+async def test_singleflight_propagates_exceptions():
+    """Test that an exception of the shared call is raised to every caller"""
+
+    flight: SingleFlight[str] = SingleFlight(TEST_GROUP)
+
+    async def fn() -> str:
+        await asyncio.sleep(0)
+        raise ValueError("upstream failed")
+
+    results = await asyncio.gather(
+        flight.do("key", fn), flight.do("key", fn), return_exceptions=True
+    )
+
+    assert all(isinstance(result, ValueError) for result in results)
+
+
+@pytest.mark.asyncio
+async def test_singleflight_survives_cancelled_caller():
+    """Test that cancelling the first caller does not cancel the shared call"""
+
+    flight: SingleFlight[str] = SingleFlight(TEST_GROUP)
+    release = asyncio.Event()
+
+    async def fn() -> str:
+        await release.wait()
+        return "result"
+
+    leader = asyncio.ensure_future(flight.do("key", fn))
+    follower = asyncio.ensure_future(flight.do("key", fn))
+    await asyncio.sleep(0)
+
+    leader.cancel()
+    release.set()
+
+    assert await follower == "result"
@@ -0,0 +1,57 @@
+import json
+
+from api.utils.sse import (
+    StreamLimiter,
+    decode_cursor,
+    encode_cursor,
+    encode_task_result,
+    parse_task_ids,
+    pending_positions,
+)
+
+
+def test_cursor_round_trip():
+    """Test that delivered positions survive encoding as an event ID"""
+
+    delivered = {0, 3, 64, 999}
+
+    assert decode_cursor(encode_cursor(delivered), 1000) == delivered
+
+
+def test_decode_invalid_cursor():
+    """Test that a missing or invalid Last-Event-ID resumes from the start"""
+
+    assert decode_cursor(None, 10) == set()
+    assert decode_cursor("not-hex", 10) == set()
+
+
+def test_parse_task_ids():
+    """Test that task IDs are split, stripped and deduplicated in order"""
+
+    assert parse_task_ids(" b, a,,b ,c") == ["b", "a", "c"]
+    assert parse_task_ids(None) == []
+
+
+def test_pending_positions():
+    """Test that delivered tasks are left out of the pending tasks"""
+
+    assert pending_positions(["a", "b", "c"], {1}) == {"a": 0, "c": 2}
+
+
+def test_encode_task_result():
+    """Test that the result event data is valid JSON with the task ID"""
+
+    data = encode_task_result('task"1', b'{"app_name": "app1"}')
+
+    assert json.loads(data) == {"task_id": 'task"1', "result": {"app_name": "app1"}}
+
+
+def test_stream_limiter():
+    """Test that streams over the limit are rejected until a slot is released"""
+
+    limiter = StreamLimiter(limit=1)
+
+    assert limiter.acquire() is True
+    assert limiter.acquire() is False
+    limiter.release()
+    assert limiter.acquire() is True
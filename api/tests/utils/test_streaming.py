@@ -0,0 +1,91 @@
+import json
+
+from lxml import html
+
+import api.utils.scrape  # noqa: F401 registers the Next.js data fields
+from api.utils.fields import extract_fields, register_field, register_page
+from api.utils.streaming import StreamingFieldParser
+
+TEST_PAGE = "streaming"
+TEST_FILLER = "".join(f"<div>filler {i}</div>" for i in range(500))
+TEST_CONTENT = f"""
+<html>
+    <body>
+        <div id="root">
+            <div><h1>Example App</h1></div>
+            <div><p>First</p><p>Second</p></div>
+        </div>
+        {TEST_FILLER}
+    </body>
+</html>
+""".encode()
+
+register_page(TEST_PAGE, '//*[@id="root"]')
+register_field("title", "div/h1", page=TEST_PAGE)
+register_field(
+    "paragraphs",
+    "div/p",
+    lambda matches: [p.text_content() for p in matches],
+    page=TEST_PAGE,
+)
+
+
+def feed_in_chunks(parser: StreamingFieldParser, content: bytes, size: int) -> int:
+    """Feed content to the parser until it is done
+
+    Returns:
+        int: Number of bytes fed
+    """
+
+    for start in range(0, len(content), size):
+        if parser.feed(content[start : start + size]):
+            return start + size
+    return len(content)
+
+
+def test_streaming_parser_stops_early():
+    """Test that the parser is done once its fields are final, before the page ends"""
+
+    parser = StreamingFieldParser(TEST_PAGE)
+
+    fed = feed_in_chunks(parser, TEST_CONTENT, 64)
+
+    assert fed < len(TEST_CONTENT) / 2
+    assert parser.close() == extract_fields(html.fromstring(TEST_CONTENT), TEST_PAGE)
+
+
+def test_streaming_parser_waits_for_complete_fields():
+    """Test that a field still open at the end of a chunk is not final"""
+
+    parser = StreamingFieldParser(TEST_PAGE)
+    split = TEST_CONTENT.index(b"<p>Second")
+
+    assert not parser.feed(TEST_CONTENT[:split])
+    feed_in_chunks(parser, TEST_CONTENT[split:], 64)
+
+    assert parser.close() == {"title": "Example App", "paragraphs": ["First", "Second"]}
+
+
+def test_streaming_parser_missing_root():
+    """Test that a page without its root is read to the end and has empty fields"""
+
+    parser = StreamingFieldParser(TEST_PAGE)
+    content = b"<html><body>" + TEST_FILLER.encode() + b"</body></html>"
+
+    assert feed_in_chunks(parser, content, 64) == len(content)
+    assert parser.close() == {"title": None, "paragraphs": []}
+
+
+def test_streaming_parser_next_data():
+    """Test that the parser is done once the Next.js data of the page was read"""
+
+    next_data = json.dumps({"props": {"pageProps": {"app": {"name": "Example App"}}}})
+    content = (
+        f'<html><body><script id="__NEXT_DATA__" type="application/json">{next_data}'
+        f"</script>{TEST_FILLER}</body></html>"
+    ).encode()
+    parser = StreamingFieldParser(TEST_PAGE)
+
+    assert feed_in_chunks(parser, content, 64) < len(content)
+    assert parser.from_next_data
+    assert parser.close()["app_name"] == "Example App"
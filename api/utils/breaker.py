@@ -0,0 +1,145 @@
+import logging
+import threading
+import time
+from typing import Dict
+
+from prometheus_client import Counter, Gauge
+
+from api.settings import (
+    BREAKER_FAILURE_THRESHOLD,
+    BREAKER_HALF_OPEN_PROBES,
+    BREAKER_RESET_TIMEOUT,
+)
+
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+CIRCUIT_CLOSED = "closed"
+CIRCUIT_HALF_OPEN = "half_open"
+CIRCUIT_OPEN = "open"
+
+# Values of the state gauge, higher is less healthy
+CIRCUIT_STATE_VALUES = {CIRCUIT_CLOSED: 0, CIRCUIT_HALF_OPEN: 1, CIRCUIT_OPEN: 2}
+
+circuit_state = Gauge(
+    "fetch_circuit_state",
+    "Circuit breaker state per upstream host, 0 closed, 1 half-open, 2 open",
+    ("host",),
+)
+circuit_rejections = Counter(
+    "fetch_circuit_rejections_total",
+    "Upstream fetches failed fast by an open circuit breaker",
+    ("host",),
+)
+
+
+class CircuitBreaker:
+    """Stop calling an unhealthy upstream host and probe it until it recovers
+
+    The circuit opens after a run of consecutive failures. While it is open,
+    calls fail fast. Once the reset timeout has passed it turns half-open and
+    lets a few probe calls through: a success closes it, a failure opens it
+    again. Every allowed call must report its outcome, or release its probe
+    if it ended without one.
+    """
+
+    def __init__(
+        self,
+        name: str,
+        failure_threshold: int = BREAKER_FAILURE_THRESHOLD,
+        reset_timeout: float = BREAKER_RESET_TIMEOUT,
+        half_open_probes: int = BREAKER_HALF_OPEN_PROBES,
+    ) -> None:
+        self.name = name
+        self.failure_threshold = failure_threshold
+        self.reset_timeout = reset_timeout
+        self.half_open_probes = half_open_probes
+        self.state = CIRCUIT_CLOSED
+        self._failures = 0
+        self._probes = 0
+        self._opened_at = 0.0
+        self._lock = threading.Lock()
+        circuit_state.labels(host=name).set(CIRCUIT_STATE_VALUES[self.state])
+
+    def allow(self) -> bool:
+        """Check whether a call may go ahead
+
+        Returns:
+            bool: True if the call may go ahead, False if it should fail fast
+        """
+
+        with self._lock:
+            if (
+                self.state == CIRCUIT_OPEN
+                and time.monotonic() - self._opened_at >= self.reset_timeout
+            ):
+                self._transition(CIRCUIT_HALF_OPEN)
+
+            if self.state == CIRCUIT_HALF_OPEN and self._probes < self.half_open_probes:
+                self._probes += 1
+                return True
+
+            if self.state == CIRCUIT_CLOSED:
+                return True
+
+        circuit_rejections.labels(host=self.name).inc()
+        return False
+
+    def record_success(self) -> None:
+        """Report that an allowed call reached a healthy host"""
+
+        with self._lock:
+            self._failures = 0
+            if self.state != CIRCUIT_CLOSED:
+                self._transition(CIRCUIT_CLOSED)
+
+    def record_failure(self) -> None:
+        """Report that an allowed call failed because of the host"""
+
+        with self._lock:
+            self._failures += 1
+            if self.state == CIRCUIT_HALF_OPEN or (
+                self.state == CIRCUIT_CLOSED
+                and self._failures >= self.failure_threshold
+            ):
+                self._transition(CIRCUIT_OPEN)
+
+    def release(self) -> None:
+        """Give back the probe of an allowed call that ended without an outcome
+
+        A cancelled call, or one failing for a reason unrelated to the host,
+        says nothing of its health. Its probe is freed for the next call,
+        otherwise a half-open circuit would never be probed again.
+        """
+
+        with self._lock:
+            if self.state == CIRCUIT_HALF_OPEN and self._probes > 0:
+                self._probes -= 1
+
+    def _transition(self, state: str) -> None:
+        logger.warning(f"Circuit of {self.name} is {state}")
+        self.state = state
+        self._probes = 0
+        if state == CIRCUIT_OPEN:
+            self._opened_at = time.monotonic()
+        circuit_state.labels(host=self.name).set(CIRCUIT_STATE_VALUES[state])
+
+
+breakers: Dict[str, CircuitBreaker] = {}
+_breakers_lock = threading.Lock()
+
+
+def get_breaker(host: str) -> CircuitBreaker:
+    """Get the circuit breaker of an upstream host, creating it on first use
+
+    Args:
+        host (str): Host, or host pattern sharing limits, to get the breaker of
+
+    Returns:
+        CircuitBreaker: Circuit breaker of the host
+    """
+
+    with _breakers_lock:
+        if host not in breakers:
+            breakers[host] = CircuitBreaker(host)
+        return breakers[host]
@@ -0,0 +1,238 @@
+import asyncio
+import json
+import logging
+import time
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass
+from typing import Awaitable, Callable, Optional, Set, cast
+
+from prometheus_client import Counter
+from redis import Redis, RedisError
+from redis.asyncio import Redis as AsyncRedis
+
+from api.settings import (
+    SCRAPE_CACHE_REFRESH_LOCK_TTL,
+    SCRAPE_CACHE_STALE_TTL,
+    SCRAPE_CACHE_TTL,
+)
+from api.utils.url import convert_to_base_url
+
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+CACHE_KEY_PREFIX = "scrape:cache:"
+REFRESH_LOCK_KEY_PREFIX = "scrape:cache-refresh:"
+
+CACHE_HIT = "hit"
+CACHE_MISS = "miss"
+CACHE_STALE = "stale"
+
+cache_requests = Counter(
+    "scrape_cache_requests_total",
+    "Scrape result cache lookups by outcome",
+    ("result",),
+)
+cache_refreshes = Counter(
+    "scrape_cache_refreshes_total",
+    "Background refreshes of stale scrape results",
+)
+
+# Threads used by the sync path to refresh stale entries after they were served
+_refresh_executor = ThreadPoolExecutor(
+    max_workers=2, thread_name_prefix="cache-refresh"
+)
+
+# Keep references to background refreshes so they are not garbage collected
+_refresh_tasks: Set[asyncio.Task] = set()
+
+
+@dataclass
+class CachedScrape:
+    """Scrape result together with where it was served from"""
+
+    result: Optional[dict]
+    cached: bool = False
+    age: float = 0.0
+
+
+def cache_key(url: str) -> str:
+    """Build the cache key of a target URL from its base URL
+
+    Args:
+        url (str): URL of the target page
+
+    Returns:
+        str: Cache key
+    """
+
+    return f"{CACHE_KEY_PREFIX}{convert_to_base_url(url)}"
+
+
+def _encode(result: dict) -> str:
+    return json.dumps({"result": result, "scraped_at": time.time()})
+
+
+def _lookup(raw: Optional[bytes]) -> CachedScrape:
+    """Classify a raw cache entry as a hit, a stale hit or a miss"""
+
+    if raw is None:
+        cache_requests.labels(result=CACHE_MISS).inc()
+        return CachedScrape(result=None)
+
+    try:
+        entry = json.loads(raw)
+        age = max(time.time() - entry["scraped_at"], 0.0)
+    except (ValueError, KeyError, TypeError) as e:
+        # Corrupt or of an older format, scraped again and overwritten
+        logger.error(f"Unreadable cache entry, treated as a miss: {e}")
+        cache_requests.labels(result=CACHE_MISS).inc()
+        return CachedScrape(result=None)
+
+    cache_requests.labels(
+        result=CACHE_HIT if age < SCRAPE_CACHE_TTL else CACHE_STALE
+    ).inc()
+    return CachedScrape(result=entry["result"], cached=True, age=age)
+
+
+def _is_stale(cached: CachedScrape) -> bool:
+    return cached.cached and cached.age >= SCRAPE_CACHE_TTL
+
+
+def _store(redis_client: Redis, key: str, result: Optional[dict]) -> None:
+    # Failed scrapes are not cached so the next request tries again
+    if result is not None:
+        redis_client.setex(
+            key, SCRAPE_CACHE_TTL + SCRAPE_CACHE_STALE_TTL, _encode(result)
+        )
+
+
+async def _async_store(
+    redis_client: AsyncRedis, key: str, result: Optional[dict]
+) -> None:
+    if result is not None:
+        await redis_client.setex(
+            key, SCRAPE_CACHE_TTL + SCRAPE_CACHE_STALE_TTL, _encode(result)
+        )
+
+
+def _refresh(
+    redis_client: Redis, url: str, scrape: Callable[[str], Optional[dict]]
+) -> None:
+    key = cache_key(url)
+    try:
+        _store(redis_client, key, scrape(url))
+        cache_refreshes.inc()
+    except RedisError as e:
+        logger.error(f"Error refreshing cached result of {url}: {e}")
+    finally:
+        try:
+            redis_client.delete(f"{REFRESH_LOCK_KEY_PREFIX}{key}")
+        except RedisError as e:
+            logger.error(f"Error releasing the refresh lock of {url}: {e}")
+
+
+async def _async_refresh(
+    redis_client: AsyncRedis,
+    url: str,
+    scrape: Callable[[str], Awaitable[Optional[dict]]],
+) -> None:
+    key = cache_key(url)
+    try:
+        await _async_store(redis_client, key, await scrape(url))
+        cache_refreshes.inc()
+    except RedisError as e:
+        logger.error(f"Error refreshing cached result of {url}: {e}")
+    finally:
+        try:
+            await redis_client.delete(f"{REFRESH_LOCK_KEY_PREFIX}{key}")
+        except RedisError as e:
+            logger.error(f"Error releasing the refresh lock of {url}: {e}")
+
+
+def get_or_scrape(
+    redis_client: Redis, url: str, scrape: Callable[[str], Optional[dict]]
+) -> CachedScrape:
+    """Serve a scrape result from the cache, scraping the page on a miss
+
+    Stale results are served as they are while a single background refresh,
+    guarded by a lock in Redis, replaces them.
+
+    Args:
+        redis_client (Redis): Redis client holding the cache
+        url (str): URL of the target page
+        scrape (Callable[[str], Optional[dict]]): Function scraping the page
+
+    Returns:
+        CachedScrape: Scrape result and whether it was served from the cache
+    """
+
+    key = cache_key(url)
+    try:
+        cached = _lookup(cast(Optional[bytes], redis_client.get(key)))
+        refresh = _is_stale(cached) and redis_client.set(
+            f"{REFRESH_LOCK_KEY_PREFIX}{key}",
+            1,
+            nx=True,
+            ex=SCRAPE_CACHE_REFRESH_LOCK_TTL,
+        )
+    except RedisError as e:
+        logger.error(f"Error reading cached result of {url}: {e}")
+        return CachedScrape(result=scrape(url))
+
+    if refresh:
+        _refresh_executor.submit(_refresh, redis_client, url, scrape)
+
+    if cached.cached:
+        return cached
+
+    result = scrape(url)
+    try:
+        _store(redis_client, key, result)
+    except RedisError as e:
+        logger.error(f"Error caching result of {url}: {e}")
+    return CachedScrape(result=result)
+
+
+async def async_get_or_scrape(
+    redis_client: AsyncRedis,
+    url: str,
+    scrape: Callable[[str], Awaitable[Optional[dict]]],
+) -> CachedScrape:
+    """Serve a scrape result from the cache without blocking the event loop
+
+    Args:
+        redis_client (AsyncRedis): Async Redis client holding the cache
+        url (str): URL of the target page
+        scrape (Callable[[str], Awaitable[Optional[dict]]]): Coroutine function scraping the page
+
+    Returns:
+        CachedScrape: Scrape result and whether it was served from the cache
+    """
+
+    key = cache_key(url)
+    try:
+        cached = _lookup(await redis_client.get(key))
+        refresh = _is_stale(cached) and await redis_client.set(
+            f"{REFRESH_LOCK_KEY_PREFIX}{key}",
+            1,
+            nx=True,
+            ex=SCRAPE_CACHE_REFRESH_LOCK_TTL,
+        )
+    except RedisError as e:
+        logger.error(f"Error reading cached result of {url}: {e}")
+        return CachedScrape(result=await scrape(url))
+
+    if refresh:
+        task = asyncio.create_task(_async_refresh(redis_client, url, scrape))
+        _refresh_tasks.add(task)
+        task.add_done_callback(_refresh_tasks.discard)
+
+    if cached.cached:
+        return cached
+
+    result = await scrape(url)
+    try:
+        await _async_store(redis_client, key, result)
+    except RedisError as e:
+        logger.error(f"Error caching result of {url}: {e}")
+    return CachedScrape(result=result)
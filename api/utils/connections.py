@@ -0,0 +1,119 @@
+from typing import Optional
+
+from prometheus_client import Gauge
+from redis import Redis
+from redis.asyncio import BlockingConnectionPool
+from redis.asyncio import Redis as AsyncRedis
+
+from api.settings import (
+    REDIS_DB,
+    REDIS_HOST,
+    REDIS_POOL_SIZE,
+    REDIS_POOL_TIMEOUT,
+    REDIS_PORT,
+)
+
+redis_client = Redis(host=REDIS_HOST, port=REDIS_PORT, db=REDIS_DB)
+
+_async_redis_pool: Optional[BlockingConnectionPool] = None
+_async_redis_client: Optional[AsyncRedis] = None
+
+# Set in processes running without Redis, such as the command-line scraper
+_redis_disabled = False
+
+
+def disable_redis() -> None:
+    """Scrape without Redis in this process
+
+    The host limits are kept in process and pages are not revalidated, so
+    nothing is shared with the API and its workers.
+    """
+
+    global _redis_disabled
+
+    _redis_disabled = True
+
+
+def redis_disabled() -> bool:
+    """Tell whether this process scrapes without Redis
+
+    Returns:
+        bool: True once disable_redis was called
+    """
+
+    return _redis_disabled
+
+
+def get_async_redis() -> AsyncRedis:
+    """Get the process-wide async Redis client, creating its pool on first use
+
+    All callers share one bounded connection pool. When every connection is in
+    use, callers wait up to REDIS_POOL_TIMEOUT seconds for one to be released.
+
+    Returns:
+        AsyncRedis: Async Redis client backed by the shared pool
+    """
+
+    global _async_redis_pool, _async_redis_client
+
+    if _async_redis_client is None:
+        _async_redis_pool = BlockingConnectionPool(
+            host=REDIS_HOST,
+            port=REDIS_PORT,
+            db=REDIS_DB,
+            max_connections=REDIS_POOL_SIZE,
+            timeout=REDIS_POOL_TIMEOUT,
+        )
+        _async_redis_client = AsyncRedis(connection_pool=_async_redis_pool)
+    return _async_redis_client
+
+
+async def close_async_redis() -> None:
+    """Close the process-wide async Redis client and disconnect its pool"""
+
+    global _async_redis_pool, _async_redis_client
+
+    if _async_redis_client is not None:
+        await _async_redis_client.aclose()
+        _async_redis_client = None
+    if _async_redis_pool is not None:
+        await _async_redis_pool.disconnect()
+        _async_redis_pool = None
+
+
+def async_redis_pool_in_use() -> int:
+    """Number of connections of the shared async pool currently checked out
+
+    Returns:
+        int: Connections in use, 0 if the pool was not created
+    """
+
+    if _async_redis_pool is None:
+        return 0
+    return len(_async_redis_pool._in_use_connections)
+
+
+def async_redis_pool_open() -> int:
+    """Number of connections opened by the shared async pool
+
+    Returns:
+        int: Connections in use or idle, 0 if the pool was not created
+    """
+
+    if _async_redis_pool is None:
+        return 0
+    return async_redis_pool_in_use() + len(_async_redis_pool._available_connections)
+
+
+Gauge(
+    "redis_pool_in_use_connections",
+    "Connections of the shared async Redis pool in use",
+).set_function(async_redis_pool_in_use)
+Gauge(
+    "redis_pool_open_connections",
+    "Connections opened by the shared async Redis pool",
+).set_function(async_redis_pool_open)
+Gauge(
+    "redis_pool_max_connections",
+    "Size of the shared async Redis pool",
+).set_function(lambda: REDIS_POOL_SIZE)
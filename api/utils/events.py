@@ -0,0 +1,177 @@
+import asyncio
+import logging
+from typing import Dict, Optional, Set
+
+from prometheus_client import Gauge
+from redis import RedisError
+
+from api.utils.connections import get_async_redis
+from api.utils.results import TaskFailure, TaskOutcome
+
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+TASK_EVENTS_CHANNEL = "scrape:task-events"
+
+# Seconds to wait before resubscribing after the subscriber connection failed
+RESUBSCRIBE_DELAY = 1.0
+
+# Put in the waiting queues after a resubscribe, events may have been missed
+RESYNC = None
+
+# Starts the payload of the event of a failed task, JSON results never do
+TASK_FAILED_MARKER = "!"
+
+
+def encode_task_event(task_id: str, payload: str) -> str:
+    """Encode the completion event of a task for publishing
+
+    Args:
+        task_id (str): ID of the completed task
+        payload (str): Stored result of the task, as read back by the waiters
+
+    Returns:
+        str: Encoded event, the task ID and the payload separated by a space
+    """
+
+    return f"{task_id} {payload}"
+
+
+def encode_task_failure(task_id: str, error: str) -> str:
+    """Encode the failure event of a task for publishing
+
+    Args:
+        task_id (str): ID of the failed task
+        error (str): Error the task failed with
+
+    Returns:
+        str: Encoded event, told apart from results by TASK_FAILED_MARKER
+    """
+
+    return f"{task_id} {TASK_FAILED_MARKER}{error}"
+
+
+class TaskEventHub:
+    """Fan task completion events from one Redis subscription out to local waiters
+
+    The hub holds a single pub/sub connection per process. Each waiter gets an
+    asyncio queue and receives the result of the task it waits for, so the
+    number of Redis commands does not grow with the number of waiters.
+    """
+
+    def __init__(self, channel: str = TASK_EVENTS_CHANNEL) -> None:
+        self.channel = channel
+        self._waiters: Dict[str, Set[asyncio.Queue]] = {}
+        self._reader: Optional[asyncio.Task] = None
+
+    def start(self) -> None:
+        """Start the subscriber if it is not running yet"""
+
+        if self._reader is None or self._reader.done():
+            self._reader = asyncio.create_task(self._run())
+
+    async def stop(self) -> None:
+        """Stop the subscriber"""
+
+        if self._reader is not None:
+            self._reader.cancel()
+            try:
+                await self._reader
+            except asyncio.CancelledError:
+                pass
+            self._reader = None
+
+    def subscribe(
+        self, task_id: str, queue: Optional[asyncio.Queue] = None
+    ) -> asyncio.Queue:
+        """Register a waiter for the completion of a task
+
+        The queue receives a (task ID, stored result as bytes) tuple, with a
+        TaskFailure instead of the result if the task failed, or RESYNC when
+        the hub (re)subscribed and events may have been missed, in which case
+        the waiter should check the stored result again. Passing the same
+        queue for several tasks multiplexes their events into it.
+
+        Args:
+            task_id (str): ID of the task to wait for
+            queue (Optional[asyncio.Queue]): Queue to deliver to, a new one if None
+
+        Returns:
+            asyncio.Queue: Queue receiving the task result
+        """
+
+        self.start()
+        if queue is None:
+            queue = asyncio.Queue()
+        self._waiters.setdefault(task_id, set()).add(queue)
+        return queue
+
+    def unsubscribe(self, task_id: str, queue: asyncio.Queue) -> None:
+        """Remove a waiter registered with subscribe
+
+        Args:
+            task_id (str): ID of the task waited for
+            queue (asyncio.Queue): Queue returned by subscribe
+        """
+
+        queues = self._waiters.get(task_id)
+        if queues is None:
+            return
+        queues.discard(queue)
+        if not queues:
+            del self._waiters[task_id]
+
+    def waiting(self) -> int:
+        """Number of waiters registered with the hub
+
+        Returns:
+            int: Number of distinct waiting queues
+        """
+
+        return len({queue for waiters in self._waiters.values() for queue in waiters})
+
+    def dispatch(self, data: bytes) -> None:
+        """Deliver a published event to the waiters of its task
+
+        Args:
+            data (bytes): Raw event data received from the channel
+        """
+
+        raw_task_id, _, payload = data.partition(b" ")
+        task_id = raw_task_id.decode()
+        outcome: TaskOutcome = payload
+        if payload.startswith(TASK_FAILED_MARKER.encode()):
+            outcome = TaskFailure(payload[1:].decode("utf-8"))
+        for queue in self._waiters.get(task_id, ()):
+            queue.put_nowait((task_id, outcome))
+
+    def _resync(self) -> None:
+        queues = {queue for waiters in self._waiters.values() for queue in waiters}
+        for queue in queues:
+            queue.put_nowait(RESYNC)
+
+    async def _run(self) -> None:
+        while True:
+            pubsub = get_async_redis().pubsub(ignore_subscribe_messages=True)
+            try:
+                await pubsub.subscribe(self.channel)
+                self._resync()
+                logger.info(f"Subscribed to {self.channel}")
+
+                async for message in pubsub.listen():
+                    if message["type"] == "message":
+                        self.dispatch(message["data"])
+            except (RedisError, OSError) as e:
+                logger.error(f"Task event subscription failed: {e}")
+            finally:
+                await pubsub.aclose()
+
+            await asyncio.sleep(RESUBSCRIBE_DELAY)
+
+
+task_events = TaskEventHub()
+
+Gauge(
+    "sse_task_event_waiters",
+    "Waiters registered with the task event hub",
+).set_function(task_events.waiting)
@@ -0,0 +1,643 @@
+import asyncio
+import logging
+import random
+import time
+from contextlib import AsyncExitStack
+from dataclasses import dataclass
+from typing import Any, Awaitable, Callable, Dict, List, Optional, Protocol
+
+import httpx
+import requests
+from prometheus_client import Counter, Histogram
+
+from api.settings import (
+    FETCH_BACKOFF_BASE,
+    FETCH_BACKOFF_MAX,
+    FETCH_CHUNK_SIZE,
+    FETCH_MAX_BODY_SIZE,
+    FETCH_RETRIES,
+    FETCH_TIMEOUT,
+    HTTP_POOL_MAX_CONNECTIONS,
+    HTTP_POOL_MAX_KEEPALIVE_CONNECTIONS,
+)
+from api.utils.breaker import CircuitBreaker, get_breaker
+from api.utils.latency import LatencyTracker, get_latency_tracker
+from api.utils.metrics import DURATION_BUCKETS
+from api.utils.ratelimit import async_host_slot, host_group, host_slot
+
+logging.basicConfig(level=logging.INFO)
+
+HTTP_NOT_MODIFIED = 304
+
+# Statuses of an overloaded or briefly unavailable upstream, worth a retry
+RETRYABLE_STATUSES = frozenset({429, 500, 502, 503, 504})
+
+fetch_retries = Counter(
+    "fetch_retries_total",
+    "Upstream fetch attempts retried after a transient failure",
+    ("host", "reason"),
+)
+fetch_hedges = Counter(
+    "fetch_hedges_total",
+    "Hedged duplicates sent for slow upstream fetches",
+    ("host",),
+)
+fetch_hedges_won = Counter(
+    "fetch_hedges_won_total",
+    "Hedged duplicates that answered before the request they duplicated",
+    ("host",),
+)
+
+fetch_phase_duration = Histogram(
+    "fetch_phase_duration_seconds",
+    "Time of upstream fetch attempts by phase",
+    ("phase",),
+    buckets=DURATION_BUCKETS,
+)
+
+# httpcore trace steps of a new connection timed as fetch phases, the TCP
+# connect includes the DNS lookup
+CONNECTION_PHASES = {
+    "connection.connect_tcp": "connect",
+    "connection.start_tls": "tls",
+}
+
+_async_client: Optional[httpx.AsyncClient] = None
+
+
+@dataclass
+class FetchedPage:
+    """Response of an upstream page fetch"""
+
+    status: int
+    content: Optional[str] = None
+    etag: Optional[str] = None
+    last_modified: Optional[str] = None
+    size: int = 0
+    # Result of the incremental parser the body was fed to, content is None then
+    parsed: Any = None
+
+    @property
+    def not_modified(self) -> bool:
+        return self.status == HTTP_NOT_MODIFIED
+
+
+class IncrementalParser(Protocol):
+    """Parser consuming a page body chunk by chunk while it downloads"""
+
+    def feed(self, chunk: bytes) -> bool:
+        """Parse the next chunk, returning True once the rest is not needed"""
+
+    def close(self) -> Any:
+        """Finish parsing and return the result"""
+
+
+class PageTooLarge(Exception):
+    """Raised when a page body exceeds FETCH_MAX_BODY_SIZE"""
+
+
+class RetryableStatus(Exception):
+    """Raised when the upstream answers with a transient error status"""
+
+    def __init__(self, status: int, retry_after: Optional[str] = None) -> None:
+        super().__init__(f"upstream answered {status}")
+        self.status = status
+        # Only the delay-seconds form of Retry-After is honoured
+        self.retry_after = (
+            float(retry_after) if retry_after and retry_after.isdigit() else None
+        )
+
+
+# Errors of URLs that can not be fetched at all, whatever the health of the host
+INVALID_URL_ERRORS = (
+    httpx.InvalidURL,
+    httpx.UnsupportedProtocol,
+    httpx.LocalProtocolError,
+    requests.exceptions.InvalidURL,
+    requests.exceptions.MissingSchema,
+    requests.exceptions.InvalidSchema,
+)
+
+FETCH_ERRORS = (
+    requests.RequestException,
+    httpx.HTTPError,
+    httpx.InvalidURL,
+    RetryableStatus,
+    PageTooLarge,
+    UnicodeDecodeError,
+)
+
+
+class BodyReader:
+    """Read a page body chunk by chunk, buffering it or feeding it to a parser"""
+
+    def __init__(self, parser: Optional[IncrementalParser] = None) -> None:
+        self.parser = parser
+        self.size = 0
+        self._chunks: List[bytes] = []
+
+    def check_length(self, content_length: Optional[str]) -> None:
+        """Reject a page announcing a body larger than allowed before reading it
+
+        Args:
+            content_length (Optional[str]): Content-Length header of the response
+        """
+
+        if content_length and int(content_length) > FETCH_MAX_BODY_SIZE:
+            raise PageTooLarge(f"{content_length} bytes announced")
+
+    def feed(self, chunk: bytes) -> bool:
+        """Take the next chunk of the body
+
+        Args:
+            chunk (bytes): Next chunk of the body
+
+        Returns:
+            bool: True once the rest of the body is not needed
+        """
+
+        self.size += len(chunk)
+        if self.size > FETCH_MAX_BODY_SIZE:
+            raise PageTooLarge(f"more than {FETCH_MAX_BODY_SIZE} bytes read")
+
+        if self.parser is not None:
+            return self.parser.feed(chunk)
+
+        self._chunks.append(chunk)
+        return False
+
+    def page(self, status: int, headers: Any) -> FetchedPage:
+        """Build the fetched page from what was read
+
+        Args:
+            status (int): Status code of the response
+            headers (Any): Headers of the response
+
+        Returns:
+            FetchedPage: Fetched page
+        """
+
+        page = FetchedPage(
+            status=status,
+            etag=headers.get("ETag"),
+            last_modified=headers.get("Last-Modified"),
+            size=self.size,
+        )
+        if self.parser is not None:
+            page.parsed = self.parser.close()
+        else:
+            page.content = b"".join(self._chunks).decode("utf-8")
+        return page
+
+
+def get_async_client() -> httpx.AsyncClient:
+    """Get the process-wide async HTTP client, creating it on first use
+
+    Returns:
+        httpx.AsyncClient: Pooled async HTTP client
+    """
+
+    global _async_client
+
+    if _async_client is None or _async_client.is_closed:
+        _async_client = httpx.AsyncClient(
+            timeout=FETCH_TIMEOUT,
+            limits=httpx.Limits(
+                max_connections=HTTP_POOL_MAX_CONNECTIONS,
+                max_keepalive_connections=HTTP_POOL_MAX_KEEPALIVE_CONNECTIONS,
+            ),
+            follow_redirects=True,
+        )
+    return _async_client
+
+
+async def close_async_client() -> None:
+    """Close the process-wide async HTTP client and release its connections"""
+
+    global _async_client
+
+    if _async_client is not None:
+        await _async_client.aclose()
+        _async_client = None
+
+
+def retry_reason(error: Exception) -> Optional[str]:
+    """Tell whether a fetch error is transient and worth a retry
+
+    Args:
+        error (Exception): Error raised by a fetch attempt
+
+    Returns:
+        Optional[str]: Reason of the retry, None if the error is not transient
+    """
+
+    if isinstance(error, INVALID_URL_ERRORS):
+        return None
+    if isinstance(error, RetryableStatus):
+        return str(error.status)
+    if isinstance(error, (requests.Timeout, httpx.TimeoutException)):
+        return "timeout"
+    if isinstance(error, (requests.ConnectionError, httpx.TransportError)):
+        return "connection"
+    return None
+
+
+def backoff_delay(attempt: int, retry_after: Optional[float] = None) -> float:
+    """Compute how long to wait before retrying a fetch
+
+    The delay is drawn uniformly up to an exponentially growing cap, so
+    clients that failed together do not retry together.
+
+    Args:
+        attempt (int): Number of the failed attempt, from 0
+        retry_after (Optional[float]): Seconds the upstream asked to wait
+
+    Returns:
+        float: Seconds to wait
+    """
+
+    delay = random.uniform(0, min(FETCH_BACKOFF_MAX, FETCH_BACKOFF_BASE * 2**attempt))
+    if retry_after is not None:
+        delay = max(delay, min(retry_after, FETCH_BACKOFF_MAX))
+    return delay
+
+
+def _check_status(response: Any) -> None:
+    if response.status_code in RETRYABLE_STATUSES:
+        raise RetryableStatus(response.status_code, response.headers.get("Retry-After"))
+
+
+def _record_latency(latency: LatencyTracker, status: int, seconds: float) -> None:
+    # Fast error answers of an overloaded host would drag the timeout down
+    if status not in RETRYABLE_STATUSES:
+        latency.record(seconds)
+
+
+def _connection_tracer() -> Callable[[str, dict], Awaitable[None]]:
+    """Build an httpx trace hook timing the connect and TLS handshake of a request
+
+    Requests reusing a pooled connection have neither phase.
+
+    Returns:
+        Callable[[str, dict], Awaitable[None]]: Hook for the trace extension
+    """
+
+    started: Dict[str, float] = {}
+
+    async def trace(event: str, info: dict) -> None:
+        step, _, stage = event.rpartition(".")
+        phase = CONNECTION_PHASES.get(step)
+        if phase is None:
+            return
+        if stage == "started":
+            started[step] = time.perf_counter()
+        elif stage == "complete" and step in started:
+            fetch_phase_duration.labels(phase=phase).observe(
+                time.perf_counter() - started.pop(step)
+            )
+
+    return trace
+
+
+def _fetch_once(
+    url: str,
+    headers: Optional[Dict[str, str]],
+    reader: BodyReader,
+    latency: LatencyTracker,
+) -> FetchedPage:
+    timeout = latency.timeout()
+    with host_slot(url):
+        try:
+            response = requests.get(url, headers=headers, timeout=timeout, stream=True)
+        except requests.Timeout:
+            # The host took at least the timeout. Without the sample the window
+            # would never see it slow down and the timeout could not grow
+            latency.record(timeout)
+            raise
+
+        with response:
+            # Time until the response headers were parsed, connecting included
+            elapsed = response.elapsed.total_seconds()
+            fetch_phase_duration.labels(phase="headers").observe(elapsed)
+            _record_latency(latency, response.status_code, elapsed)
+            if response.status_code == HTTP_NOT_MODIFIED:
+                return FetchedPage(status=HTTP_NOT_MODIFIED)
+
+            _check_status(response)
+            response.raise_for_status()
+            reader.check_length(response.headers.get("Content-Length"))
+            with fetch_phase_duration.labels(phase="body").time():
+                for chunk in response.iter_content(FETCH_CHUNK_SIZE):
+                    if reader.feed(chunk):
+                        break
+            return reader.page(response.status_code, response.headers)
+
+
+async def _send(
+    url: str,
+    headers: Optional[Dict[str, str]],
+    latency: LatencyTracker,
+    stack: AsyncExitStack,
+) -> httpx.Response:
+    """Send a request and wait for its response headers
+
+    The host slot and the response are released when the stack is closed.
+
+    Args:
+        url (str): URL of the webpage
+        headers (Optional[Dict[str, str]]): Extra request headers
+        latency (LatencyTracker): Latency tracker of the host
+        stack (AsyncExitStack): Stack owning the slot and the response
+
+    Returns:
+        httpx.Response: Response with its body still to be read
+    """
+
+    await stack.enter_async_context(async_host_slot(url))
+    client = get_async_client()
+    timeout = latency.timeout()
+    request = client.build_request(
+        "GET",
+        url,
+        headers=headers,
+        timeout=httpx.Timeout(timeout, pool=FETCH_TIMEOUT),
+        extensions={"trace": _connection_tracer()},
+    )
+    started = time.monotonic()
+    try:
+        response = await client.send(request, stream=True)
+    except httpx.PoolTimeout:
+        # Waiting for a pooled connection says nothing of the host
+        raise
+    except httpx.TimeoutException:
+        # The host took at least the timeout, see _fetch_once
+        latency.record(timeout)
+        raise
+    except asyncio.CancelledError:
+        # Mostly the slower of hedged requests, which took at least this long,
+        # without it only the faster answers of slow spells would be recorded
+        latency.record(time.monotonic() - started)
+        raise
+    stack.push_async_callback(response.aclose)
+    elapsed = time.monotonic() - started
+    fetch_phase_duration.labels(phase="headers").observe(elapsed)
+    _record_latency(latency, response.status_code, elapsed)
+    return response
+
+
+async def _hedged_send(
+    url: str,
+    headers: Optional[Dict[str, str]],
+    latency: LatencyTracker,
+    stack: AsyncExitStack,
+) -> httpx.Response:
+    """Send a request, and a duplicate of it once it is slower than usual
+
+    With FETCH_HEDGE, a second request is sent when the first one has not
+    answered within the FETCH_HEDGE_PERCENTILE latency of the host and the
+    hedge budget of the host allows it. The first successful answer is used
+    and the other request is cancelled.
+
+    Args:
+        url (str): URL of the webpage
+        headers (Optional[Dict[str, str]]): Extra request headers
+        latency (LatencyTracker): Latency tracker of the host
+        stack (AsyncExitStack): Stack owning the slot and the winning response
+
+    Returns:
+        httpx.Response: Response with its body still to be read
+    """
+
+    delay = latency.hedge_delay()
+    if delay is None:
+        return await _send(url, headers, latency, stack)
+
+    contenders: Dict[asyncio.Task, AsyncExitStack] = {}
+
+    def start() -> asyncio.Task:
+        contender = AsyncExitStack()
+        task = asyncio.create_task(_send(url, headers, latency, contender))
+        contenders[task] = contender
+        return task
+
+    primary = start()
+    try:
+        await asyncio.wait({primary}, timeout=delay)
+        if not primary.done() and latency.take_hedge():
+            fetch_hedges.labels(host=latency.name).inc()
+            start()
+
+        pending = set(contenders)
+        while pending:
+            done, pending = await asyncio.wait(
+                pending, return_when=asyncio.FIRST_COMPLETED
+            )
+            for task in done:
+                if task.exception() is None:
+                    if task is not primary:
+                        fetch_hedges_won.labels(host=latency.name).inc()
+                    stack.push_async_callback(contenders.pop(task).aclose)
+                    return task.result()
+        raise primary.exception() or RuntimeError(f"No answer from {url}")
+    finally:
+        for task in contenders:
+            task.cancel()
+        await asyncio.gather(*contenders, return_exceptions=True)
+        for contender in contenders.values():
+            await contender.aclose()
+
+
+async def _async_fetch_once(
+    url: str,
+    headers: Optional[Dict[str, str]],
+    reader: BodyReader,
+    latency: LatencyTracker,
+) -> FetchedPage:
+    async with AsyncExitStack() as stack:
+        response = await _hedged_send(url, headers, latency, stack)
+        if response.status_code == HTTP_NOT_MODIFIED:
+            return FetchedPage(status=HTTP_NOT_MODIFIED)
+
+        _check_status(response)
+        response.raise_for_status()
+        reader.check_length(response.headers.get("Content-Length"))
+        with fetch_phase_duration.labels(phase="body").time():
+            async for chunk in response.aiter_bytes(FETCH_CHUNK_SIZE):
+                if reader.feed(chunk):
+                    break
+        return reader.page(response.status_code, response.headers)
+
+
+def _attempt_failed(
+    url: str,
+    error: Exception,
+    attempt: int,
+    reader: BodyReader,
+    breaker: CircuitBreaker,
+) -> Optional[float]:
+    """Report a failed attempt and decide whether to retry it
+
+    Args:
+        url (str): URL of the webpage
+        error (Exception): Error raised by the attempt
+        attempt (int): Number of the attempt, from 0
+        reader (BodyReader): Reader of the attempt
+        breaker (CircuitBreaker): Circuit breaker of the host
+
+    Returns:
+        Optional[float]: Seconds to wait before retrying, None to give up
+    """
+
+    if isinstance(error, INVALID_URL_ERRORS):
+        # The request never reached the host
+        breaker.release()
+        logging.error(f"Invalid URL {url}: {error}")
+        return None
+
+    reason = retry_reason(error)
+    if reason is None:
+        # The host answered, the failure is not its health
+        breaker.record_success()
+    else:
+        breaker.record_failure()
+
+    if isinstance(error, PageTooLarge):
+        logging.error(f"Page {url} is too large: {error}")
+        return None
+    if isinstance(error, UnicodeDecodeError):
+        logging.error(f"Error decoding content from {url}: {error}")
+        return None
+
+    # A body already fed to a parser can not be fed again
+    if reason is None or attempt >= FETCH_RETRIES or reader.size:
+        logging.error(f"Error fetching page content: {error}")
+        return None
+
+    fetch_retries.labels(host=breaker.name, reason=reason).inc()
+    delay = backoff_delay(attempt, getattr(error, "retry_after", None))
+    logging.warning(f"Retrying {url} in {delay:.2f}s after {reason}")
+    return delay
+
+
+def fetch_page(
+    url: str,
+    headers: Optional[Dict[str, str]] = None,
+    parser: Optional[IncrementalParser] = None,
+) -> Optional[FetchedPage]:
+    """Fetch a webpage
+
+    The request waits for the rate and in-flight limits of its host. The body
+    is read in chunks and bounded by FETCH_MAX_BODY_SIZE. With a
+    parser, the chunks are parsed as they arrive instead of being buffered,
+    and reading stops as soon as the parser has what it needs.
+
+    Timeouts, connection errors and overload statuses are retried up to
+    FETCH_RETRIES times with jittered exponential backoff. Hosts failing
+    repeatedly have their circuit opened and are not fetched for a while.
+    The timeout adapts to the latency recently seen from the host.
+
+    Args:
+        url (str): URL of the webpage
+        headers (Optional[Dict[str, str]]): Extra request headers
+        parser (Optional[IncrementalParser]): Parser to feed the body to
+
+    Returns:
+        Optional[FetchedPage]: Fetched page if successful or not modified, None otherwise
+    """
+
+    breaker = get_breaker(host_group(url))
+    latency = get_latency_tracker(breaker.name)
+    for attempt in range(FETCH_RETRIES + 1):
+        if not breaker.allow():
+            logging.error(f"Circuit of {breaker.name} is open, not fetching {url}")
+            return None
+
+        reader = BodyReader(parser)
+        try:
+            page = _fetch_once(url, headers, reader, latency)
+        except FETCH_ERRORS as e:
+            delay = _attempt_failed(url, e, attempt, reader, breaker)
+            if delay is None:
+                return None
+            time.sleep(delay)
+            continue
+        except BaseException:
+            # Cancelled, or failed in a parser, before reporting an outcome
+            breaker.release()
+            raise
+
+        breaker.record_success()
+        return page
+    return None
+
+
+async def async_fetch_page(
+    url: str,
+    headers: Optional[Dict[str, str]] = None,
+    parser: Optional[IncrementalParser] = None,
+) -> Optional[FetchedPage]:
+    """Fetch a webpage without blocking the event loop
+
+    Slow requests may be hedged with a duplicate, see _hedged_send.
+
+    Args:
+        url (str): URL of the webpage
+        headers (Optional[Dict[str, str]]): Extra request headers
+        parser (Optional[IncrementalParser]): Parser to feed the body to
+
+    Returns:
+        Optional[FetchedPage]: Fetched page if successful or not modified, None otherwise
+    """
+
+    breaker = get_breaker(host_group(url))
+    latency = get_latency_tracker(breaker.name)
+    for attempt in range(FETCH_RETRIES + 1):
+        if not breaker.allow():
+            logging.error(f"Circuit of {breaker.name} is open, not fetching {url}")
+            return None
+
+        reader = BodyReader(parser)
+        try:
+            page = await _async_fetch_once(url, headers, reader, latency)
+        except FETCH_ERRORS as e:
+            delay = _attempt_failed(url, e, attempt, reader, breaker)
+            if delay is None:
+                return None
+            await asyncio.sleep(delay)
+            continue
+        except BaseException:
+            # Cancelled, or failed in a parser, before reporting an outcome
+            breaker.release()
+            raise
+
+        breaker.record_success()
+        return page
+    return None
+
+
+def fetch_page_content(url: str) -> Optional[str]:
+    """Fetch the content of a webpage
+
+    Args:
+        url (str): URL of the webpage
+
+    Returns:
+        Optional[str]: Content of the webpage if successful, None otherwise
+    """
+
+    page = fetch_page(url)
+    return page.content if page else None
+
+
+async def async_fetch_page_content(url: str) -> Optional[str]:
+    """Fetch the content of a webpage without blocking the event loop
+
+    Args:
+        url (str): URL of the webpage
+
+    Returns:
+        Optional[str]: Content of the webpage if successful, None otherwise
+    """
+
+    page = await async_fetch_page(url)
+    return page.content if page else None
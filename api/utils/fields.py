@@ -0,0 +1,164 @@
+import time
+from dataclasses import dataclass
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+from lxml import etree
+from prometheus_client import Histogram
+
+from api.utils.metrics import DURATION_BUCKETS
+
+APP_PAGE = "app"
+VERSIONS_PAGE = "versions"
+
+field_duration = Histogram(
+    "field_extraction_duration_seconds",
+    "Time to select and post-process each field of a parsed page",
+    ("page", "field"),
+    buckets=DURATION_BUCKETS,
+)
+
+
+def has_class(token: str) -> str:
+    """XPath predicate matching elements whose class attribute contains a token
+
+    Unlike comparing the whole attribute, this keeps matching when other
+    classes, such as generated style hashes, are added, removed or reordered.
+
+    Args:
+        token (str): Class name to look for
+
+    Returns:
+        str: XPath predicate, including the brackets
+    """
+
+    return f'[contains(concat(" ", normalize-space(@class), " "), " {token} ")]'
+
+
+def first_text(matches: list) -> Optional[str]:
+    """Text of the first element matched by a selector
+
+    Args:
+        matches (list): Elements matched by the selector
+
+    Returns:
+        Optional[str]: Text of the first element if any matched, None otherwise
+    """
+
+    return matches[0].text if matches else None
+
+
+def first_text_content(matches: list) -> Optional[str]:
+    """Text of the first element matched by a selector, including its descendants
+
+    Args:
+        matches (list): Elements matched by the selector
+
+    Returns:
+        Optional[str]: Text content of the first element if any matched, None otherwise
+    """
+
+    return matches[0].text_content() if matches else None
+
+
+@dataclass(frozen=True)
+class Field:
+    """Declaration of a scraped field and where it is found"""
+
+    name: str
+    selector: etree.XPath
+    post_process: Callable[[list], Any]
+    page: str
+
+
+# Fields of each page in declaration order, filled by register_field
+FIELDS: Dict[str, Tuple[Field, ...]] = {}
+
+# Element the field selectors of a page are relative to, set by register_page
+PAGE_ROOTS: Dict[str, etree.XPath] = {}
+
+
+def register_page(page: str, root_xpath: str) -> None:
+    """Declare the element the fields of a page are selected from
+
+    The root is located once per page and the field selectors are evaluated
+    relative to it, so a descendant search for a common anchor such as an
+    element ID is not repeated by every field.
+
+    Args:
+        page (str): Page the fields are scraped from
+        root_xpath (str): XPath selecting the root element of the fields
+    """
+
+    PAGE_ROOTS[page] = etree.XPath(root_xpath)
+
+
+def register_field(
+    name: str,
+    xpath: str,
+    post_process: Callable[[list], Any] = first_text,
+    page: str = APP_PAGE,
+) -> Field:
+    """Declare a field, its XPath is compiled once here rather than per page
+
+    Args:
+        name (str): Key of the field in the scrape result
+        xpath (str): XPath selecting the field, relative to the page root if any
+        post_process (Callable[[list], Any]): Turns the matches into the field value
+        page (str): Page the field is scraped from
+
+    Returns:
+        Field: Registered field
+    """
+
+    field = Field(
+        name=name,
+        selector=etree.XPath(xpath),
+        post_process=post_process,
+        page=page,
+    )
+    FIELDS[page] = (*FIELDS.get(page, ()), field)
+    return field
+
+
+def page_fields(page: str) -> List[Field]:
+    """Fields registered for a page
+
+    Args:
+        page (str): Page the fields are scraped from
+
+    Returns:
+        List[Field]: Fields of the page in declaration order
+    """
+
+    return list(FIELDS.get(page, ()))
+
+
+def extract_fields(tree: etree._Element, page: str) -> Dict[str, Any]:
+    """Extract all fields of a page from its parsed tree in one pass
+
+    Fields of a page whose root is missing are post-processed with no matches.
+    The time of each field is recorded in the process extracting it, so it is
+    not collected from a process parse executor.
+
+    Args:
+        tree (etree._Element): Parsed tree of the page
+        page (str): Page the tree was parsed from
+
+    Returns:
+        Dict[str, Any]: Value of each field of the page by name
+    """
+
+    root = PAGE_ROOTS.get(page)
+    if root is not None:
+        roots = root(tree)
+        tree = roots[0] if roots else None
+
+    values = {}
+    for field in FIELDS.get(page, ()):
+        started = time.perf_counter()
+        matches = field.selector(tree) if tree is not None else []
+        values[field.name] = field.post_process(matches)
+        field_duration.labels(page=page, field=field.name).observe(
+            time.perf_counter() - started
+        )
+    return values
@@ -0,0 +1,162 @@
+import logging
+import math
+import threading
+from collections import deque
+from typing import Deque, Dict, Optional, Sequence
+
+from prometheus_client import Gauge
+
+from api.settings import (
+    FETCH_ADAPTIVE_TIMEOUT,
+    FETCH_HEDGE,
+    FETCH_HEDGE_MAX_RATIO,
+    FETCH_HEDGE_PERCENTILE,
+    FETCH_TIMEOUT,
+    FETCH_TIMEOUT_MIN,
+    FETCH_TIMEOUT_MULTIPLIER,
+    FETCH_TIMEOUT_PERCENTILE,
+    LATENCY_MIN_SAMPLES,
+    LATENCY_WINDOW,
+)
+
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+# Hedges a host may save up while it is fast, so a slow spell can use a few at once
+HEDGE_BURST = 10
+
+fetch_timeout_seconds = Gauge(
+    "fetch_timeout_seconds",
+    "Adaptive timeout of upstream fetches per host",
+    ("host",),
+)
+
+
+def percentile(samples: Sequence[float], q: float) -> float:
+    """Pick a percentile of sorted samples by the nearest-rank method
+
+    Args:
+        samples (Sequence[float]): Samples in ascending order, at least one
+        q (float): Percentile, from 0 to 100
+
+    Returns:
+        float: Smallest sample with at least q percent of the samples at or below it
+    """
+
+    return samples[max(0, math.ceil(q / 100 * len(samples)) - 1)]
+
+
+class LatencyTracker:
+    """Rolling window of the time an upstream host takes to answer
+
+    The window feeds the adaptive timeout and the hedge delay of the host, and
+    keeps the budget that caps the share of its requests that are hedged.
+    """
+
+    def __init__(self, name: str, window: Optional[int] = None) -> None:
+        self.name = name
+        self._samples: Deque[float] = deque(maxlen=window or LATENCY_WINDOW)
+        self._hedge_tokens = 0.0
+        self._lock = threading.Lock()
+
+    def record(self, seconds: float) -> None:
+        """Record how long the host took to answer
+
+        Args:
+            seconds (float): Seconds until the response headers were received
+        """
+
+        with self._lock:
+            self._samples.append(seconds)
+
+    def percentile(self, q: float) -> Optional[float]:
+        """Compute a percentile of the recorded latencies
+
+        Args:
+            q (float): Percentile, from 0 to 100
+
+        Returns:
+            Optional[float]: Latency in seconds, None until enough samples were seen
+        """
+
+        with self._lock:
+            if len(self._samples) < LATENCY_MIN_SAMPLES:
+                return None
+            samples = sorted(self._samples)
+
+        return percentile(samples, q)
+
+    def timeout(self) -> float:
+        """Compute the timeout of the next request to the host
+
+        Returns:
+            float: Seconds, FETCH_TIMEOUT until enough samples were seen
+        """
+
+        latency = (
+            self.percentile(FETCH_TIMEOUT_PERCENTILE)
+            if FETCH_ADAPTIVE_TIMEOUT
+            else None
+        )
+        if latency is None:
+            return FETCH_TIMEOUT
+
+        timeout = min(
+            FETCH_TIMEOUT,
+            max(FETCH_TIMEOUT_MIN, latency * FETCH_TIMEOUT_MULTIPLIER),
+        )
+        fetch_timeout_seconds.labels(host=self.name).set(timeout)
+        return timeout
+
+    def hedge_delay(self) -> Optional[float]:
+        """Compute how long to wait for a request before hedging it
+
+        Every request earns FETCH_HEDGE_MAX_RATIO of a hedge, so hedges stay a
+        bounded share of the requests to the host.
+
+        Returns:
+            Optional[float]: Seconds, None if the request must not be hedged
+        """
+
+        if not FETCH_HEDGE:
+            return None
+
+        with self._lock:
+            self._hedge_tokens = min(
+                HEDGE_BURST, self._hedge_tokens + FETCH_HEDGE_MAX_RATIO
+            )
+
+        return self.percentile(FETCH_HEDGE_PERCENTILE)
+
+    def take_hedge(self) -> bool:
+        """Spend a hedge from the budget of the host
+
+        Returns:
+            bool: True if a hedge may be sent
+        """
+
+        with self._lock:
+            if self._hedge_tokens < 1:
+                return False
+            self._hedge_tokens -= 1
+            return True
+
+
+trackers: Dict[str, LatencyTracker] = {}
+_trackers_lock = threading.Lock()
+
+
+def get_latency_tracker(host: str) -> LatencyTracker:
+    """Get the latency tracker of an upstream host, creating it on first use
+
+    Args:
+        host (str): Host, or host pattern sharing limits, to get the tracker of
+
+    Returns:
+        LatencyTracker: Latency tracker of the host
+    """
+
+    with _trackers_lock:
+        if host not in trackers:
+            trackers[host] = LatencyTracker(host)
+        return trackers[host]
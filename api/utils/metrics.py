@@ -0,0 +1,49 @@
+import logging
+
+from prometheus_client import start_http_server
+
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+# Upper bounds in seconds, from a parsed field up to a slow scrape task
+DURATION_BUCKETS = (
+    0.0005,
+    0.001,
+    0.005,
+    0.01,
+    0.025,
+    0.05,
+    0.1,
+    0.25,
+    0.5,
+    1.0,
+    2.5,
+    5.0,
+    10.0,
+    30.0,
+    60.0,
+)
+
+
+def start_metrics_server(port: int, host: str = "0.0.0.0") -> bool:
+    """Serve the metrics of this process in Prometheus text format
+
+    For processes without the API, such as Celery workers. The server runs
+    in a daemon thread and answers every path with the metrics.
+
+    Args:
+        port (int): Port to listen on
+        host (str): Address to listen on, all interfaces by default
+
+    Returns:
+        bool: True if the server started, False if the port is taken
+    """
+
+    try:
+        start_http_server(port, host)
+    except OSError as e:
+        logger.error(f"Unable to serve metrics on port {port}: {e}")
+        return False
+
+    logger.info(f"Serving metrics on port {port}")
+    return True
@@ -0,0 +1,157 @@
+import json
+import logging
+import re
+from dataclasses import dataclass
+from typing import Any, Callable, Dict, Optional, Tuple
+
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+NEXT_DATA_ID = "__NEXT_DATA__"
+
+# The Next.js data script is found in the raw page, no tree is built for it
+NEXT_DATA_PATTERN = re.compile(
+    r'<script[^>]*\bid="__NEXT_DATA__"[^>]*>(.*?)</script>', re.DOTALL
+)
+
+# Location of the app metadata in the Next.js page props
+NEXT_DATA_APP_PATH = ("props", "pageProps", "app")
+
+JsonPath = Tuple[str, ...]
+
+
+@dataclass(frozen=True)
+class NextDataField:
+    """Declaration of a field read from the app metadata of the Next.js data"""
+
+    name: str
+    path: JsonPath
+    post_process: Callable[[Any], Any]
+    required: bool = False
+
+
+# Fields in declaration order, filled by register_next_data_field
+NEXT_DATA_FIELDS: Tuple[NextDataField, ...] = ()
+
+
+def register_next_data_field(
+    name: str,
+    path: JsonPath,
+    post_process: Callable[[Any], Any] = lambda value: value,
+    required: bool = False,
+) -> NextDataField:
+    """Declare a field read from the app metadata
+
+    Args:
+        name (str): Key of the field in the scrape result
+        path (JsonPath): Keys leading to the value, from the app metadata
+        post_process (Callable[[Any], Any]): Turns the value into the field value,
+            not called for missing values
+        required (bool): Whether metadata missing the field is not used at all,
+            a sign it does not have the expected shape
+
+    Returns:
+        NextDataField: Registered field
+    """
+
+    global NEXT_DATA_FIELDS
+
+    field = NextDataField(
+        name=name, path=path, post_process=post_process, required=required
+    )
+    NEXT_DATA_FIELDS = (*NEXT_DATA_FIELDS, field)
+    return field
+
+
+def lookup(data: Any, path: JsonPath) -> Any:
+    """Follow a path of keys through decoded JSON
+
+    Args:
+        data (Any): Decoded JSON
+        path (JsonPath): Keys to follow
+
+    Returns:
+        Any: Value at the end of the path, None if any key is missing
+    """
+
+    for key in path:
+        if not isinstance(data, dict):
+            return None
+        data = data.get(key)
+    return data
+
+
+def decode_app_metadata(next_data: str) -> Optional[dict]:
+    """Decode the app metadata from the text of the Next.js data script
+
+    Args:
+        next_data (str): JSON text of the script
+
+    Returns:
+        Optional[dict]: App metadata if the data carries it, None otherwise
+    """
+
+    try:
+        app = lookup(json.loads(next_data), NEXT_DATA_APP_PATH)
+    except ValueError as e:
+        logger.error(f"Error decoding Next.js data: {e}")
+        return None
+
+    return app if isinstance(app, dict) else None
+
+
+def find_app_metadata(content: str) -> Optional[dict]:
+    """Decode the app metadata embedded in a page as Next.js data
+
+    Args:
+        content (str): Content of the page
+
+    Returns:
+        Optional[dict]: App metadata if the page carries it, None otherwise
+    """
+
+    match = NEXT_DATA_PATTERN.search(content)
+    return decode_app_metadata(match.group(1)) if match else None
+
+
+def extract_next_data_fields(content: str) -> Optional[Dict[str, Any]]:
+    """Extract all declared fields from the Next.js data of a page
+
+    Args:
+        content (str): Content of the page
+
+    Returns:
+        Optional[Dict[str, Any]]: Value of each field by name, None if the page
+            carries no usable app metadata
+    """
+
+    app = find_app_metadata(content)
+    return app_metadata_fields(app) if app is not None else None
+
+
+def app_metadata_fields(app: dict) -> Optional[Dict[str, Any]]:
+    """Read all declared fields from decoded app metadata
+
+    Args:
+        app (dict): App metadata of the Next.js data
+
+    Returns:
+        Optional[Dict[str, Any]]: Value of each field by name, None if a
+            required field is missing or a value is not of the type its field
+            expects
+    """
+
+    fields = {}
+    for field in NEXT_DATA_FIELDS:
+        value = lookup(app, field.path)
+        if value is None and field.required:
+            logger.warning(f"Next.js data without {field.name}, not using it")
+            return None
+        try:
+            fields[field.name] = (
+                field.post_process(value) if value is not None else None
+            )
+        except (TypeError, AttributeError, ValueError) as e:
+            logger.error(f"Unexpected Next.js data for {field.name}: {e}")
+            return None
+    return fields
@@ -0,0 +1,104 @@
+import asyncio
+import logging
+from concurrent.futures import Executor, ProcessPoolExecutor, ThreadPoolExecutor
+from typing import Any, Callable, Optional, TypeVar
+
+from prometheus_client import Histogram
+
+from api.settings import PARSE_EXECUTOR, PARSE_WORKERS
+from api.utils.metrics import DURATION_BUCKETS
+
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+PARSE_INLINE = "inline"
+PARSE_THREADS = "thread"
+PARSE_PROCESSES = "process"
+
+T = TypeVar("T")
+
+parse_duration = Histogram(
+    "parse_duration_seconds",
+    "Time to run parse functions, waiting for a free parse worker included",
+    ("function",),
+    buckets=DURATION_BUCKETS,
+)
+
+_parse_executor: Optional[Executor] = None
+
+
+def get_parse_executor() -> Optional[Executor]:
+    """Get the process-wide parse executor, creating it on first use
+
+    Threads suit lxml, which releases the GIL while it parses. Processes also
+    run the Python side of extraction in parallel, but the parse functions and
+    their arguments must be picklable and they can not be created from
+    daemonic processes such as prefork Celery workers.
+
+    The kind of executor is set by PARSE_EXECUTOR, "inline", "thread" or
+    "process", and its size by PARSE_WORKERS.
+
+    Returns:
+        Optional[Executor]: Parse executor, None to parse inline
+    """
+
+    global _parse_executor
+
+    if PARSE_EXECUTOR == PARSE_INLINE:
+        return None
+
+    if _parse_executor is None:
+        if PARSE_EXECUTOR == PARSE_PROCESSES:
+            _parse_executor = ProcessPoolExecutor(max_workers=PARSE_WORKERS)
+        elif PARSE_EXECUTOR == PARSE_THREADS:
+            _parse_executor = ThreadPoolExecutor(
+                max_workers=PARSE_WORKERS, thread_name_prefix="scrape-parse"
+            )
+        else:
+            raise ValueError(f"Unknown parse executor: {PARSE_EXECUTOR}")
+        logger.info(f"Parsing in a {PARSE_EXECUTOR} pool of {PARSE_WORKERS} workers")
+    return _parse_executor
+
+
+def shutdown_parse_executor() -> None:
+    """Shut the parse executor down, waiting for running parses"""
+
+    global _parse_executor
+
+    if _parse_executor is not None:
+        _parse_executor.shutdown()
+        _parse_executor = None
+
+
+def parse(fn: Callable[..., T], *args: Any) -> T:
+    """Run a parse function on the parse executor and wait for its result
+
+    Args:
+        fn (Callable[..., T]): Parse function, picklable for a process pool
+
+    Returns:
+        T: Result of the parse function
+    """
+
+    executor = get_parse_executor()
+    with parse_duration.labels(function=fn.__name__).time():
+        if executor is None:
+            return fn(*args)
+        return executor.submit(fn, *args).result()
+
+
+async def async_parse(fn: Callable[..., T], *args: Any) -> T:
+    """Run a parse function on the parse executor without blocking the event loop
+
+    Args:
+        fn (Callable[..., T]): Parse function, picklable for a process pool
+
+    Returns:
+        T: Result of the parse function
+    """
+
+    executor = get_parse_executor()
+    with parse_duration.labels(function=fn.__name__).time():
+        if executor is None:
+            return fn(*args)
+        return await asyncio.get_running_loop().run_in_executor(executor, fn, *args)
@@ -0,0 +1,444 @@
+import asyncio
+import logging
+import threading
+import time
+import uuid
+from contextlib import asynccontextmanager, contextmanager
+from dataclasses import dataclass
+from fnmatch import fnmatch
+from typing import AsyncIterator, Dict, Iterator, List, Optional, Tuple
+from urllib.parse import urlparse
+
+from prometheus_client import Counter
+from redis import RedisError
+from redis.asyncio import Redis as AsyncRedis
+from redis.commands.core import AsyncScript
+
+from api.settings import HOST_LIMITS, HOST_SLOT_LEASE, HOST_SLOT_POLL_INTERVAL
+from api.utils.connections import get_async_redis, redis_client, redis_disabled
+
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+LIMITER_KEY_PREFIX = "scrape:host-limit:"
+
+LIMITER_RATE = "rate"
+LIMITER_CONCURRENCY = "concurrency"
+
+# Reserve a token from the bucket of a host, returning the milliseconds to wait
+# for it. Tokens may go negative so waiting callers queue up instead of polling.
+# The Redis clock is used so all processes agree on the refill.
+RESERVE_TOKEN_SCRIPT = """
+local rate = tonumber(ARGV[1])
+local burst = tonumber(ARGV[2])
+local time = redis.call('TIME')
+local now = tonumber(time[1]) * 1000 + math.floor(tonumber(time[2]) / 1000)
+local state = redis.call('HMGET', KEYS[1], 'tokens', 'updated')
+local tokens = tonumber(state[1]) or burst
+local updated = tonumber(state[2]) or now
+tokens = math.min(burst, tokens + (now - updated) * rate / 1000) - 1
+redis.call('HSET', KEYS[1], 'tokens', tokens, 'updated', now)
+redis.call('PEXPIRE', KEYS[1], math.ceil((burst - tokens) * 1000 / rate) + 1000)
+if tokens >= 0 then
+    return 0
+end
+return math.ceil(-tokens * 1000 / rate)
+"""
+
+# Take an in-flight slot of a host if one is free. Slots are leased so the
+# slots of a crashed process are reclaimed once the lease expires.
+ACQUIRE_SLOT_SCRIPT = """
+local time = redis.call('TIME')
+local now = tonumber(time[1]) * 1000 + math.floor(tonumber(time[2]) / 1000)
+redis.call('ZREMRANGEBYSCORE', KEYS[1], '-inf', now)
+if redis.call('ZCARD', KEYS[1]) < tonumber(ARGV[2]) then
+    redis.call('ZADD', KEYS[1], now + tonumber(ARGV[3]), ARGV[1])
+    redis.call('PEXPIRE', KEYS[1], ARGV[3])
+    return 1
+end
+return 0
+"""
+
+# Extend the lease of a slot still held. A slot already reclaimed is not taken
+# back, its fetch is then no longer counted against the limit.
+RENEW_SLOT_SCRIPT = """
+local time = redis.call('TIME')
+local now = tonumber(time[1]) * 1000 + math.floor(tonumber(time[2]) / 1000)
+local renewed = redis.call('ZADD', KEYS[1], 'XX', 'CH', now + tonumber(ARGV[2]), ARGV[1])
+if renewed == 1 then
+    redis.call('PEXPIRE', KEYS[1], ARGV[2])
+end
+return renewed
+"""
+
+# Leases are renewed this many times per lease, so a missed renewal is survived
+LEASE_RENEWALS = 3
+
+limiter_wait_seconds = Counter(
+    "fetch_limiter_wait_seconds_total",
+    "Seconds upstream fetches waited on the host limiters",
+    ("host", "limiter"),
+)
+limiter_acquisitions = Counter(
+    "fetch_limiter_acquisitions_total",
+    "Upstream fetches let through the host limiters",
+    ("host",),
+)
+
+_reserve_token = redis_client.register_script(RESERVE_TOKEN_SCRIPT)
+_acquire_slot = redis_client.register_script(ACQUIRE_SLOT_SCRIPT)
+_renew_slot = redis_client.register_script(RENEW_SLOT_SCRIPT)
+
+# Scripts of the async path, registered on first use since the async client is
+# created lazily. They are called with the current client, which may be recreated
+_async_scripts: Optional[Tuple[AsyncScript, AsyncScript, AsyncScript]] = None
+
+
+def get_async_scripts(
+    redis: AsyncRedis,
+) -> Tuple[AsyncScript, AsyncScript, AsyncScript]:
+    """Get the async token and slot scripts, registering them once per process
+
+    Args:
+        redis (AsyncRedis): Async Redis client to register the scripts on
+
+    Returns:
+        Tuple[AsyncScript, AsyncScript, AsyncScript]: Scripts reserving a token,
+            taking a slot and renewing its lease
+    """
+
+    global _async_scripts
+
+    if _async_scripts is None:
+        _async_scripts = (
+            redis.register_script(RESERVE_TOKEN_SCRIPT),
+            redis.register_script(ACQUIRE_SLOT_SCRIPT),
+            redis.register_script(RENEW_SLOT_SCRIPT),
+        )
+    return _async_scripts
+
+
+@dataclass(frozen=True)
+class HostLimit:
+    """Limits shared by all hosts matching a pattern"""
+
+    pattern: str
+    rate: float
+    burst: int
+    max_in_flight: int
+
+    @property
+    def bucket_key(self) -> str:
+        return f"{LIMITER_KEY_PREFIX}bucket:{self.pattern}"
+
+    @property
+    def slots_key(self) -> str:
+        return f"{LIMITER_KEY_PREFIX}slots:{self.pattern}"
+
+
+def parse_host_limits(config: dict) -> List[HostLimit]:
+    """Build the host limits from their configuration
+
+    Args:
+        config (dict): Host patterns mapped to their rate, burst and max_in_flight
+
+    Returns:
+        List[HostLimit]: Host limits in configuration order
+    """
+
+    return [
+        HostLimit(
+            pattern=pattern,
+            rate=float(limits["rate"]),
+            burst=int(limits.get("burst", limits["rate"])),
+            max_in_flight=int(limits["max_in_flight"]),
+        )
+        for pattern, limits in config.items()
+    ]
+
+
+HOST_LIMIT_RULES = parse_host_limits(HOST_LIMITS)
+
+
+class LocalHostLimiter:
+    """Token bucket and in-flight slots of a host pattern kept in process
+
+    Used in place of the Redis limiters by processes running without Redis,
+    the limits then only hold within the process.
+    """
+
+    def __init__(self, limit: HostLimit) -> None:
+        self.limit = limit
+        self.tokens = float(limit.burst)
+        self.updated = time.monotonic()
+        self.slots = asyncio.Semaphore(limit.max_in_flight)
+
+    def reserve_token(self) -> float:
+        """Reserve a token from the bucket
+
+        Returns:
+            float: Seconds to wait for the token
+        """
+
+        now = time.monotonic()
+        refill = (now - self.updated) * self.limit.rate
+        self.tokens = min(self.limit.burst, self.tokens + refill) - 1
+        self.updated = now
+        return max(0.0, -self.tokens / self.limit.rate)
+
+
+_local_limiters: Dict[str, LocalHostLimiter] = {}
+
+
+def get_local_limiter(limit: HostLimit) -> LocalHostLimiter:
+    """Get the in-process limiter of a host pattern, creating it on first use
+
+    Args:
+        limit (HostLimit): Limits of the host pattern
+
+    Returns:
+        LocalHostLimiter: In-process limiter of the host pattern
+    """
+
+    if limit.pattern not in _local_limiters:
+        _local_limiters[limit.pattern] = LocalHostLimiter(limit)
+    return _local_limiters[limit.pattern]
+
+
+def hostname(url: str) -> str:
+    """Read the host of a URL
+
+    Args:
+        url (str): URL to fetch
+
+    Returns:
+        str: Host of the URL, empty if it has none or can not be parsed
+    """
+
+    try:
+        return urlparse(url).hostname or ""
+    except ValueError:
+        # The fetch itself rejects the URL as invalid
+        return ""
+
+
+def host_limit(url: str) -> Optional[HostLimit]:
+    """Find the limits of the host of a URL
+
+    All hosts matching a pattern share its limits, so every app subdomain of
+    a marketplace counts against the same budget.
+
+    Args:
+        url (str): URL to fetch
+
+    Returns:
+        Optional[HostLimit]: Limits of the first matching pattern, None if unlimited
+    """
+
+    host = hostname(url)
+    for limit in HOST_LIMIT_RULES:
+        if fnmatch(host, limit.pattern):
+            return limit
+    return None
+
+
+def host_group(url: str) -> str:
+    """Name the group of hosts a URL belongs to
+
+    Args:
+        url (str): URL to fetch
+
+    Returns:
+        str: Pattern of the limits of the host if it has any, the host otherwise
+    """
+
+    limit = host_limit(url)
+    return limit.pattern if limit is not None else hostname(url)
+
+
+def _renew_lease(limit: HostLimit, slot: str, released: threading.Event) -> None:
+    """Renew the lease of a held slot until it is released
+
+    Args:
+        limit (HostLimit): Limits of the host pattern
+        slot (str): ID of the slot
+        released (threading.Event): Set once the slot is released
+    """
+
+    while not released.wait(HOST_SLOT_LEASE / LEASE_RENEWALS):
+        try:
+            _renew_slot(
+                keys=[limit.slots_key], args=[slot, int(HOST_SLOT_LEASE * 1000)]
+            )
+        except RedisError as e:
+            logger.error(f"Error renewing an in-flight slot of {limit.pattern}: {e}")
+
+
+async def _async_renew_lease(
+    redis: AsyncRedis, renew_slot: AsyncScript, limit: HostLimit, slot: str
+) -> None:
+    """Renew the lease of a held slot until cancelled
+
+    Args:
+        redis (AsyncRedis): Async Redis client holding the slot
+        renew_slot (AsyncScript): Script renewing the lease
+        limit (HostLimit): Limits of the host pattern
+        slot (str): ID of the slot
+    """
+
+    while True:
+        await asyncio.sleep(HOST_SLOT_LEASE / LEASE_RENEWALS)
+        try:
+            await renew_slot(
+                keys=[limit.slots_key],
+                args=[slot, int(HOST_SLOT_LEASE * 1000)],
+                client=redis,
+            )
+        except RedisError as e:
+            logger.error(f"Error renewing an in-flight slot of {limit.pattern}: {e}")
+
+
+@contextmanager
+def host_slot(url: str) -> Iterator[None]:
+    """Wait until the host of a URL may be fetched and hold an in-flight slot
+
+    The lease of the slot is renewed while the fetch runs, since reading a body
+    may take longer than any lease. If Redis is unavailable the fetch goes
+    ahead unthrottled.
+
+    Args:
+        url (str): URL to fetch
+    """
+
+    limit = host_limit(url)
+    if limit is None:
+        yield
+        return
+
+    slot = uuid.uuid4().hex
+    held = False
+    try:
+        started = time.monotonic()
+        wait = _reserve_token(keys=[limit.bucket_key], args=[limit.rate, limit.burst])
+        time.sleep(wait / 1000)
+        limiter_wait_seconds.labels(host=limit.pattern, limiter=LIMITER_RATE).inc(
+            time.monotonic() - started
+        )
+
+        started = time.monotonic()
+        while not _acquire_slot(
+            keys=[limit.slots_key],
+            args=[slot, limit.max_in_flight, int(HOST_SLOT_LEASE * 1000)],
+        ):
+            time.sleep(HOST_SLOT_POLL_INTERVAL)
+        limiter_wait_seconds.labels(
+            host=limit.pattern, limiter=LIMITER_CONCURRENCY
+        ).inc(time.monotonic() - started)
+        limiter_acquisitions.labels(host=limit.pattern).inc()
+        held = True
+    except RedisError as e:
+        logger.error(f"Host limiter unavailable, fetching {url} unthrottled: {e}")
+
+    released = threading.Event()
+    if held:
+        threading.Thread(
+            target=_renew_lease, args=(limit, slot, released), daemon=True
+        ).start()
+    try:
+        yield
+    finally:
+        released.set()
+        if held:
+            try:
+                redis_client.zrem(limit.slots_key, slot)
+            except RedisError as e:
+                logger.error(f"Error releasing the in-flight slot of {url}: {e}")
+
+
+@asynccontextmanager
+async def async_host_slot(url: str) -> AsyncIterator[None]:
+    """Wait until the host of a URL may be fetched without blocking the event loop
+
+    Args:
+        url (str): URL to fetch
+    """
+
+    limit = host_limit(url)
+    if limit is None:
+        yield
+        return
+
+    if redis_disabled():
+        async with local_host_slot(limit):
+            yield
+        return
+
+    redis = get_async_redis()
+    reserve_token, acquire_slot, renew_slot = get_async_scripts(redis)
+    slot = uuid.uuid4().hex
+    held = False
+    try:
+        started = time.monotonic()
+        wait = await reserve_token(
+            keys=[limit.bucket_key], args=[limit.rate, limit.burst], client=redis
+        )
+        await asyncio.sleep(wait / 1000)
+        limiter_wait_seconds.labels(host=limit.pattern, limiter=LIMITER_RATE).inc(
+            time.monotonic() - started
+        )
+
+        started = time.monotonic()
+        while not await acquire_slot(
+            keys=[limit.slots_key],
+            args=[slot, limit.max_in_flight, int(HOST_SLOT_LEASE * 1000)],
+            client=redis,
+        ):
+            await asyncio.sleep(HOST_SLOT_POLL_INTERVAL)
+        limiter_wait_seconds.labels(
+            host=limit.pattern, limiter=LIMITER_CONCURRENCY
+        ).inc(time.monotonic() - started)
+        limiter_acquisitions.labels(host=limit.pattern).inc()
+        held = True
+    except RedisError as e:
+        logger.error(f"Host limiter unavailable, fetching {url} unthrottled: {e}")
+
+    renewer = (
+        asyncio.create_task(_async_renew_lease(redis, renew_slot, limit, slot))
+        if held
+        else None
+    )
+    try:
+        yield
+    finally:
+        if renewer is not None:
+            renewer.cancel()
+        if held:
+            try:
+                await redis.zrem(limit.slots_key, slot)
+            except RedisError as e:
+                logger.error(f"Error releasing the in-flight slot of {url}: {e}")
+
+
+@asynccontextmanager
+async def local_host_slot(limit: HostLimit) -> AsyncIterator[None]:
+    """Wait on the in-process limiter of a host pattern and hold one of its slots
+
+    Args:
+        limit (HostLimit): Limits of the host pattern
+    """
+
+    limiter = get_local_limiter(limit)
+
+    started = time.monotonic()
+    await asyncio.sleep(limiter.reserve_token())
+    limiter_wait_seconds.labels(host=limit.pattern, limiter=LIMITER_RATE).inc(
+        time.monotonic() - started
+    )
+
+    started = time.monotonic()
+    async with limiter.slots:
+        limiter_wait_seconds.labels(
+            host=limit.pattern, limiter=LIMITER_CONCURRENCY
+        ).inc(time.monotonic() - started)
+        limiter_acquisitions.labels(host=limit.pattern).inc()
+        yield
@@ -0,0 +1,165 @@
+import json
+import logging
+import zlib
+from dataclasses import dataclass
+from typing import List, Optional, Union
+
+from prometheus_client import Counter
+from redis import Redis
+from redis.asyncio import Redis as AsyncRedis
+
+from api.settings import (
+    RESULT_COMPRESS_LEVEL,
+    RESULT_COMPRESS_MIN_SIZE,
+    RESULT_STORE_TTL,
+)
+
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+RESULT_KEY_PREFIX = "scrape:result:v1:"
+
+# First byte of a stored result, telling how the JSON after it is encoded
+RESULT_JSON = b"j"
+RESULT_ZLIB_JSON = b"z"
+RESULT_ERROR = b"e"
+
+result_store_bytes = Counter(
+    "result_store_bytes_total",
+    "Bytes of task results written to the result store by encoding",
+    ("encoding",),
+)
+
+
+@dataclass(frozen=True)
+class TaskFailure:
+    """Outcome of a task that raised instead of returning a result"""
+
+    error: str
+
+
+# JSON of a result, or the failure of its task
+TaskOutcome = Union[bytes, TaskFailure]
+
+
+def result_key(task_id: str) -> str:
+    """Build the result store key of a task
+
+    Args:
+        task_id (str): ID of the task
+
+    Returns:
+        str: Result store key
+    """
+
+    return f"{RESULT_KEY_PREFIX}{task_id}"
+
+
+def encode_result(payload: bytes) -> bytes:
+    """Encode the JSON of a result for storage
+
+    Results of at least RESULT_COMPRESS_MIN_SIZE bytes, in practice those with
+    long descriptions, are compressed with zlib when that makes them smaller.
+
+    Args:
+        payload (bytes): JSON of the result
+
+    Returns:
+        bytes: Stored value
+    """
+
+    if len(payload) >= RESULT_COMPRESS_MIN_SIZE:
+        compressed = zlib.compress(payload, RESULT_COMPRESS_LEVEL)
+        if len(compressed) < len(payload):
+            return RESULT_ZLIB_JSON + compressed
+    return RESULT_JSON + payload
+
+
+def decode_result(value: Optional[bytes]) -> Optional[TaskOutcome]:
+    """Decode a stored value back to the JSON of the result
+
+    Args:
+        value (Optional[bytes]): Stored value, None if missing
+
+    Returns:
+        Optional[TaskOutcome]: JSON of the result or failure of the task, None
+            if missing
+    """
+
+    if value is None:
+        return None
+    if value[:1] == RESULT_ZLIB_JSON:
+        return zlib.decompress(value[1:])
+    if value[:1] == RESULT_ERROR:
+        return TaskFailure(value[1:].decode("utf-8"))
+    return value[1:]
+
+
+def store_result(redis_client: Redis, task_id: str, result: Optional[dict]) -> bytes:
+    """Store the result of a task until it expires after RESULT_STORE_TTL
+
+    Args:
+        redis_client (Redis): Redis client
+        task_id (str): ID of the task
+        result (Optional[dict]): Result of the task
+
+    Returns:
+        bytes: JSON of the result, as later read back from the store
+    """
+
+    payload = json.dumps(result, separators=(",", ":")).encode("utf-8")
+    value = encode_result(payload)
+    redis_client.setex(result_key(task_id), RESULT_STORE_TTL, value)
+
+    encoding = "zlib" if value[:1] == RESULT_ZLIB_JSON else "json"
+    result_store_bytes.labels(encoding=encoding).inc(len(value))
+    return payload
+
+
+def store_failure(redis_client: Redis, task_id: str, error: str) -> None:
+    """Store the failure of a task until it expires after RESULT_STORE_TTL
+
+    Args:
+        redis_client (Redis): Redis client
+        task_id (str): ID of the task
+        error (str): Error the task failed with
+    """
+
+    value = RESULT_ERROR + error.encode("utf-8")
+    redis_client.setex(result_key(task_id), RESULT_STORE_TTL, value)
+    result_store_bytes.labels(encoding="error").inc(len(value))
+
+
+async def async_load_result(
+    redis_client: AsyncRedis, task_id: str
+) -> Optional[TaskOutcome]:
+    """Read the result of a task from the store
+
+    Args:
+        redis_client (AsyncRedis): Async Redis client
+        task_id (str): ID of the task
+
+    Returns:
+        Optional[TaskOutcome]: JSON of the result or failure of the task, None
+            if not stored or expired
+    """
+
+    return decode_result(await redis_client.get(result_key(task_id)))
+
+
+async def async_load_results(
+    redis_client: AsyncRedis, task_ids: List[str]
+) -> List[Optional[TaskOutcome]]:
+    """Read the results of many tasks from the store with a single MGET
+
+    Args:
+        redis_client (AsyncRedis): Async Redis client
+        task_ids (List[str]): IDs of the tasks
+
+    Returns:
+        List[Optional[TaskOutcome]]: JSON of each result or failure of its
+            task in task order, None if missing
+    """
+
+    values = await redis_client.mget([result_key(task_id) for task_id in task_ids])
+    return [decode_result(value) for value in values]
@@ -0,0 +1,214 @@
+import inspect
+import json
+import logging
+from typing import Any, Awaitable, Callable, Dict, Optional, TypeVar, Union, cast
+
+from prometheus_client import Counter
+from redis import RedisError
+
+from api.settings import PAGE_VALIDATORS_TTL
+from api.utils.connections import get_async_redis, redis_client, redis_disabled
+from api.utils.fetch import FetchedPage, IncrementalParser, async_fetch_page, fetch_page
+
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+T = TypeVar("T")
+
+# Bump the version when extractors change so results extracted by old ones are dropped
+PAGE_KEY_PREFIX = "scrape:page:v1:"
+
+FETCH_UNCONDITIONAL = "unconditional"
+FETCH_MODIFIED = "modified"
+FETCH_NOT_MODIFIED = "not_modified"
+FETCH_FAILED = "failed"
+
+page_fetches = Counter(
+    "page_fetches_total",
+    "Upstream page fetches by revalidation outcome",
+    ("result",),
+)
+page_fetch_bytes = Counter(
+    "page_fetch_bytes_total",
+    "Bytes of upstream page bodies downloaded",
+)
+page_fetch_bytes_saved = Counter(
+    "page_fetch_bytes_saved_total",
+    "Bytes of upstream page bodies not downloaded thanks to 304 responses",
+)
+
+
+def page_key(url: str) -> str:
+    """Build the key of the validators and extracted result of a page
+
+    Args:
+        url (str): URL of the page
+
+    Returns:
+        str: Redis key
+    """
+
+    return f"{PAGE_KEY_PREFIX}{url}"
+
+
+def conditional_headers(entry: Optional[dict]) -> Dict[str, str]:
+    """Build the conditional request headers from the stored validators of a page
+
+    Args:
+        entry (Optional[dict]): Stored validators and extracted result of the page
+
+    Returns:
+        Dict[str, str]: If-None-Match and If-Modified-Since headers, if known
+    """
+
+    headers = {}
+    if entry and entry.get("etag"):
+        headers["If-None-Match"] = entry["etag"]
+    if entry and entry.get("last_modified"):
+        headers["If-Modified-Since"] = entry["last_modified"]
+    return headers
+
+
+def _decode(raw: Optional[bytes]) -> Optional[dict]:
+    return json.loads(raw) if raw else None
+
+
+def _encode(page: FetchedPage, extracted: Any) -> Optional[str]:
+    # Pages without validators can not be revalidated, nothing worth storing
+    if not page.etag and not page.last_modified:
+        return None
+    return json.dumps(
+        {
+            "etag": page.etag,
+            "last_modified": page.last_modified,
+            "size": page.size,
+            "extracted": extracted,
+        }
+    )
+
+
+def _outcome(
+    url: str, entry: Optional[dict], page: Optional[FetchedPage]
+) -> Optional[str]:
+    """Record the outcome of a fetch, returns the result to reuse on a 304"""
+
+    if page is None:
+        page_fetches.labels(result=FETCH_FAILED).inc()
+        return None
+
+    if page.not_modified and entry is not None:
+        page_fetches.labels(result=FETCH_NOT_MODIFIED).inc()
+        page_fetch_bytes_saved.inc(entry.get("size", 0))
+        logger.info(f"Page not modified, reusing extracted result: {url}")
+        return FETCH_NOT_MODIFIED
+
+    page_fetches.labels(result=FETCH_MODIFIED if entry else FETCH_UNCONDITIONAL).inc()
+    page_fetch_bytes.inc(page.size)
+    return None
+
+
+def fetch_and_extract(
+    url: str,
+    extract: Callable[[Any], T],
+    parser: Optional[Callable[[], IncrementalParser]] = None,
+) -> Optional[T]:
+    """Fetch a page and extract a result from it, revalidating with stored validators
+
+    If the page was fetched before with an ETag or Last-Modified header, the
+    request is made conditional. On a 304 the result extracted last time is
+    returned without downloading or parsing the page again.
+
+    Args:
+        url (str): URL of the page
+        extract (Callable[[Any], T]): Function extracting the result from the page
+            content, or from the result of the parser if one is given
+        parser (Optional[Callable[[], IncrementalParser]]): Factory of a parser to
+            feed the page to while it downloads
+
+    Returns:
+        Optional[T]: Extracted result, None if the page could not be fetched
+    """
+
+    key = page_key(url)
+    entry = None
+    try:
+        if not redis_disabled():
+            entry = _decode(cast(Optional[bytes], redis_client.get(key)))
+    except RedisError as e:
+        logger.error(f"Error reading validators of {url}: {e}")
+
+    page = fetch_page(
+        url,
+        headers=conditional_headers(entry),
+        parser=parser() if parser is not None else None,
+    )
+    if _outcome(url, entry, page) == FETCH_NOT_MODIFIED:
+        return entry["extracted"] if entry else None
+    if page is None:
+        return None
+    body = page.parsed if parser is not None else page.content
+    if not body:
+        return None
+
+    extracted = extract(body)
+    try:
+        encoded = _encode(page, extracted)
+        if encoded is not None and not redis_disabled():
+            redis_client.setex(key, PAGE_VALIDATORS_TTL, encoded)
+    except RedisError as e:
+        logger.error(f"Error storing validators of {url}: {e}")
+    return extracted
+
+
+async def async_fetch_and_extract(
+    url: str,
+    extract: Callable[[Any], Union[T, Awaitable[T]]],
+    parser: Optional[Callable[[], IncrementalParser]] = None,
+) -> Optional[T]:
+    """Fetch a page and extract a result from it without blocking the event loop
+
+    Args:
+        url (str): URL of the page
+        extract (Callable[[Any], Union[T, Awaitable[T]]]): Function or coroutine
+            function extracting the result from the page content, or from the
+            result of the parser if one is given
+        parser (Optional[Callable[[], IncrementalParser]]): Factory of a parser to
+            feed the page to while it downloads
+
+    Returns:
+        Optional[T]: Extracted result, None if the page could not be fetched
+    """
+
+    redis = None if redis_disabled() else get_async_redis()
+    key = page_key(url)
+    entry = None
+    try:
+        if redis is not None:
+            entry = _decode(await redis.get(key))
+    except RedisError as e:
+        logger.error(f"Error reading validators of {url}: {e}")
+
+    page = await async_fetch_page(
+        url,
+        headers=conditional_headers(entry),
+        parser=parser() if parser is not None else None,
+    )
+    if _outcome(url, entry, page) == FETCH_NOT_MODIFIED:
+        return entry["extracted"] if entry else None
+    if page is None:
+        return None
+    body = page.parsed if parser is not None else page.content
+    if not body:
+        return None
+
+    extracted = extract(body)
+    if inspect.isawaitable(extracted):
+        extracted = await extracted
+    result = cast(T, extracted)
+    try:
+        encoded = _encode(page, result)
+        if encoded is not None and redis is not None:
+            await redis.setex(key, PAGE_VALIDATORS_TTL, encoded)
+    except RedisError as e:
+        logger.error(f"Error storing validators of {url}: {e}")
+    return result
@@ -1,131 +1,293 @@
+import asyncio
 import logging
-from typing import Optional
+from concurrent.futures import ThreadPoolExecutor
+from typing import (
+    Any,
+    AsyncIterable,
+    AsyncIterator,
+    Callable,
+    Dict,
+    Iterable,
+    Optional,
+    Sequence,
+    Set,
+    Tuple,
+    Union,
+)
 
-import requests
-from bs4 import BeautifulSoup
 from lxml import html
+from prometheus_client import Counter, Histogram
 
+from api.settings import (
+    FETCH_THREAD_POOL_SIZE,
+    SCRAPE_MANY_CONCURRENCY,
+    SCRAPE_STREAMING_PARSE,
+)
+from api.utils.fetch import async_fetch_page_content, fetch_page_content  # noqa: F401
+from api.utils.fields import (
+    APP_PAGE,
+    VERSIONS_PAGE,
+    extract_fields,
+    first_text_content,
+    has_class,
+    register_field,
+    register_page,
+)
+from api.utils.metrics import DURATION_BUCKETS
+from api.utils.next_data import extract_next_data_fields, register_next_data_field
+from api.utils.parsing import async_parse, parse
+from api.utils.ratelimit import host_group
+from api.utils.revalidation import async_fetch_and_extract, fetch_and_extract
+from api.utils.streaming import StreamingFieldParser
 from api.utils.url import convert_to_base_url
 
 logging.basicConfig(level=logging.INFO)
 
-APP_NAME_XPATH = (
-    '//*[@id="__next"]/div/div[2]/div/div[1]/div[2]/div[2]/div/div[3]/div[2]/div[1]/h1'
-)
-NO_DOWNLOADS_XPATH = '//*[@id="__next"]/div/div[2]/div/div[1]/div[2]/div[2]/div/div[3]/div[3]/div[1]/span[1]'
-APP_DESCRIPTION_XPATH = (
-    '//*[@id="__next"]/div/div[2]/div/div[1]/div[2]/div[4]/div[2]/div/div/p'
+# Field XPaths of the app page are relative to the root element of the Next.js app
+APP_ROOT_XPATH = '//*[@id="__next"]'
+APP_NAME_XPATH = "div/div[2]/div/div[1]/div[2]/div[2]/div/div[3]/div[2]/div[1]/h1"
+NO_DOWNLOADS_XPATH = (
+    "div/div[2]/div/div[1]/div[2]/div[2]/div/div[3]/div[3]/div[1]/span[1]"
 )
+APP_DESCRIPTION_XPATH = "div/div[2]/div/div[1]/div[2]/div[4]/div[2]/div/div/p"
 APP_RELEASE_DATE_XPATH = (
-    '//*[@id="__next"]/div/div[2]/div/div[1]/div[2]/div[6]/div[3]/div[1]/span[5]/text()'
+    "div/div[2]/div/div[1]/div[2]/div[6]/div[3]/div[1]/span[5]/text()"
 )
 APP_VERSION_SELECTOR_CLASS = "appview-header__AppViewSpan-sc-924t8o-13 jTqVMH"
+# The component class of the version span, the second class is a generated style hash
+APP_VERSION_CLASS_TOKEN = APP_VERSION_SELECTOR_CLASS.split()[0]
+APP_VERSION_XPATH = f"//span{has_class(APP_VERSION_CLASS_TOKEN)}"
 
+# Units of the download count as shown on the app page
+DOWNLOAD_UNITS = ((1_000_000_000, "B"), (1_000_000, "M"), (1_000, "K"))
 
-def fetch_page_content(url: str) -> Optional[str]:
-    """Fetch the content of a webpage
+EXTRACTED_FROM_NEXT_DATA = "next_data"
+EXTRACTED_FROM_XPATH = "xpath"
+
+extractions = Counter(
+    "scrape_extractions_total",
+    "App pages extracted by the path that served them",
+    ("path",),
+)
+scrape_stage_duration = Histogram(
+    "scrape_stage_duration_seconds",
+    "Time of the app page, the Versions page and the whole scrape of an app",
+    ("stage",),
+    buckets=DURATION_BUCKETS,
+)
+
+# Threads used by the sync path to download the Versions page alongside the app page
+_fetch_executor = ThreadPoolExecutor(
+    max_workers=FETCH_THREAD_POOL_SIZE, thread_name_prefix="scrape-fetch"
+)
+
+# Whether the last app page of each host group carried the app version
+app_pages_with_version: Dict[str, bool] = {}
+
+
+def clean_up_text(text: str) -> Optional[str]:
+    """Clean up the text by removing the leading and trailing whitespaces and newlines
 
     Args:
-        url (str): URL of the webpage
+        text (str): Text to clean up
 
     Returns:
-        Optional[str]: Content of the webpage if successful, None otherwise
+        str: Cleaned up text or None if the text is empty
     """
 
-    try:
-        response = requests.get(url, timeout=10)
-        response.raise_for_status()
-        return response.content.decode("utf-8")
-    except requests.RequestException as e:
-        logging.error(f"Error fetching page content: {e}")
-        return None
-    except UnicodeDecodeError as e:
-        logging.error(f"Error decoding content from {url}: {e}")
-        return None
+    clean_text = text.replace("\n", "").replace("\r", "").replace("\xa0", "").strip()
+    return clean_text if clean_text else None
 
 
-def scrape_element(tree: html, xpath: str) -> Optional[str]:
-    """Scrape an element from a webpage by its XPath
+def join_paragraphs(paragraphs: list) -> str:
+    """Join the cleaned up text of the description paragraphs
 
     Args:
-        tree (html): HTML tree of the webpage
-        xpath (str): XPath of the element to scrape
+        paragraphs (list): Paragraph elements of the description
 
     Returns:
-        Optional[str]: Text content of the element if found, None otherwise
+        str: Description text, empty if there are no paragraphs
     """
 
-    element = tree.xpath(xpath)
-    return element[0].text if element else None
+    description_items = [clean_up_text(p.text_content()) for p in paragraphs]
+    return " ".join(item for item in description_items if item)
 
 
-def scrape_app_name(tree: html) -> Optional[str]:
-    """Scrape the app name from a webpage
+def second_match(matches: list) -> Optional[str]:
+    """Second text node matched, the first one is the label
 
     Args:
-        tree (html): HTML tree of the webpage
+        matches (list): Text nodes matched by the selector
 
     Returns:
-        Optional[str]: App name if found, None otherwise
+        Optional[str]: Text of the second node if any matched, None otherwise
     """
-    return scrape_element(tree, APP_NAME_XPATH)
+
+    return matches[1] if matches else None
 
 
-def scrape_no_downloads(tree: html) -> Optional[str]:
-    """Scrape the number of downloads of an app from a webpage
+def join_lines(text: str) -> str:
+    """Join the cleaned up lines of a text
 
     Args:
-        tree (html): HTML tree of the webpage
+        text (str): Text to clean up
 
     Returns:
-        Optional[str]: Number of downloads of the app or None if not found
+        str: Lines of the text joined by spaces
     """
 
-    return scrape_element(tree, NO_DOWNLOADS_XPATH)
+    lines = [clean_up_text(line) for line in text.splitlines()]
+    return " ".join(line for line in lines if line)
 
 
-def clean_up_text(text: str) -> Optional[str]:
-    """Clean up the text by removing the leading and trailing whitespaces and newlines
+def format_downloads(downloads: int) -> str:
+    """Format a download count the way the app page shows it, e.g. 5M+
 
     Args:
-        text (str): Text to clean up
+        downloads (int): Number of downloads
 
     Returns:
-        str: Cleaned up text or None if the text is empty
+        str: Download count rounded down to its unit
     """
 
-    clean_text = text.replace("\n", "").replace("\r", "").replace("\xa0", "").strip()
-    return clean_text if clean_text else None
+    for size, unit in DOWNLOAD_UNITS:
+        if downloads >= size:
+            return f"{downloads // size}{unit}+"
+    return str(downloads)
 
 
-def scrape_app_description(tree: html) -> Optional[str]:
-    """Scrape the app description from a webpage
+def date_part(timestamp: str) -> str:
+    """Date part of a "YYYY-MM-DD HH:MM:SS" timestamp
 
     Args:
-        tree (html): HTML tree of the webpage
+        timestamp (str): Timestamp to shorten
 
     Returns:
-        Optional[str]: App description if found, None otherwise
+        str: Date of the timestamp
     """
 
-    description_items = [
-        clean_up_text(p.text_content()) for p in tree.xpath(APP_DESCRIPTION_XPATH)
-    ]
-    return " ".join(item for item in description_items if item)
+    return timestamp.split(" ")[0]
+
 
+register_page(APP_PAGE, APP_ROOT_XPATH)
+register_field("app_name", APP_NAME_XPATH)
+register_field("no_downloads", NO_DOWNLOADS_XPATH)
+register_field("app_description", APP_DESCRIPTION_XPATH, join_paragraphs)
+register_field("app_release_date", APP_RELEASE_DATE_XPATH, second_match)
+register_field("app_version", APP_VERSION_XPATH, first_text_content, page=VERSIONS_PAGE)
 
-def scrape_app_release_date(tree: html) -> Optional[str]:
-    """Scrape the app release date from a webpage
+register_next_data_field("app_name", ("name",), required=True)
+register_next_data_field("no_downloads", ("stats", "downloads"), format_downloads)
+register_next_data_field("app_description", ("media", "description"), join_lines)
+register_next_data_field("app_release_date", ("updated",), date_part)
+register_next_data_field("app_version", ("file", "vername"))
+
+
+def extract_app_version(content: str) -> Optional[str]:
+    """Extract the app version from the content of the Versions page
 
     Args:
-        tree (html): HTML tree of the webpage
+        content (str): Content of the Versions page
 
     Returns:
-        Optional[str]: App release date if found, None otherwise
+        Optional[str]: App version if found, None otherwise
     """
 
-    element = tree.xpath(APP_RELEASE_DATE_XPATH)
-    return element[1] if element else None
+    return extract_fields(html.fromstring(content), VERSIONS_PAGE)["app_version"]
+
+
+def extract_app_page(content: str) -> Tuple[str, dict]:
+    """Extract the fields of the app page
+
+    The Next.js data embedded in the page is decoded when present, which is
+    cheaper than building the tree and also carries the app version. Pages
+    without it are extracted with the XPath fields. The function only depends
+    on its argument, so it can run in a parse process.
+
+    Args:
+        content (str): Content of the app page
+
+    Returns:
+        Tuple[str, dict]: Path that served the page and the extracted fields,
+            with the app version only if the page had it
+    """
+
+    fields = extract_next_data_fields(content)
+    if fields is not None:
+        return EXTRACTED_FROM_NEXT_DATA, fields
+
+    tree = html.fromstring(content)
+    return EXTRACTED_FROM_XPATH, extract_fields(tree, APP_PAGE)
+
+
+def app_details(base_url: str, extraction: Tuple[str, dict]) -> dict:
+    """Count the path an app page was extracted by and add its URL
+
+    Args:
+        base_url (str): Base URL of the app page
+        extraction (Tuple[str, dict]): Result of extract_app_page
+
+    Returns:
+        dict: Scraped app details
+    """
+
+    path, fields = extraction
+    extractions.labels(path=path).inc()
+    return {"app_url": base_url, **fields}
+
+
+def extract_app_details(content: str, base_url: str) -> dict:
+    """Extract the app details from the content of the app page
+
+    Args:
+        content (str): Content of the app page
+        base_url (str): Base URL of the app page
+
+    Returns:
+        dict: Scraped app details, with the app version only if the page had it
+    """
+
+    return app_details(base_url, extract_app_page(content))
+
+
+def app_details_extraction(
+    base_url: str, asynchronous: bool = False
+) -> Tuple[Callable[[Any], Any], Optional[Callable[[], StreamingFieldParser]]]:
+    """Choose how the app page is extracted, buffered or parsed while it downloads
+
+    Buffered pages are parsed on the parse executor. Streamed pages are parsed
+    by the fetcher as the chunks arrive.
+
+    Args:
+        base_url (str): Base URL of the app page
+        asynchronous (bool): Whether the extract function is awaited
+
+    Returns:
+        Tuple[Callable[[Any], Any], Optional[Callable[[], StreamingFieldParser]]]:
+            Extract function and parser factory for fetch_and_extract
+    """
+
+    if SCRAPE_STREAMING_PARSE:
+        parser = StreamingFieldParser(APP_PAGE)
+
+        def extract_streamed(fields: dict) -> dict:
+            path = (
+                EXTRACTED_FROM_NEXT_DATA
+                if parser.from_next_data
+                else EXTRACTED_FROM_XPATH
+            )
+            return app_details(base_url, (path, fields))
+
+        return extract_streamed, lambda: parser
+
+    if asynchronous:
+
+        async def async_extract(content: str) -> dict:
+            return app_details(base_url, await async_parse(extract_app_page, content))
+
+        return async_extract, None
+
+    return lambda content: app_details(base_url, parse(extract_app_page, content)), None
 
 
 def scrape_app_version(url: str) -> Optional[str]:
@@ -138,15 +300,58 @@ def scrape_app_version(url: str) -> Optional[str]:
         Optional[str]: App version if found, None otherwise
     """
 
-    version_url = f"{url}/versions"
-    content = fetch_page_content(version_url)
-    if not content:
-        return None
+    with scrape_stage_duration.labels(stage="versions_page").time():
+        return fetch_and_extract(
+            f"{url}/versions", lambda content: parse(extract_app_version, content)
+        )
+
+
+async def async_scrape_app_version(url: str) -> Optional[str]:
+    """Scrape the app version from the Versions URL without blocking the event loop
+
+    Args:
+        url (str): URL of the target page
+
+    Returns:
+        Optional[str]: App version if found, None otherwise
+    """
+
+    with scrape_stage_duration.labels(stage="versions_page").time():
+        return await async_fetch_and_extract(
+            f"{url}/versions",
+            lambda content: async_parse(extract_app_version, content),
+        )
+
+
+def fetch_versions_early(base_url: str) -> bool:
+    """Tell whether to fetch the Versions page alongside the app page
+
+    The Versions page does not depend on the app page, so both are fetched at
+    once unless the app pages of the host were seen to carry the version, when
+    the request would be wasted.
+
+    Args:
+        base_url (str): Base URL of the app page
+
+    Returns:
+        bool: True unless the last app page of the host had the version
+    """
+
+    return not app_pages_with_version.get(host_group(base_url), False)
 
-    soup = BeautifulSoup(content, "html.parser")
-    app_version_element = soup.find("span", class_=APP_VERSION_SELECTOR_CLASS)
 
-    return app_version_element.text if app_version_element else None
+def remember_app_page(base_url: str, details: Optional[dict]) -> None:
+    """Remember whether the app page of a host carried the version
+
+    Args:
+        base_url (str): Base URL of the app page
+        details (Optional[dict]): Details extracted from the app page
+    """
+
+    if details is not None:
+        app_pages_with_version[host_group(base_url)] = (
+            details.get("app_version") is not None
+        )
 
 
 def scrape_target_page(url: str) -> Optional[dict]:
@@ -156,17 +361,163 @@ def scrape_target_page(url: str) -> Optional[dict]:
         url (str): URL of the target page
     """
 
+    with scrape_stage_duration.labels(stage="total").time():
+        return _scrape_target_page(url)
+
+
+def _scrape_target_page(url: str) -> Optional[dict]:
     base_url = convert_to_base_url(url)
-    content = fetch_page_content(base_url)
-    if not content:
-        return None
 
-    tree = html.fromstring(content)
-    return {
-        "app_url": base_url,
-        "app_name": scrape_app_name(tree),
-        "no_downloads": scrape_no_downloads(tree),
-        "app_description": scrape_app_description(tree),
-        "app_release_date": scrape_app_release_date(tree),
-        "app_version": scrape_app_version(base_url),
-    }
+    # An early fetch already running is not stopped, its result is just dropped
+    version_future = (
+        _fetch_executor.submit(scrape_app_version, base_url)
+        if fetch_versions_early(base_url)
+        else None
+    )
+
+    extract, parser = app_details_extraction(base_url)
+    with scrape_stage_duration.labels(stage="app_page").time():
+        details = fetch_and_extract(base_url, extract, parser)
+    remember_app_page(base_url, details)
+    if details is None or details.get("app_version") is not None:
+        if version_future is not None:
+            version_future.cancel()
+        return details
+
+    version = (
+        version_future.result()
+        if version_future is not None
+        else scrape_app_version(base_url)
+    )
+    return {**details, "app_version": version}
+
+
+async def async_scrape_target_page(
+    url: str, with_version: bool = True
+) -> Optional[dict]:
+    """Scrape the target page without blocking the event loop
+
+    Args:
+        url (str): URL of the target page
+        with_version (bool): Whether to fetch the Versions page when the app
+            page lacks the version
+    """
+
+    with scrape_stage_duration.labels(stage="total").time():
+        return await _async_scrape_target_page(url, with_version)
+
+
+async def _async_scrape_target_page(url: str, with_version: bool) -> Optional[dict]:
+    base_url = convert_to_base_url(url)
+
+    # An early fetch is cancelled when the app page has the version
+    version_task = (
+        asyncio.create_task(async_scrape_app_version(base_url))
+        if with_version and fetch_versions_early(base_url)
+        else None
+    )
+    try:
+        extract, parser = app_details_extraction(base_url, asynchronous=True)
+        with scrape_stage_duration.labels(stage="app_page").time():
+            details = await async_fetch_and_extract(base_url, extract, parser)
+        remember_app_page(base_url, details)
+        if not with_version or details is None:
+            return details
+        if details.get("app_version") is not None:
+            return details
+
+        version = await (
+            version_task
+            if version_task is not None
+            else async_scrape_app_version(base_url)
+        )
+        return {**details, "app_version": version}
+    finally:
+        if version_task is not None:
+            version_task.cancel()
+
+
+class ScrapeFailed(Exception):
+    """Yielded by scrape_many for a URL that could not be scraped"""
+
+
+async def _aiter_urls(
+    urls: Union[Iterable[str], AsyncIterable[str]]
+) -> AsyncIterator[str]:
+    if isinstance(urls, AsyncIterable):
+        async for url in urls:
+            yield url
+    else:
+        for url in urls:
+            yield url
+
+
+async def _scrape_fields(url: str, fields: Optional[Sequence[str]]) -> dict:
+    with_version = fields is None or "app_version" in fields
+    details = await async_scrape_target_page(url, with_version=with_version)
+    if details is None:
+        raise ScrapeFailed(f"{url} could not be scraped")
+    if fields is None:
+        return details
+    return {name: details.get(name) for name in fields}
+
+
+async def scrape_many(
+    urls: Union[Iterable[str], AsyncIterable[str]],
+    concurrency: int = SCRAPE_MANY_CONCURRENCY,
+    fields: Optional[Sequence[str]] = None,
+) -> AsyncIterator[Tuple[str, Union[dict, Exception]]]:
+    """Scrape many target pages, yielding each result as soon as it completes
+
+    URLs are pulled from the input only while fewer than concurrency scrapes
+    are running, so a long or endless input is never read ahead, and at most
+    concurrency results wait for a slow consumer. URLs of an app already
+    scraped are skipped. All scrapes share the process-wide HTTP client.
+
+    Args:
+        urls (Union[Iterable[str], AsyncIterable[str]]): URLs of the target pages
+        concurrency (int): Maximum number of scrapes running at once
+        fields (Optional[Sequence[str]]): Fields to keep in each result, all by
+            default. The Versions page is not fetched without app_version.
+
+    Yields:
+        Tuple[str, Union[dict, Exception]]: URL and its result, or the error
+            that failed it, ScrapeFailed if the page could not be scraped
+    """
+
+    url_iterator = _aiter_urls(urls).__aiter__()
+    running: Dict[asyncio.Task, str] = {}
+    seen: Set[str] = set()
+    exhausted = False
+
+    try:
+        while True:
+            while not exhausted and len(running) < concurrency:
+                try:
+                    url = await url_iterator.__anext__()
+                except StopAsyncIteration:
+                    exhausted = True
+                    break
+
+                base_url = convert_to_base_url(url)
+                if base_url in seen:
+                    continue
+                seen.add(base_url)
+                running[asyncio.create_task(_scrape_fields(url, fields))] = url
+
+            if not running:
+                return
+
+            done, _ = await asyncio.wait(running, return_when=asyncio.FIRST_COMPLETED)
+            for task in done:
+                url = running.pop(task)
+                try:
+                    outcome: Union[dict, Exception] = task.result()
+                except Exception as e:
+                    outcome = e
+                yield url, outcome
+    finally:
+        # The consumer stopped early, drop the scrapes it will not read
+        for task in running:
+            task.cancel()
+        await asyncio.gather(*running, return_exceptions=True)
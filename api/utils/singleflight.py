@@ -0,0 +1,59 @@
+import asyncio
+from typing import Awaitable, Callable, Dict, Generic, TypeVar
+
+from prometheus_client import Counter
+
+T = TypeVar("T")
+
+singleflight_calls = Counter(
+    "singleflight_calls_total",
+    "Calls to a single-flight group, by whether they ran or joined an in-flight call",
+    ("group", "role"),
+)
+
+ROLE_LEADER = "leader"
+ROLE_COLLAPSED = "collapsed"
+
+
+class SingleFlight(Generic[T]):
+    """Collapse concurrent calls with the same key into one in-flight call
+
+    The first caller for a key starts the call, every caller arriving while it
+    is in flight awaits the same result. The call runs as its own task, so a
+    caller going away (e.g. a client disconnect) does not cancel it for the rest.
+    """
+
+    def __init__(self, name: str) -> None:
+        self.name = name
+        self._calls: Dict[str, "asyncio.Task[T]"] = {}
+
+    async def do(self, key: str, fn: Callable[[], Awaitable[T]]) -> T:
+        """Run fn for key, or join the call already in flight for key
+
+        Args:
+            key (str): Key identifying identical calls
+            fn (Callable[[], Awaitable[T]]): Coroutine function making the call
+
+        Returns:
+            T: Result of the shared call
+        """
+
+        task = self._calls.get(key)
+        if task is None:
+            singleflight_calls.labels(group=self.name, role=ROLE_LEADER).inc()
+            task = asyncio.ensure_future(fn())
+            self._calls[key] = task
+            task.add_done_callback(lambda _: self._calls.pop(key, None))
+        else:
+            singleflight_calls.labels(group=self.name, role=ROLE_COLLAPSED).inc()
+
+        return await asyncio.shield(task)
+
+    def in_flight(self) -> int:
+        """Number of calls currently in flight
+
+        Returns:
+            int: Number of distinct keys being called
+        """
+
+        return len(self._calls)
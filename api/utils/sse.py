@@ -0,0 +1,185 @@
+import json
+from typing import Any, AsyncGenerator, Iterable, List, Optional, Set
+
+import falcon.asgi
+from falcon.asgi import Request
+from prometheus_client import Counter, Gauge
+
+from api.settings import SSE_MAX_CONNECTIONS
+
+sse_rejected_streams = Counter(
+    "sse_rejected_streams_total",
+    "SSE streams rejected because the connection limit was reached",
+)
+
+
+class StreamLimiter:
+    """Bound the number of SSE streams open at the same time in this process"""
+
+    def __init__(self, limit: int) -> None:
+        self.limit = limit
+        self.open = 0
+
+    def acquire(self) -> bool:
+        """Reserve a slot for a new stream
+
+        Returns:
+            bool: True if the stream may be opened, False if the limit is reached
+        """
+
+        if self.open >= self.limit:
+            sse_rejected_streams.inc()
+            return False
+        self.open += 1
+        return True
+
+    def release(self) -> None:
+        """Release the slot of a closed stream"""
+
+        self.open = max(self.open - 1, 0)
+
+
+stream_limiter = StreamLimiter(SSE_MAX_CONNECTIONS)
+
+# ASGI scope key of the streams to close once the response of a request is done
+SSE_STREAMS_SCOPE_KEY = "api.sse_streams"
+
+
+def close_when_done(req: Request, stream: AsyncGenerator) -> AsyncGenerator:
+    """Have a stream closed by StreamClosingApp once its response is done
+
+    Args:
+        req (Request): Request the stream answers
+        stream (AsyncGenerator): Stream set as the response SSE
+
+    Returns:
+        AsyncGenerator: The stream
+    """
+
+    req.scope.setdefault(SSE_STREAMS_SCOPE_KEY, []).append(stream)
+    return stream
+
+
+class StreamClosingApp(falcon.asgi.App):
+    """Falcon app closing the SSE streams of a request when its response is done
+
+    Falcon stops iterating a stream when the client disconnects but does not
+    close it, so the finally blocks releasing its subscriptions and connection
+    slot would only run once it is garbage collected.
+    """
+
+    async def __call__(self, scope: dict, receive: Any, send: Any) -> None:
+        try:
+            await super().__call__(scope, receive, send)
+        finally:
+            for stream in scope.pop(SSE_STREAMS_SCOPE_KEY, []):
+                await stream.aclose()
+
+
+Gauge(
+    "sse_open_streams",
+    "SSE streams currently open",
+).set_function(lambda: stream_limiter.open)
+Gauge(
+    "sse_max_streams",
+    "Maximum number of SSE streams open at the same time",
+).set_function(lambda: stream_limiter.limit)
+
+
+def encode_cursor(delivered: Set[int]) -> str:
+    """Encode the positions of the delivered tasks of a stream as an event ID
+
+    The event ID is a hex bitmask over the ordered task IDs of the stream, so a
+    reconnecting client resumes with everything it has seen in Last-Event-ID.
+
+    Args:
+        delivered (Set[int]): Positions of the delivered tasks
+
+    Returns:
+        str: Event ID
+    """
+
+    return format(sum(1 << position for position in delivered), "x")
+
+
+def decode_cursor(event_id: Optional[str], size: int) -> Set[int]:
+    """Decode an event ID created by encode_cursor
+
+    Args:
+        event_id (Optional[str]): Last-Event-ID sent by the client
+        size (int): Number of tasks of the stream
+
+    Returns:
+        Set[int]: Positions of the delivered tasks, empty if the ID is invalid
+    """
+
+    if not event_id:
+        return set()
+    try:
+        mask = int(event_id, 16)
+    except ValueError:
+        return set()
+    return {position for position in range(size) if mask >> position & 1}
+
+
+def parse_task_ids(value: Optional[str]) -> List[str]:
+    """Parse a comma-separated list of task IDs, dropping blanks and duplicates
+
+    Args:
+        value (Optional[str]): Comma-separated task IDs
+
+    Returns:
+        List[str]: Task IDs in the order given
+    """
+
+    if not value:
+        return []
+    return list(
+        dict.fromkeys(part.strip() for part in value.split(",") if part.strip())
+    )
+
+
+def encode_task_result(task_id: str, payload: bytes) -> str:
+    """Build the data of a multiplexed result event from a stored task result
+
+    Args:
+        task_id (str): ID of the task
+        payload (bytes): Stored JSON result of the task
+
+    Returns:
+        str: JSON object with the task ID and its result
+    """
+
+    return f'{{"task_id": {json.dumps(task_id)}, "result": {payload.decode()}}}'
+
+
+def encode_task_error(task_id: str, error: str) -> str:
+    """Build the data of a multiplexed error event from the failure of a task
+
+    Args:
+        task_id (str): ID of the task
+        error (str): Error the task failed with
+
+    Returns:
+        str: JSON object with the task ID and its error
+    """
+
+    return json.dumps({"task_id": task_id, "error": error})
+
+
+def pending_positions(task_ids: Iterable[str], delivered: Set[int]) -> dict:
+    """Map the task IDs not delivered yet to their position in the stream
+
+    Args:
+        task_ids (Iterable[str]): Ordered task IDs of the stream
+        delivered (Set[int]): Positions of the delivered tasks
+
+    Returns:
+        dict: Position of each pending task ID
+    """
+
+    return {
+        task_id: position
+        for position, task_id in enumerate(task_ids)
+        if position not in delivered
+    }
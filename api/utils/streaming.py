@@ -0,0 +1,106 @@
+import logging
+from typing import Any, Dict, Optional, Set
+
+from lxml import etree, html
+
+from api.utils.fields import FIELDS, PAGE_ROOTS, extract_fields
+from api.utils.next_data import NEXT_DATA_ID, app_metadata_fields, decode_app_metadata
+
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+
+def _container(match: Any) -> Optional[etree._Element]:
+    """Element whose end makes a match final, the parent of the matched element"""
+
+    element = (
+        match.getparent() if isinstance(match, etree._ElementUnicodeResult) else match
+    )
+    return element.getparent() if element is not None else None
+
+
+class StreamingFieldParser:
+    """Parse a page while it downloads and tell when its fields are final
+
+    Chunks are fed to an incremental lxml parser as they arrive. A field is
+    final once the parent of its last match has been closed, so nothing that
+    comes later can change it, and the download can stop as soon as every
+    field of the page is final or the Next.js data of the page was read.
+    """
+
+    def __init__(self, page: str) -> None:
+        self.page = page
+        self.from_next_data = False
+        self._parser = etree.HTMLPullParser(events=("end",))
+        # Build the same element classes as html.fromstring, e.g. for text_content
+        self._parser.set_element_class_lookup(html.HtmlElementClassLookup())
+        self._closed: Set[etree._Element] = set()
+        self._document: Optional[etree._Element] = None
+        self._root: Optional[etree._Element] = None
+        self._final: Set[str] = set()
+        self._next_data_fields: Optional[Dict[str, Any]] = None
+
+    def feed(self, chunk: bytes) -> bool:
+        """Parse the next chunk of the page
+
+        Args:
+            chunk (bytes): Next chunk of the page body
+
+        Returns:
+            bool: True once the rest of the page is not needed
+        """
+
+        self._parser.feed(chunk)
+        for _, element in self._parser.read_events():
+            self._closed.add(element)
+            if self._document is None:
+                self._document = element.getroottree().getroot()
+            if element.tag == "script" and element.get("id") == NEXT_DATA_ID:
+                app = decode_app_metadata(element.text or "")
+                if app is not None:
+                    self._next_data_fields = app_metadata_fields(app)
+                    self.from_next_data = self._next_data_fields is not None
+
+        return self.from_next_data or self._fields_final()
+
+    def _fields_final(self) -> bool:
+        if self._document is None:
+            return False
+
+        if self._root is None:
+            root = PAGE_ROOTS.get(self.page)
+            roots = root(self._document) if root is not None else [self._document]
+            if not roots:
+                return False
+            self._root = roots[0]
+
+        if self._root in self._closed:
+            return True
+
+        for field in FIELDS.get(self.page, ()):
+            if field.name in self._final:
+                continue
+            matches = field.selector(self._root)
+            if matches and _container(matches[-1]) in self._closed:
+                self._final.add(field.name)
+
+        return len(self._final) == len(FIELDS.get(self.page, ()))
+
+    def close(self) -> Optional[Dict[str, Any]]:
+        """Finish parsing and extract the fields from what was read
+
+        Returns:
+            Optional[Dict[str, Any]]: Value of each field by name, None if the
+                page could not be parsed
+        """
+
+        if self._next_data_fields is not None:
+            return self._next_data_fields
+
+        try:
+            document = self._parser.close()
+        except etree.XMLSyntaxError as e:
+            logger.error(f"Error parsing page: {e}")
+            return None
+
+        return extract_fields(document, self.page)
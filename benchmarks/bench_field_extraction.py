@@ -0,0 +1,90 @@
+"""Pages per second per core of the app page field extraction
+
+Compares the previous per-field functions, which hand an absolute XPath string
+to tree.xpath() and so recompile each selector and search for the __next root
+on every call, with the field registry evaluating selectors compiled once at
+import relative to a root located once per page. The last line decodes the
+Next.js data embedded in the page instead of building a tree at all.
+
+Usage:
+    python -m benchmarks.bench_field_extraction [--pages 2000] [--filler 2000]
+"""
+
+import argparse
+import time
+from typing import Callable, Optional
+
+from lxml import html
+
+from api.utils import scrape
+from api.utils.fields import APP_PAGE, extract_fields
+from api.utils.next_data import extract_next_data_fields
+from benchmarks.pages import render_app_page
+
+
+def absolute(xpath: str) -> str:
+    return f"{scrape.APP_ROOT_XPATH}/{xpath}"
+
+
+def previous_extract(tree: html.HtmlElement) -> dict:
+    """Previous behaviour: one function per field calling tree.xpath(str)"""
+
+    def scrape_element(xpath: str) -> Optional[str]:
+        element = tree.xpath(xpath)
+        return element[0].text if element else None
+
+    description_items = [
+        scrape.clean_up_text(p.text_content())
+        for p in tree.xpath(absolute(scrape.APP_DESCRIPTION_XPATH))
+    ]
+    release_date = tree.xpath(absolute(scrape.APP_RELEASE_DATE_XPATH))
+    return {
+        "app_name": scrape_element(absolute(scrape.APP_NAME_XPATH)),
+        "no_downloads": scrape_element(absolute(scrape.NO_DOWNLOADS_XPATH)),
+        "app_description": " ".join(item for item in description_items if item),
+        "app_release_date": release_date[1] if release_date else None,
+    }
+
+
+def registry_extract(tree: html.HtmlElement) -> dict:
+    return extract_fields(tree, APP_PAGE)
+
+
+def pages_per_second(
+    extract: Callable[[html.HtmlElement], dict], content: str, pages: int, parse: bool
+) -> float:
+    tree = html.fromstring(content)
+    started = time.perf_counter()
+    for _ in range(pages):
+        extract(html.fromstring(content) if parse else tree)
+    return pages / (time.perf_counter() - started)
+
+
+def main(pages: int, filler: int) -> None:
+    content = render_app_page(filler_blocks=filler)
+    assert previous_extract(html.fromstring(content)) == registry_extract(
+        html.fromstring(content)
+    )
+
+    print(f"{pages} pages of {len(content) / 1024:.0f} KB, single thread")
+    print(f"{'':<16} {'previous pages/s':>18} {'registry pages/s':>18}")
+    for label, parse in (("extract only", False), ("parse + extract", True)):
+        previous = pages_per_second(previous_extract, content, pages, parse)
+        registry = pages_per_second(registry_extract, content, pages, parse)
+        print(f"{label:<16} {previous:>18.0f} {registry:>18.0f}")
+
+    content = render_app_page(filler_blocks=filler, next_data=True)
+    started = time.perf_counter()
+    for _ in range(pages):
+        extract_next_data_fields(content)
+    next_data = pages / (time.perf_counter() - started)
+    print(f"{'next data':<16} {'':>18} {next_data:>18.0f}")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--pages", type=int, default=2000)
+    parser.add_argument("--filler", type=int, default=2000)
+    args = parser.parse_args()
+
+    main(args.pages, args.filler)
@@ -0,0 +1,80 @@
+"""Scrape throughput of the async path with parsing inline, in threads or in processes
+
+The upstream answers instantly, so throughput is bound by parsing. Inline
+parsing runs on the event loop; the thread and process pools parse with 1, 4
+and 8 workers. Process pools need as many cores to scale, check nproc.
+
+Usage:
+    python -m benchmarks.bench_parse_executor [--pages 200] [--filler 2000]
+"""
+
+import argparse
+import asyncio
+import os
+import time
+from unittest.mock import patch
+
+import httpx
+
+from api.utils import fetch, parsing
+from api.utils.scrape import async_scrape_target_page
+from benchmarks.pages import render_app_page, render_versions_page
+from benchmarks.stubs import no_redis
+
+WORKERS = [1, 4, 8]
+
+
+def install_upstream(filler: int) -> None:
+    app_page = render_app_page(filler_blocks=filler)
+    versions_page = render_versions_page(filler_blocks=filler)
+
+    def handler(request: httpx.Request) -> httpx.Response:
+        page = versions_page if request.url.path == "/versions" else app_page
+        return httpx.Response(200, text=page)
+
+    fetch._async_client = httpx.AsyncClient(transport=httpx.MockTransport(handler))
+
+
+async def pages_per_second(pages: int) -> float:
+    started = time.perf_counter()
+    results = await asyncio.gather(
+        *(
+            async_scrape_target_page(f"https://app-{i}.en.aptoide.com")
+            for i in range(pages)
+        )
+    )
+    assert all(result and result["app_version"] for result in results)
+    return pages / (time.perf_counter() - started)
+
+
+def run(kind: str, workers: int, pages: int) -> float:
+    with patch.object(parsing, "PARSE_EXECUTOR", kind), patch.object(
+        parsing, "PARSE_WORKERS", workers
+    ):
+        try:
+            # Warm the pool up so process start-up is not measured
+            asyncio.run(pages_per_second(workers))
+            return asyncio.run(pages_per_second(pages))
+        finally:
+            parsing.shutdown_parse_executor()
+
+
+def main(pages: int, filler: int) -> None:
+    install_upstream(filler)
+
+    print(f"{pages} scrapes, {os.cpu_count()} cores available")
+    with no_redis():
+        print(f"{'inline':<8} {'':>8} {run('inline', 1, pages):>10.1f} pages/s")
+        for kind in ("thread", "process"):
+            for workers in WORKERS:
+                rate = run(kind, workers, pages)
+                print(f"{kind:<8} {workers:>8} {rate:>10.1f} pages/s")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--pages", type=int, default=200)
+    parser.add_argument("--filler", type=int, default=2000)
+    args = parser.parse_args()
+
+    main(args.pages, args.filler)
@@ -0,0 +1,100 @@
+"""Requests per second of /v2/scrape/result/{task_id}, previous vs current serialization
+
+The previous path built an AsyncScrapeResultSchema per request, dumped with it
+and encoded the response with the standard json module. The current path uses
+the precompiled serializer and the orjson media handler. Celery and Redis are
+replaced by in-memory stubs, so the numbers are the cost of the handler and the
+ASGI app alone.
+
+Usage:
+    python -m benchmarks.bench_result_endpoint [--requests 5000] [--paragraphs 20]
+"""
+
+import argparse
+import asyncio
+import json
+import time
+from contextlib import ExitStack
+from unittest.mock import AsyncMock, MagicMock, patch
+
+from falcon import MEDIA_JSON, media
+from falcon.testing import ASGIConductor
+
+from api.main import app
+from api.schemas.scrape import AsyncScrapeResultSchema
+from api.tasks import celery
+from api.utils.results import encode_result
+
+TASK_ID = "benchmark-task"
+
+
+def stub_backends(stack: ExitStack, paragraphs: int) -> None:
+    result = {
+        "app_url": "https://benchmark-app.en.aptoide.com",
+        "app_name": "Benchmark App",
+        "no_downloads": "5M+",
+        "app_description": "\n".join(
+            f"Description paragraph {i} of the benchmark app."
+            for i in range(paragraphs)
+        ),
+        "app_release_date": "2023-01-01",
+        "app_version": "1.2.3",
+    }
+    pipe = MagicMock()
+    pipe.execute = AsyncMock(
+        return_value=[
+            [celery.backend.encode({"status": "SUCCESS", "result": None})],
+            [encode_result(json.dumps(result).encode())],
+        ]
+    )
+    redis = MagicMock()
+    redis.pipeline.return_value = pipe
+
+    stack.enter_context(
+        patch("api.routes.v2.scrape.get_async_redis", return_value=redis)
+    )
+    stack.enter_context(patch("api.routes.v2.scrape.logging.info"))
+
+
+def use_previous_serialization(stack: ExitStack) -> None:
+    stack.enter_context(
+        patch(
+            "api.routes.v2.scrape.dump_async_scrape_result",
+            lambda data: AsyncScrapeResultSchema().dump(data),
+        )
+    )
+    stack.enter_context(
+        patch.dict(app.resp_options.media_handlers, {MEDIA_JSON: media.JSONHandler()})
+    )
+
+
+async def requests_per_second(requests: int) -> float:
+    async with ASGIConductor(app) as conductor:
+        started = time.perf_counter()
+        for _ in range(requests):
+            response = await conductor.simulate_get(f"/v2/scrape/result/{TASK_ID}")
+            assert response.status_code == 200
+        return requests / (time.perf_counter() - started)
+
+
+def measure(requests: int, paragraphs: int, previous: bool) -> float:
+    with ExitStack() as stack:
+        stub_backends(stack, paragraphs)
+        if previous:
+            use_previous_serialization(stack)
+        return asyncio.run(requests_per_second(requests))
+
+
+def main(requests: int, paragraphs: int) -> None:
+    previous = measure(requests, paragraphs, previous=True)
+    current = measure(requests, paragraphs, previous=False)
+    print(f"{'previous req/s':>15} {'current req/s':>15} {'speedup':>8}")
+    print(f"{previous:>15.0f} {current:>15.0f} {current / previous:>7.2f}x")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--requests", type=int, default=5000)
+    parser.add_argument("--paragraphs", type=int, default=20)
+    args = parser.parse_args()
+    main(args.requests, args.paragraphs)
@@ -0,0 +1,127 @@
+"""Storage per task result, previous double storage vs the compact result store
+
+Previously each result was written as JSON under the bare task ID and again
+by Celery into its result backend. Now it is written once to the result
+store, compressed when long, and Celery only keeps the task state.
+
+By default the encoded bytes per result are compared. With --redis, results
+are written to that Redis and the growth of its used memory is measured,
+which includes the per-key overhead. Use a scratch database, it is flushed.
+
+Usage:
+    python -m benchmarks.bench_result_store [--results 1000] [--redis redis://localhost:6379/15]
+"""
+
+import argparse
+import json
+import random
+import uuid
+from datetime import datetime, timezone
+from typing import Callable, Dict, Optional
+
+from redis import Redis
+
+from api.tasks import celery
+from api.utils.results import encode_result, result_key
+
+DESCRIPTION_PARAGRAPHS = [1, 10, 40]
+
+Writes = Dict[str, bytes]
+
+
+def make_result(paragraphs: int, rng: random.Random) -> dict:
+    """Build a scrape result with a description of varied words"""
+
+    words = [
+        "".join(
+            rng.choice("abcdefghijklmnopqrstuvwxyz") for _ in range(rng.randint(2, 9))
+        )
+        for _ in range(400)
+    ]
+    description = "\n".join(
+        " ".join(rng.choice(words) for _ in range(40)) + "." for _ in range(paragraphs)
+    )
+    return {
+        "app_url": "https://benchmark-app.en.aptoide.com",
+        "app_name": "Benchmark App",
+        "no_downloads": "5M+",
+        "app_description": description,
+        "app_release_date": "2023-01-01",
+        "app_version": "1.2.3",
+    }
+
+
+def celery_meta(task_id: str, result: Optional[dict]) -> bytes:
+    meta = {
+        "status": "SUCCESS",
+        "result": result,
+        "traceback": None,
+        "children": [],
+        "date_done": datetime.now(timezone.utc).isoformat(),
+        "task_id": task_id,
+    }
+    return celery.backend.encode(meta).encode("utf-8")
+
+
+def previous_writes(task_id: str, result: dict) -> Writes:
+    return {
+        task_id: json.dumps(result).encode("utf-8"),
+        celery.backend.get_key_for_task(task_id).decode(): celery_meta(task_id, result),
+    }
+
+
+def current_writes(task_id: str, result: dict) -> Writes:
+    payload = json.dumps(result, separators=(",", ":")).encode("utf-8")
+    return {
+        result_key(task_id): encode_result(payload),
+        celery.backend.get_key_for_task(task_id).decode(): celery_meta(task_id, None),
+    }
+
+
+def encoded_bytes(store: Callable[[str, dict], Writes], result: dict) -> int:
+    return sum(len(value) for value in store(uuid.uuid4().hex, result).values())
+
+
+def redis_bytes(
+    redis: Redis, store: Callable[[str, dict], Writes], result: dict, results: int
+) -> float:
+    redis.flushdb()
+    before = redis.info("memory")["used_memory"]
+    pipe = redis.pipeline(transaction=False)
+    for _ in range(results):
+        for key, value in store(uuid.uuid4().hex, result).items():
+            pipe.set(key, value)
+    pipe.execute()
+    used = redis.info("memory")["used_memory"] - before
+    redis.flushdb()
+    return used / results
+
+
+def main(results: int, redis_url: Optional[str]) -> None:
+    rng = random.Random(0)
+    redis = Redis.from_url(redis_url) if redis_url else None
+    unit = "Redis bytes" if redis else "bytes"
+
+    print(
+        f"{'paragraphs':>10} {'previous ' + unit:>20} {'current ' + unit:>20} {'saved':>7}"
+    )
+    for paragraphs in DESCRIPTION_PARAGRAPHS:
+        result = make_result(paragraphs, rng)
+        if redis:
+            previous = redis_bytes(redis, previous_writes, result, results)
+            current = redis_bytes(redis, current_writes, result, results)
+        else:
+            previous = encoded_bytes(previous_writes, result)
+            current = encoded_bytes(current_writes, result)
+        print(
+            f"{paragraphs:>10} {previous:>20.0f} {current:>20.0f} "
+            f"{1 - current / previous:>6.0%}"
+        )
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--results", type=int, default=1000)
+    parser.add_argument("--redis", help="URL of a scratch Redis database")
+    args = parser.parse_args()
+    main(args.results, args.redis)
@@ -0,0 +1,126 @@
+"""End-to-end latency of one scrape with sequential vs concurrent page fetches
+
+Each upstream fetch sleeps for a random latency, so the numbers show how much
+of the two round trips the concurrent fetch of the Versions page hides.
+
+Usage:
+    python -m benchmarks.bench_scrape_latency [--latency 0.2] [--runs 30]
+"""
+
+import argparse
+import asyncio
+import random
+import statistics
+import time
+from typing import Callable, List, Optional
+from unittest.mock import patch
+
+import httpx
+
+from api.utils import fetch, scrape
+from api.utils.fetch import FetchedPage
+from benchmarks.pages import render_app_page, render_versions_page
+from benchmarks.stubs import no_redis
+
+TARGET_URL = "https://benchmark-app.en.aptoide.com"
+
+APP_PAGE = render_app_page()
+VERSIONS_PAGE = render_versions_page()
+
+
+def upstream_page(url: str) -> str:
+    return VERSIONS_PAGE if url.endswith("/versions") else APP_PAGE
+
+
+def jittered(latency: float) -> float:
+    return random.uniform(latency * 0.5, latency * 1.5)
+
+
+def sequential_scrape(url: str) -> Optional[dict]:
+    """Previous behaviour: the Versions page is fetched after the app page is parsed"""
+
+    base_url = scrape.convert_to_base_url(url)
+    result = scrape.fetch_and_extract(
+        base_url, lambda content: scrape.extract_app_details(content, base_url)
+    )
+    if result is None:
+        return None
+
+    result["app_version"] = scrape.scrape_app_version(base_url)
+    return result
+
+
+async def async_sequential_scrape(url: str) -> Optional[dict]:
+    base_url = scrape.convert_to_base_url(url)
+    result = await scrape.async_fetch_and_extract(
+        base_url, lambda content: scrape.extract_app_details(content, base_url)
+    )
+    if result is None:
+        return None
+
+    result["app_version"] = await scrape.async_scrape_app_version(base_url)
+    return result
+
+
+def report(label: str, samples: List[float]) -> None:
+    samples = sorted(samples)
+    p95 = samples[int(len(samples) * 0.95) - 1]
+    print(
+        f"{label:<22} mean {statistics.mean(samples) * 1000:7.1f} ms"
+        f"  p50 {statistics.median(samples) * 1000:7.1f} ms"
+        f"  p95 {p95 * 1000:7.1f} ms"
+    )
+
+
+def time_sync(fn: Callable, latency: float, runs: int) -> List[float]:
+    def fetch_page(url: str, headers: Optional[dict] = None) -> FetchedPage:
+        time.sleep(jittered(latency))
+        content = upstream_page(url)
+        return FetchedPage(status=200, content=content, size=len(content))
+
+    samples = []
+    with patch("api.utils.revalidation.fetch_page", fetch_page), no_redis():
+        for _ in range(runs):
+            started = time.perf_counter()
+            fn(TARGET_URL)
+            samples.append(time.perf_counter() - started)
+    return samples
+
+
+async def time_async(fn: Callable, latency: float, runs: int) -> List[float]:
+    async def handler(request: httpx.Request) -> httpx.Response:
+        await asyncio.sleep(jittered(latency))
+        return httpx.Response(200, text=upstream_page(str(request.url)))
+
+    fetch._async_client = httpx.AsyncClient(transport=httpx.MockTransport(handler))
+
+    samples = []
+    with no_redis():
+        for _ in range(runs):
+            started = time.perf_counter()
+            await fn(TARGET_URL)
+            samples.append(time.perf_counter() - started)
+    return samples
+
+
+def main(latency: float, runs: int) -> None:
+    print(f"upstream latency {latency * 1000:.0f} ms +/- 50% per fetch, {runs} runs")
+    report("sync sequential", time_sync(sequential_scrape, latency, runs))
+    report("sync concurrent", time_sync(scrape.scrape_target_page, latency, runs))
+    report(
+        "async sequential",
+        asyncio.run(time_async(async_sequential_scrape, latency, runs)),
+    )
+    report(
+        "async concurrent",
+        asyncio.run(time_async(scrape.async_scrape_target_page, latency, runs)),
+    )
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--latency", type=float, default=0.2)
+    parser.add_argument("--runs", type=int, default=30)
+    args = parser.parse_args()
+
+    main(args.latency, args.runs)
@@ -0,0 +1,100 @@
+"""Bytes read, latency and peak RSS of buffered vs streaming app page parsing
+
+A local HTTP server serves a large synthetic app page whose fields sit near
+the top. Each mode runs in its own process so its peak RSS is its own: the
+buffered mode downloads the whole page, decodes it and builds the full tree,
+the streaming mode parses chunks as they arrive and stops reading once the
+fields are final.
+
+Usage:
+    python -m benchmarks.bench_streaming_parse [--runs 20] [--filler 50000]
+"""
+
+import argparse
+import multiprocessing
+import resource
+import statistics
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Tuple
+
+from api.utils.fetch import fetch_page
+from api.utils.fields import APP_PAGE
+from api.utils.scrape import extract_app_details
+from api.utils.streaming import StreamingFieldParser
+from benchmarks.pages import render_app_page
+
+MODES = ["buffered", "streaming"]
+
+
+def serve(page: bytes) -> ThreadingHTTPServer:
+    class Handler(BaseHTTPRequestHandler):
+        def do_GET(self) -> None:
+            self.send_response(200)
+            self.send_header("Content-Type", "text/html; charset=utf-8")
+            self.send_header("Content-Length", str(len(page)))
+            self.end_headers()
+            try:
+                self.wfile.write(page)
+            except (BrokenPipeError, ConnectionResetError):
+                pass
+
+        def log_message(self, *args) -> None:
+            pass
+
+    server = ThreadingHTTPServer(("127.0.0.1", 0), Handler)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server
+
+
+def scrape(mode: str, url: str) -> Tuple[int, dict]:
+    if mode == "streaming":
+        page = fetch_page(url, parser=StreamingFieldParser(APP_PAGE))
+        return page.size, page.parsed
+
+    page = fetch_page(url)
+    return page.size, extract_app_details(page.content, url)
+
+
+def run_mode(mode: str, url: str, runs: int, results: multiprocessing.Queue) -> None:
+    samples = []
+    for _ in range(runs):
+        started = time.perf_counter()
+        size, fields = scrape(mode, url)
+        samples.append(time.perf_counter() - started)
+    peak_rss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    results.put((size, statistics.mean(samples), peak_rss, fields["app_name"]))
+
+
+def main(runs: int, filler: int) -> None:
+    page = render_app_page(filler_blocks=filler).encode()
+    server = serve(page)
+    url = f"http://127.0.0.1:{server.server_address[1]}/"
+
+    print(f"page of {len(page) / 1024:.0f} KB, {runs} scrapes per mode")
+    print(f"{'mode':<10} {'KB read':>8} {'mean ms':>8} {'peak RSS MB':>12}")
+    for mode in MODES:
+        results: multiprocessing.Queue = multiprocessing.Queue()
+        process = multiprocessing.Process(
+            target=run_mode, args=(mode, url, runs, results)
+        )
+        process.start()
+        size, latency, peak_rss, app_name = results.get(timeout=600)
+        process.join()
+        assert app_name is not None
+        print(
+            f"{mode:<10} {size / 1024:>8.0f} {latency * 1000:>8.1f} "
+            f"{peak_rss / 1024:>12.1f}"
+        )
+
+    server.shutdown()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--runs", type=int, default=20)
+    parser.add_argument("--filler", type=int, default=50000)
+    args = parser.parse_args()
+
+    main(args.runs, args.filler)
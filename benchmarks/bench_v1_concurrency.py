@@ -0,0 +1,102 @@
+"""Throughput of /v1/scrape as the number of concurrent clients grows
+
+The upstream is simulated with a fixed latency so the numbers reflect how many
+scrapes one event loop can keep in flight, not the speed of Aptoide.
+
+Usage:
+    python -m benchmarks.bench_v1_concurrency [--latency 0.2] [--requests 64]
+"""
+
+import argparse
+import asyncio
+import time
+from typing import Optional
+from unittest.mock import patch
+
+import httpx
+
+from api.main import app
+from api.utils import fetch, scrape
+from api.utils.fetch import FetchedPage
+from benchmarks.pages import render_app_page, render_versions_page
+from benchmarks.stubs import no_redis
+
+CONCURRENCY_LEVELS = [1, 4, 16, 64]
+
+# Small pages keep parsing out of the picture, this measures I/O concurrency
+APP_PAGE = render_app_page(filler_blocks=50)
+VERSIONS_PAGE = render_versions_page(filler_blocks=50)
+
+
+def upstream_page(path: str) -> str:
+    return VERSIONS_PAGE if path.endswith("/versions") else APP_PAGE
+
+
+def install_async_upstream(latency: float) -> None:
+    async def handler(request: httpx.Request) -> httpx.Response:
+        await asyncio.sleep(latency)
+        return httpx.Response(200, text=upstream_page(request.url.path))
+
+    fetch._async_client = httpx.AsyncClient(transport=httpx.MockTransport(handler))
+
+
+def blocking_scrape(latency: float):
+    """Old behaviour: the blocking scraper called straight from the handler"""
+
+    def fetch_page(url: str, headers: Optional[dict] = None) -> FetchedPage:
+        time.sleep(latency)
+        content = upstream_page(url)
+        return FetchedPage(status=200, content=content, size=len(content))
+
+    async def scrape_target_page(url: str) -> Optional[dict]:
+        with patch("api.utils.revalidation.fetch_page", fetch_page):
+            return scrape.scrape_target_page(url)
+
+    return scrape_target_page
+
+
+async def run_level(concurrency: int, total: int) -> float:
+    transport = httpx.ASGITransport(app=app)
+    semaphore = asyncio.Semaphore(concurrency)
+
+    async with httpx.AsyncClient(transport=transport, base_url="http://api") as client:
+
+        async def one(i: int) -> None:
+            async with semaphore:
+                response = await client.get(
+                    "/v1/scrape",
+                    params={"target_url": f"https://app-{i}.en.aptoide.com/app"},
+                )
+                response.raise_for_status()
+
+        started = time.perf_counter()
+        await asyncio.gather(*(one(i) for i in range(total)))
+        return total / (time.perf_counter() - started)
+
+
+async def main(latency: float, total: int) -> None:
+    install_async_upstream(latency)
+
+    with no_redis():
+        await compare(latency, total)
+
+
+async def compare(latency: float, total: int) -> None:
+    print(f"upstream latency {latency * 1000:.0f} ms per fetch, {total} requests")
+    print(f"{'clients':>8} {'blocking req/s':>16} {'async req/s':>14}")
+    for concurrency in CONCURRENCY_LEVELS:
+        with patch(
+            "api.routes.v1.scrape.async_scrape_target_page", blocking_scrape(latency)
+        ):
+            blocking = await run_level(concurrency, min(total, 8))
+        non_blocking = await run_level(concurrency, total)
+        print(f"{concurrency:>8} {blocking:>16.1f} {non_blocking:>14.1f}")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--latency", type=float, default=0.2)
+    parser.add_argument("--requests", type=int, default=64)
+    args = parser.parse_args()
+
+    asyncio.run(main(args.latency, args.requests))
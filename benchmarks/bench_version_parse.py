@@ -0,0 +1,67 @@
+"""Parse time of the Versions page with BeautifulSoup vs the lxml field registry
+
+Runs on synthetic Versions pages of growing size, or on saved pages passed
+with --fixture (e.g. curl -o versions.html https://<app>.en.aptoide.com/versions).
+
+BeautifulSoup is only needed here, it is installed with the bench group
+(poetry install --with bench).
+
+Usage:
+    python -m benchmarks.bench_version_parse [--runs 50] [--fixture versions.html]
+"""
+
+import argparse
+import time
+from pathlib import Path
+from typing import Callable, List, Optional, Tuple
+
+from bs4 import BeautifulSoup
+
+from api.utils.scrape import APP_VERSION_SELECTOR_CLASS, extract_app_version
+from benchmarks.pages import render_versions_page
+
+FILLER_BLOCKS = [50, 500, 2000]
+
+
+def previous_extract_app_version(content: str) -> Optional[str]:
+    """Previous behaviour: html.parser tree and a full class-string match"""
+
+    soup = BeautifulSoup(content, "html.parser")
+    app_version_element = soup.find("span", class_=APP_VERSION_SELECTOR_CLASS)
+    return app_version_element.text if app_version_element else None
+
+
+def mean_ms(extract: Callable[[str], Optional[str]], content: str, runs: int) -> float:
+    started = time.perf_counter()
+    for _ in range(runs):
+        extract(content)
+    return (time.perf_counter() - started) / runs * 1000
+
+
+def load_pages(fixtures: List[str]) -> List[Tuple[str, str]]:
+    if fixtures:
+        return [(Path(path).name, Path(path).read_text()) for path in fixtures]
+    return [
+        (f"synthetic x{blocks}", render_versions_page(filler_blocks=blocks))
+        for blocks in FILLER_BLOCKS
+    ]
+
+
+def main(runs: int, fixtures: List[str]) -> None:
+    print(f"{'page':<20} {'KB':>6} {'bs4 ms':>9} {'lxml ms':>9} {'speedup':>8}")
+    for label, content in load_pages(fixtures):
+        previous = mean_ms(previous_extract_app_version, content, runs)
+        current = mean_ms(extract_app_version, content, runs)
+        print(
+            f"{label:<20} {len(content) / 1024:>6.0f} {previous:>9.2f} "
+            f"{current:>9.2f} {previous / current:>7.1f}x"
+        )
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--runs", type=int, default=50)
+    parser.add_argument("--fixture", action="append", default=[])
+    args = parser.parse_args()
+
+    main(args.runs, args.fixture)
@@ -0,0 +1,106 @@
+"""Synthetic Aptoide-like pages shaped to match the scraper's selectors"""
+
+import json
+
+from api.utils.scrape import APP_VERSION_SELECTOR_CLASS
+
+APP_NAME = "Benchmark App"
+NO_DOWNLOADS = "5M+"
+APP_RELEASE_DATE = "2023-01-01"
+APP_VERSION = "1.2.3"
+
+
+def _filler(n: int) -> str:
+    return "".join(
+        f'<div class="filler-{i}"><span>filler</span></div>' for i in range(n)
+    )
+
+
+def render_next_data(paragraphs: int) -> str:
+    app = {
+        "name": APP_NAME,
+        "stats": {"downloads": 5_000_000},
+        "media": {
+            "description": "\n".join(
+                f"Description paragraph {i} of the benchmark app."
+                for i in range(paragraphs)
+            )
+        },
+        "updated": f"{APP_RELEASE_DATE} 00:00:00",
+        "file": {"vername": APP_VERSION},
+    }
+    next_data = json.dumps({"props": {"pageProps": {"app": app}}})
+    return f'<script id="__NEXT_DATA__" type="application/json">{next_data}</script>'
+
+
+def render_app_page(
+    filler_blocks: int = 2000, paragraphs: int = 20, next_data: bool = False
+) -> str:
+    """Render an app page matching the XPath selectors
+
+    Args:
+        filler_blocks (int): Number of filler blocks to pad the page with
+        paragraphs (int): Number of description paragraphs
+        next_data (bool): Embed the app metadata as Next.js data at the end of the body
+
+    Returns:
+        str: HTML of the app page
+    """
+
+    description = "".join(
+        f"<p>Description paragraph {i} of the benchmark app.</p>"
+        for i in range(paragraphs)
+    )
+    header = (
+        "<div>"
+        "<div></div>"
+        "<div></div>"
+        "<div>"
+        "<div></div>"
+        f"<div><div><h1>{APP_NAME}</h1></div></div>"
+        f"<div><div><span>{NO_DOWNLOADS}</span></div></div>"
+        "</div>"
+        "</div>"
+    )
+    info = (
+        "<div></div><div></div>"
+        "<div><div>"
+        "<span></span><span></span><span></span><span></span>"
+        f"<span>Release date:<!-- -->{APP_RELEASE_DATE}</span>"
+        "</div></div>"
+    )
+    content = (
+        "<div></div>"
+        f"<div>{header}</div>"
+        "<div></div>"
+        f"<div><div></div><div><div><div>{description}</div></div></div></div>"
+        "<div></div>"
+        f"<div>{info}</div>"
+    )
+    return (
+        "<html><head><title>Benchmark App</title></head><body>"
+        '<div id="__next"><div><div></div><div><div>'
+        f"<div><div></div>{'<div>' + content + '</div>'}</div>"
+        "</div></div></div></div>"
+        f"{_filler(filler_blocks)}"
+        f"{render_next_data(paragraphs) if next_data else ''}"
+        "</body></html>"
+    )
+
+
+def render_versions_page(filler_blocks: int = 2000) -> str:
+    """Render a Versions page matching the version selector
+
+    Args:
+        filler_blocks (int): Number of filler blocks to pad the page with
+
+    Returns:
+        str: HTML of the Versions page
+    """
+
+    return (
+        "<html><body>"
+        f'<div><span class="{APP_VERSION_SELECTOR_CLASS}">{APP_VERSION}</span></div>'
+        f"{_filler(filler_blocks)}"
+        "</body></html>"
+    )
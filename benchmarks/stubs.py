@@ -0,0 +1,31 @@
+"""Stand-ins for the services the scraper talks to, so benchmarks run offline"""
+
+from contextlib import ExitStack, contextmanager
+from typing import Iterator
+from unittest.mock import AsyncMock, MagicMock, patch
+
+
+@contextmanager
+def no_redis() -> Iterator[None]:
+    """Run against an empty Redis, every fetch is unconditional and uncached"""
+
+    redis_client = MagicMock()
+    redis_client.get.return_value = None
+    async_redis_client = AsyncMock()
+    async_redis_client.get.return_value = None
+
+    with ExitStack() as stack:
+        stack.enter_context(patch("api.utils.revalidation.redis_client", redis_client))
+        stack.enter_context(
+            patch(
+                "api.utils.revalidation.get_async_redis",
+                return_value=async_redis_client,
+            )
+        )
+        stack.enter_context(
+            patch(
+                "api.routes.v1.scrape.get_async_redis",
+                return_value=async_redis_client,
+            )
+        )
+        yield
@@ -1,10 +1,11 @@
-import time
-
 import requests
 import streamlit as st
 
 from .utils import validate_url
 
+# Seconds the API holds a result request until the task finishes
+RESULT_WAIT = 10
+
 
 class AsynchHome:
     class Model:
@@ -51,7 +52,11 @@ class AsynchHome:
                 f"Async scraping in progress... Task status: {r.json()['status']}"
             ) as status:
                 while True:
-                    r = requests.get(f"http://api:5000/v2/scrape/result/{task_id}")
+                    r = requests.get(
+                        f"http://api:5000/v2/scrape/result/{task_id}",
+                        params={"wait": RESULT_WAIT},
+                        timeout=RESULT_WAIT + 10,
+                    )
 
                     if r.status_code != 200:
                         st.error(
@@ -64,13 +69,15 @@ class AsynchHome:
                             label="Task completed!", state="complete", expanded=False
                         )
                         break
+                    elif r.json()["status"] == "FAILURE":
+                        status.update(label="Task failed!", state="error")
+                        st.error(f"Unable to scrape the URL: {r.json().get('error')}")
+                        return
                     else:
                         status.text(
                             f"Async scraping in progress... Task status: {r.json()['status']}"
                         )
 
-                    time.sleep(1)
-
             result = r.json()["result"]
 
             response = f"""
@@ -57,7 +57,12 @@ class AsynchSSEHome:
             )
 
             for msg in st.session_state["updates"]:
+                # Keepalive comments carry no data while the task is running
                 if not msg.data:
+                    continue
+
+                if msg.event == "error":
+                    st.error(f"Unable to scrape the URL: {msg.data}")
                     st.session_state["updates"].resp.close()
                     return
 
@@ -79,3 +84,7 @@ class AsynchSSEHome:
                 st.session_state.messages.append(
                     {"role": "assistant", "content": response}
                 )
+
+                # The stream carries a single result, do not reconnect for more
+                st.session_state["updates"].resp.close()
+                return